@@ -0,0 +1,160 @@
+"""
+Synthetic package catalogs for benchmarks.
+
+Django must be set up before this module is imported. Catalogs are generated from a seed, so the
+same arguments always give the same packages, tags and file contents.
+"""
+from __future__ import annotations
+
+from io import BytesIO
+from xml.sax.saxutils import escape
+import random
+import zipfile
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from minchoc.models import NugetUser, Package
+from minchoc.utils import apply_version_fields, bulk_create_packages, hash_file
+
+__all__ = ('CATALOG_PREFIX', 'create_catalog', 'create_uploader', 'make_nupkg', 'upload_body')
+
+CATALOG_PREFIX = 'bench.package'
+"""Prefix of the identifiers of generated packages. Package ``n`` is ``bench.package<n>``."""
+UPLOAD_BOUNDARY = 'benchmarkboundary'
+
+
+def make_nupkg(nuget_id: str,
+               version: str,
+               tags: list[str],
+               file_size: int,
+               seed: int = 0) -> bytes:
+    """
+    Build a package file.
+
+    Parameters
+    ----------
+    nuget_id : str
+        NuGet package identifier.
+    version : str
+        Package version.
+    tags : list[str]
+        Tag names.
+    file_size : int
+        Approximate size of the file in bytes. The file is padded with random bytes that do not
+        compress.
+    seed : int
+        Seed for the padding.
+
+    Returns
+    -------
+    bytes
+        The zip file.
+    """
+    nuspec = f"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>{escape(nuget_id)}</id>
+    <version>{escape(version)}</version>
+    <title>{escape(nuget_id)} (Install)</title>
+    <authors>Benchmark Author</authors>
+    <requireLicenseAcceptance>false</requireLicenseAcceptance>
+    <projectUrl>https://example.com/{escape(nuget_id)}</projectUrl>
+    <packageSourceUrl>https://example.com/{escape(nuget_id)}/source</packageSourceUrl>
+    <description>A package generated to benchmark minchoc. {'Padding text. ' * 8}</description>
+    <summary>Benchmark package.</summary>
+    <tags>{escape(' '.join(tags))}</tags>
+  </metadata>
+</package>"""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr(f'{nuget_id}.nuspec', nuspec, compress_type=zipfile.ZIP_DEFLATED)
+        rng = random.Random(seed)  # ruff:ignore[suspicious-non-cryptographic-random-usage]
+        z.writestr('tools/payload.bin', rng.randbytes(max(0, file_size - len(nuspec))))
+    return buffer.getvalue()
+
+
+def upload_body(content: bytes) -> tuple[bytes, str]:
+    """
+    Wrap a package file in a multipart upload request body.
+
+    Parameters
+    ----------
+    content : bytes
+        The package file.
+
+    Returns
+    -------
+    tuple[bytes, str]
+        The body and its content type.
+    """
+    body = (f'--{UPLOAD_BOUNDARY}\r\ncontent-disposition: form-data; name="upload"; '
+            'filename="package.nupkg"\r\ncontent-type: application/zip\r\n\r\n'
+            ).encode() + content + f'\r\n--{UPLOAD_BOUNDARY}--'.encode()
+    return body, f'multipart/form-data; boundary={UPLOAD_BOUNDARY}'
+
+
+def create_uploader() -> NugetUser:
+    """
+    Create the user that uploads the generated packages.
+
+    Returns
+    -------
+    NugetUser
+        The uploader.
+    """
+    user = User._default_manager.create(username='benchmark')
+    return NugetUser._default_manager.get(base=user)
+
+
+def create_catalog(uploader: NugetUser,
+                   packages: int,
+                   versions: int,
+                   tags: int,
+                   file_size: int,
+                   seed: int = 0) -> list[Package]:
+    """
+    Store package files and insert the packages of a catalog.
+
+    Parameters
+    ----------
+    uploader : NugetUser
+        The uploader of every package.
+    packages : int
+        Number of package identifiers.
+    versions : int
+        Number of versions of each identifier.
+    tags : int
+        Number of distinct tags. Each package has up to three of them.
+    file_size : int
+        Approximate size of each package file in bytes.
+    seed : int
+        Seed for tags and file contents.
+
+    Returns
+    -------
+    list[Package]
+        The saved packages.
+    """
+    rng = random.Random(seed)  # ruff:ignore[suspicious-non-cryptographic-random-usage]
+    tag_names = [f'tag{i}' for i in range(tags)]
+    items = []
+    for i in range(packages):
+        nuget_id = f'{CATALOG_PREFIX}{i}'
+        package_tags = rng.sample(tag_names, min(3, tags))
+        for j in range(versions):
+            version = f'1.{j}.0'
+            content = make_nupkg(nuget_id, version, package_tags, file_size, rng.randrange(2 ** 32))
+            package = Package(nuget_id=nuget_id,
+                              version=version,
+                              title=f'{nuget_id} (Install)',
+                              description='A package generated to benchmark minchoc.',
+                              summary='Benchmark package.',
+                              project_url=f'https://example.com/{nuget_id}',
+                              hash=hash_file(BytesIO(content)),
+                              hash_algorithm='SHA512',
+                              size=len(content),
+                              uploader=uploader)
+            apply_version_fields(package)
+            package.file.save(f'{nuget_id}.{version}.nupkg', ContentFile(content), save=False)
+            items.append((package, package_tags, ['Benchmark Author']))
+    return bulk_create_packages(items)
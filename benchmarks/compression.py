@@ -0,0 +1,106 @@
+"""
+Compare feed compression levels by size and latency.
+
+Renders a ``FindPackagesById()`` feed from an in-memory database and compresses it with every gzip
+level and Brotli quality (if ``brotli`` is installed). Use the results to choose
+``MINCHOC_FEED_GZIP_LEVEL`` and ``MINCHOC_FEED_BROTLI_QUALITY``.
+
+Usage: ``python -m benchmarks.compression [--entries N] [--repeat N]``
+"""
+from __future__ import annotations
+
+from time import perf_counter
+from typing import TYPE_CHECKING
+import argparse
+import gzip
+
+from minchoc.compression import available_encodings, compress
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_BROTLI_QUALITIES = range(12)
+_GZIP_LEVELS = range(1, 10)
+
+
+def _setup_django() -> None:
+    from django.conf import settings  # ruff:ignore[import-outside-top-level]
+    import django  # ruff:ignore[import-outside-top-level]
+    settings.configure(
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:'
+        }},
+        DEFAULT_AUTO_FIELD='django.db.models.BigAutoField',
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'minchoc'],
+        USE_TZ=True)
+    django.setup()
+
+
+def _render_feed(entries: int) -> bytes:
+    from asgiref.sync import async_to_sync  # ruff:ignore[import-outside-top-level]
+    from django.contrib.auth.models import User  # ruff:ignore[import-outside-top-level]
+    from django.core.management import call_command  # ruff:ignore[import-outside-top-level]
+    from minchoc import utils  # ruff:ignore[import-outside-top-level]
+    from minchoc.feeds import find_packages_by_id_feed  # ruff:ignore[import-outside-top-level]
+    from minchoc.models import NugetUser, Package  # ruff:ignore[import-outside-top-level]
+    call_command('migrate', verbosity=0)
+    User._default_manager.create(username='benchmark')
+    uploader = NugetUser._default_manager.get()
+    items = []
+    for i in range(entries):
+        package = Package(nuget_id='benchmark.package',
+                          version=f'1.{i}.0',
+                          title='Benchmark Package (Install)',
+                          description='A package used to benchmark feed compression. ' * 4,
+                          summary='Benchmark package.',
+                          project_url='https://example.com/benchmark',
+                          license_url='https://example.com/benchmark/license',
+                          hash=f'{i:0128x}',
+                          hash_algorithm='SHA512',
+                          size=1024 * (i + 1),
+                          uploader=uploader)
+        utils.apply_version_fields(package)
+        items.append((package, ['benchmark', 'admin', f'tag{i % 7}'], ['Author']))
+    utils.bulk_create_packages(items)
+    content = async_to_sync(find_packages_by_id_feed)('https://example.com', 'benchmark.package')
+    return (content or '').encode()
+
+
+def _time(func: Callable[[], bytes], repeat: int) -> tuple[float, int]:
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        start = perf_counter()
+        size = len(func())
+        best = min(best, perf_counter() - start)
+    return best, size
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=50, help='Number of feed entries.')
+    parser.add_argument('--repeat', type=int, default=20, help='Best of this many runs.')
+    args = parser.parse_args()
+    _setup_django()
+    content = _render_feed(args.entries)
+    rows = [
+        f'Feed: {args.entries} entries, {len(content)} bytes',
+        f'{"encoding":<8} {"level":>5} {"bytes":>9} {"ratio":>7} {"ms":>8}'
+    ]
+    cases = [('gzip', x) for x in _GZIP_LEVELS]
+    if 'br' in available_encodings():
+        cases += [('br', x) for x in _BROTLI_QUALITIES]
+    for encoding, level in cases:
+        seconds, size = _time(lambda e=encoding, q=level: compress(content, e, q), args.repeat)
+        rows.append(f'{encoding:<8} {level:>5} {size:>9} {len(content) / size:>7.1f} '
+                    f'{seconds * 1000:>8.3f}')
+    compressed = gzip.compress(content)
+    seconds, _ = _time(lambda: gzip.decompress(compressed), args.repeat)
+    rows.append(f'gzip decompression: {seconds * 1000:.3f} ms')
+    print('\n'.join(rows))  # ruff:ignore[print]
+
+
+if __name__ == '__main__':
+    main()
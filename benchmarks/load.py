@@ -0,0 +1,432 @@
+"""
+Replay a Chocolatey-like request mix against in-process ASGI and WSGI handlers.
+
+A synthetic catalog is generated in a temporary SQLite database. The schedule mixes the requests
+that dominate Chocolatey client traffic:
+
+* ``find``: ``FindPackagesById()?id='...'&semVerLevel=2.0.0``, sent by ``choco install``.
+* ``packages``: ``Packages()?$filter=(tolower(Id) eq '...') and IsLatestVersion``, sent by
+  ``choco info`` and ``choco upgrade``.
+* ``download``: ``/package/<name>/<version>``, sent in bursts as a package and its dependencies are
+  installed.
+
+Package identifiers are picked with a Zipf distribution, so a few packages get most of the traffic.
+The same schedule is sent by ``--concurrency`` concurrent clients to :py:class:`ASGIHandler` (each
+client is a task on one event loop) and to :py:class:`WSGIHandler` (each client is a thread), with
+no server or network in between. For each handler the harness reports requests per second,
+latency percentiles and the error rate (responses with status 400 or higher, and exceptions) by
+request kind. Use it to compare deployments and to choose the number of workers: a worker serves
+about the reported requests per second at the given concurrency.
+
+Usage: ``python -m benchmarks.load [--mix find=5,packages=3,download=2] [--concurrency N]
+[--requests N] [--burst N] [--handler asgi|wsgi] [--packages N] [--versions N] [--tags N]
+[--file-size BYTES] [--no-cache] [--save PATH]``
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote
+import argparse
+import asyncio
+import json
+import math
+import random
+import shutil
+import sys
+import tempfile
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_HANDLERS = ('asgi', 'wsgi')
+_KINDS = ('find', 'packages', 'download')
+
+Request = tuple[str, str, str]
+"""Kind, path and encoded query string of a request."""
+Result = tuple[str, float, bool]
+"""Kind, latency in seconds and whether the request failed."""
+
+
+def _setup_django(media_root: str, *, cache: bool) -> None:
+    from django.conf import settings  # ruff:ignore[import-outside-top-level]
+    import django  # ruff:ignore[import-outside-top-level]
+    # The feed, negative and coalesced response caches are off by default. They are safe to turn on
+    # here because there is only one process.
+    caches = {
+        'MINCHOC_COALESCE_TTL': 2,
+        'MINCHOC_FEED_CACHE_TIMEOUT': 300,
+        'MINCHOC_NEGATIVE_CACHE_TTL': 60
+    } if cache else {}
+    settings.configure(
+        ALLOWED_HOSTS=['testserver'],
+        # A file, so that every thread sees the same database.
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': str(Path(media_root) / 'db.sqlite3'),
+                'OPTIONS': {
+                    'timeout': 30
+                }
+            }
+        },
+        DEFAULT_AUTO_FIELD='django.db.models.BigAutoField',
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'minchoc'],
+        # Chocolatey sends semVerLevel, which is logged as a warning on every request.
+        LOGGING={
+            'version': 1,
+            'disable_existing_loggers': False,
+            'loggers': {
+                'minchoc': {
+                    'level': 'ERROR'
+                }
+            }
+        },
+        MEDIA_ROOT=str(Path(media_root) / 'media'),
+        ROOT_URLCONF='minchoc.urls',
+        USE_TZ=True,
+        **caches)
+    django.setup()
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """
+    Parse a request mix such as ``find=5,packages=3,download=2``.
+
+    Parameters
+    ----------
+    value : str
+        Comma-separated ``kind=weight`` pairs. Kinds that are not listed are not sent.
+
+    Returns
+    -------
+    dict[str, float]
+        Weight by request kind.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If a kind is unknown or a weight is invalid.
+    """
+    mix = {}
+    for item in value.split(','):
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in _KINDS:
+            msg = f'Unknown request kind {kind.strip()!r}. Choose from {", ".join(_KINDS)}.'
+            raise argparse.ArgumentTypeError(msg)
+        try:
+            mix[kind.strip()] = float(weight)
+        except ValueError as e:
+            msg = f'Invalid weight {weight!r} for {kind.strip()}.'
+            raise argparse.ArgumentTypeError(msg) from e
+    if not any(x > 0 for x in mix.values()) or any(x < 0 for x in mix.values()):
+        msg = 'Weights must not be negative and at least one must be positive.'
+        raise argparse.ArgumentTypeError(msg)
+    return mix
+
+
+def make_schedule(mix: dict[str, float],
+                  requests: int,
+                  packages: int,
+                  versions: int,
+                  burst: int = 5,
+                  seed: int = 0) -> list[Request]:
+    """
+    Generate the requests to send.
+
+    Parameters
+    ----------
+    mix : dict[str, float]
+        Weight by request kind. Weights are shares of requests, so a download burst counts as
+        ``burst`` requests.
+    requests : int
+        Number of requests.
+    packages : int
+        Number of package identifiers in the catalog.
+    versions : int
+        Number of versions of each identifier.
+    burst : int
+        Number of packages downloaded one after the other.
+    seed : int
+        Seed for the schedule.
+
+    Returns
+    -------
+    list[Request]
+        The requests in the order they are sent.
+    """
+    from benchmarks.catalog import CATALOG_PREFIX  # ruff:ignore[import-outside-top-level]
+    rng = random.Random(seed)  # ruff:ignore[suspicious-non-cryptographic-random-usage]
+    kinds = list(mix)
+    weights = [mix[x] / burst if x == 'download' else mix[x] for x in kinds]
+    popularity = [1 / (i + 1) for i in range(packages)]
+    schedule: list[Request] = []
+    while len(schedule) < requests:
+        kind = rng.choices(kinds, weights)[0]
+        ids = [
+            f'{CATALOG_PREFIX}{x}'
+            for x in rng.choices(range(packages), popularity, k=burst if kind == 'download' else 1)
+        ]
+        match kind:
+            case 'find':
+                schedule.append((kind, '/FindPackagesById()', f"id='{ids[0]}'&semVerLevel=2.0.0"))
+            case 'packages':
+                schedule.append((kind, '/Packages()',
+                                 (f"$filter=(tolower(Id) eq '{ids[0]}') and IsLatestVersion"
+                                  '&semVerLevel=2.0.0')))
+            case _:
+                schedule.extend(
+                    (kind, f'/package/{x}/1.{rng.randrange(versions)}.0', '') for x in ids)
+    return [(kind, path, quote(query, safe="=&$'()")) for kind, path, query in schedule[:requests]]
+
+
+async def _send_asgi(handler: Any, request: Request) -> Result:
+    kind, path, query = request
+    loop = asyncio.get_running_loop()
+    disconnect = loop.create_future()
+    received = False
+    status = 500
+
+    async def receive() -> dict[str, Any]:
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected. Django cancels this when the response is sent.
+        return await disconnect  # type: ignore[no-any-return]
+
+    async def send(message: dict[str, Any]) -> None:  # ruff:ignore[unused-async]
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    scope = {
+        'type': 'http',
+        'asgi': {
+            'version': '3.0'
+        },
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'user-agent', b'Chocolatey Command Line')],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80)
+    }
+    start = perf_counter()
+    try:
+        await handler(scope, receive, send)
+    except Exception:  # ruff:ignore[blind-except]
+        return kind, perf_counter() - start, True
+    return kind, perf_counter() - start, status >= 400  # ruff:ignore[magic-value-comparison]
+
+
+def run_asgi(schedule: list[Request], concurrency: int) -> tuple[list[Result], float]:
+    """
+    Send a schedule to an in-process :py:class:`ASGIHandler`.
+
+    Parameters
+    ----------
+    schedule : list[Request]
+        The requests.
+    concurrency : int
+        Number of clients, each a task sending one request at a time.
+
+    Returns
+    -------
+    tuple[list[Result], float]
+        The result of each request and the total time in seconds.
+    """
+    from django.core.handlers.asgi import ASGIHandler  # ruff:ignore[import-outside-top-level]
+    handler = ASGIHandler()
+
+    async def run() -> tuple[list[Result], float]:
+        pending = iter(schedule)
+        results: list[Result] = []
+
+        async def client() -> None:
+            # The clients share the iterator, so each request is sent once.
+            results.extend([await _send_asgi(handler, x) for x in pending])
+
+        start = perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return results, perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def _send_wsgi(handler: Callable[..., Any], request: Request) -> Result:
+    kind, path, query = request
+    status = 500
+
+    def start_response(status_line: str, *_: Any) -> Callable[[bytes], None]:
+        nonlocal status
+        status = int(status_line.split(' ', 1)[0])
+        return lambda _: None
+
+    environ = {
+        'HTTP_HOST': 'testserver',
+        'HTTP_USER_AGENT': 'Chocolatey Command Line',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'REMOTE_ADDR': '127.0.0.1',
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.errors': sys.stderr,
+        'wsgi.input': BytesIO(),
+        'wsgi.multiprocess': False,
+        'wsgi.multithread': True,
+        'wsgi.run_once': False,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0)
+    }
+    start = perf_counter()
+    try:
+        with closing(handler(environ, start_response)) as response:
+            for _ in response:
+                pass
+    except Exception:  # ruff:ignore[blind-except]
+        return kind, perf_counter() - start, True
+    return kind, perf_counter() - start, status >= 400  # ruff:ignore[magic-value-comparison]
+
+
+def run_wsgi(schedule: list[Request], concurrency: int) -> tuple[list[Result], float]:
+    """
+    Send a schedule to an in-process :py:class:`WSGIHandler`.
+
+    Parameters
+    ----------
+    schedule : list[Request]
+        The requests.
+    concurrency : int
+        Number of clients, each a thread sending one request at a time.
+
+    Returns
+    -------
+    tuple[list[Result], float]
+        The result of each request and the total time in seconds.
+    """
+    from django.core.handlers.wsgi import WSGIHandler  # ruff:ignore[import-outside-top-level]
+    handler = WSGIHandler()
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='load-client') as executor:
+        results = list(executor.map(lambda x: _send_wsgi(handler, x), schedule))
+    return results, perf_counter() - start
+
+
+def summarise(results: list[Result], elapsed: float) -> dict[str, dict[str, float]]:
+    """
+    Summarise the results of a run by request kind.
+
+    Parameters
+    ----------
+    results : list[Result]
+        The result of each request.
+    elapsed : float
+        Total time of the run in seconds.
+
+    Returns
+    -------
+    dict[str, dict[str, float]]
+        Requests, errors, error rate, requests per second and latency percentiles in milliseconds
+        by kind, and for all requests under ``total``.
+    """
+    by_kind: dict[str, list[Result]] = {'total': results}
+    for result in results:
+        by_kind.setdefault(result[0], []).append(result)
+    summary = {}
+    for kind in (*(x for x in _KINDS if x in by_kind), 'total'):
+        latencies = sorted(x[1] for x in by_kind[kind])
+        errors = sum(x[2] for x in by_kind[kind])
+        summary[kind] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 3)
+        }
+    return summary
+
+
+def main() -> None:
+    """Run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mix',
+                        type=parse_mix,
+                        default='find=5,packages=3,download=2',
+                        help='Share of requests of each kind.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients.')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per handler.')
+    parser.add_argument('--warmup', type=int, default=100, help='Untimed requests per handler.')
+    parser.add_argument('--burst', type=int, default=5, help='Downloads in each burst.')
+    parser.add_argument('--handler',
+                        action='append',
+                        choices=_HANDLERS,
+                        help='Only test these handlers.')
+    parser.add_argument('--packages', type=int, default=50, help='Number of package identifiers.')
+    parser.add_argument('--versions', type=int, default=5, help='Versions of each identifier.')
+    parser.add_argument('--tags', type=int, default=20, help='Number of distinct tags.')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='Bytes per package file.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the catalog and schedule.')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Turn off request coalescing and the feed and negative caches.')
+    parser.add_argument('--save', type=Path, help='Write the results to this JSON file.')
+    args = parser.parse_args()
+    root = tempfile.mkdtemp(prefix='minchoc-load-')
+    try:
+        _setup_django(root, cache=not args.no_cache)
+        from benchmarks import catalog  # ruff:ignore[import-outside-top-level]
+        from django.core.management import call_command  # ruff:ignore[import-outside-top-level]
+        from django.db import connections  # ruff:ignore[import-outside-top-level]
+        from minchoc.downloads import flush_downloads  # ruff:ignore[import-outside-top-level]
+        call_command('migrate', verbosity=0)
+        catalog.create_catalog(catalog.create_uploader(), args.packages, args.versions, args.tags,
+                               args.file_size, args.seed)
+        connections.close_all()
+        schedule = make_schedule(args.mix, args.warmup + args.requests, args.packages,
+                                 args.versions, args.burst, args.seed)
+        runners = {'asgi': run_asgi, 'wsgi': run_wsgi}
+        results: dict[str, Any] = {
+            'config': {
+                x: getattr(args, x)
+                for x in ('mix', 'concurrency', 'requests', 'burst', 'packages', 'versions',
+                          'file_size', 'seed', 'no_cache')
+            },
+            'handlers': {}
+        }
+        rows = [(f'{"handler":<8} {"kind":<10} {"requests":>8} {"errors":>7} {"error %":>8} '
+                 f'{"req/s":>9} {"p50 ms":>9} {"p99 ms":>9}')]
+        for name in args.handler or _HANDLERS:
+            runners[name](schedule[:args.warmup], args.concurrency)
+            summary = results['handlers'][name] = summarise(
+                *runners[name](schedule[args.warmup:], args.concurrency))
+            rows.extend(f'{name:<8} {kind:<10} {r["requests"]:>8} {r["errors"]:>7} '
+                        f'{r["error_rate"] * 100:>8.2f} {r["rps"]:>9} {r["p50_ms"]:>9} '
+                        f'{r["p99_ms"]:>9}' for kind, r in summary.items())
+        # Write buffered downloads while the database still exists.
+        flush_downloads()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print('\n'.join(rows))  # ruff:ignore[print]
+    if args.save:
+        args.save.write_text(f'{json.dumps(results, indent=2, sort_keys=True)}\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark feeds, ``$filter`` parsing, uploads and downloads against a synthetic catalog.
+
+Each case is run through the Django test client (or called directly for parsing) against an
+in-memory SQLite database and a temporary media directory. For every case the suite reports
+throughput, latency percentiles, database queries per call and peak memory allocated by one call
+(measured with :py:mod:`tracemalloc` in a separate run, so it does not slow down the timings).
+
+Save the results as a baseline and compare later runs against it. A comparison fails (exit status
+``1``) if a case makes more queries than the baseline, or if its median latency or peak memory grew
+by more than the tolerance. Latency depends on the machine, so compare against a baseline recorded
+on the same machine, or pass ``--latency-tolerance -1`` to skip it.
+
+Usage: ``python -m benchmarks.suite [--packages N] [--versions N] [--tags N] [--file-size BYTES]
+[--iterations N] [--save PATH] [--compare PATH]``
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+import argparse
+import json
+import math
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_CASES = ('packages', 'packages_filter', 'find_packages_by_id', 'filter_parse', 'upload',
+          'download')
+_CONFIG_KEYS = ('packages', 'versions', 'tags', 'file_size', 'seed')
+"""Arguments that must match between a run and the baseline it is compared with."""
+_FILTER = ("((((Id ne null) and substringof('bench',tolower(Id))) or "
+           "(substringof('bench',tolower(Tags)))) and IsLatestVersion)")
+
+
+def _setup_django(media_root: str) -> None:
+    from django.conf import settings  # ruff:ignore[import-outside-top-level]
+    import django  # ruff:ignore[import-outside-top-level]
+    settings.configure(
+        ALLOWED_HOSTS=['testserver'],
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:'
+        }},
+        DEFAULT_AUTO_FIELD='django.db.models.BigAutoField',
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'minchoc'],
+        MEDIA_ROOT=media_root,
+        # Measure rendering, not the response caches.
+        MINCHOC_COALESCE_TTL=0,
+        MINCHOC_FEED_CACHE_TIMEOUT=0,
+        MINCHOC_NEGATIVE_CACHE_TTL=0,
+        ROOT_URLCONF='minchoc.urls',
+        USE_TZ=True)
+    django.setup()
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def _measure(func: Callable[[int], Any], iterations: int, warmup: int) -> dict[str, float]:
+    """
+    Time a case and count its queries and memory.
+
+    Parameters
+    ----------
+    func : Callable[[int], Any]
+        The case. It is passed the number of the call, starting at ``0``.
+    iterations : int
+        Number of timed calls.
+    warmup : int
+        Number of calls before timing starts.
+
+    Returns
+    -------
+    dict[str, float]
+        The results.
+    """
+    from django.db import connection  # ruff:ignore[import-outside-top-level]
+    queries = 0
+
+    def count_query(execute: Callable[..., Any], *args: Any) -> Any:
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    n = 0
+    for _ in range(warmup):
+        func(n)
+        n += 1
+    # Django clears connection.queries when a request starts, so count with a wrapper instead.
+    with connection.execute_wrapper(count_query):
+        func(n)
+        n += 1
+    tracemalloc.start()
+    try:
+        func(n)
+        n += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    latencies = []
+    start = perf_counter()
+    for _ in range(iterations):
+        call_start = perf_counter()
+        func(n)
+        latencies.append(perf_counter() - call_start)
+        n += 1
+    total = perf_counter() - start
+    latencies.sort()
+    return {
+        'queries': queries,
+        'throughput': round(iterations / total, 1),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1)
+    }
+
+
+def _cases(args: argparse.Namespace) -> dict[str, Callable[[int], Any]]:
+    from benchmarks import catalog  # ruff:ignore[import-outside-top-level]
+    from django.core.management import call_command  # ruff:ignore[import-outside-top-level]
+    from django.test import Client  # ruff:ignore[import-outside-top-level]
+    from minchoc.filteryacc import parser  # ruff:ignore[import-outside-top-level]
+    call_command('migrate', verbosity=0)
+    uploader = catalog.create_uploader()
+    catalog.create_catalog(uploader, args.packages, args.versions, args.tags, args.file_size,
+                           args.seed)
+    client = Client()
+    api_key = uploader.token.hex
+    nuget_id = f'{catalog.CATALOG_PREFIX}0'
+
+    def get(url: str) -> None:
+        if (status := client.get(url).status_code) != 200:  # ruff:ignore[magic-value-comparison]
+            msg = f'{url} returned {status}.'
+            raise RuntimeError(msg)
+
+    def upload(n: int) -> None:
+        body, content_type = catalog.upload_body(
+            catalog.make_nupkg('bench.upload', f'2.{n}.0', ['upload'], args.file_size, n))
+        response = client.put('/package/',
+                              body,
+                              content_type,
+                              headers={
+                                  'content-length': f'{len(body)}',
+                                  'x-nuget-apikey': api_key
+                              })
+        if response.status_code != 201:  # ruff:ignore[magic-value-comparison]
+            msg = f'Upload returned {response.status_code}.'
+            raise RuntimeError(msg)
+
+    return {
+        'packages': lambda _: get('/Packages()?$top=30'),
+        'packages_filter': lambda _: get(f'/Packages()?$filter={_FILTER}&$top=30'),
+        'find_packages_by_id': lambda _: get(f'/FindPackagesById()?id={nuget_id}'),
+        # The parser itself, without the cache in parse_filter.
+        'filter_parse': lambda _: parser.parse(_FILTER),
+        'upload': upload,
+        'download': lambda n: get(f'/package/{catalog.CATALOG_PREFIX}{n % args.packages}/1.0.0'),
+    }
+
+
+def compare(results: dict[str, Any],
+            baseline: dict[str, Any],
+            latency_tolerance: float = 0.5,
+            memory_tolerance: float = 0.25) -> list[str]:
+    """
+    Compare results with a baseline.
+
+    Parameters
+    ----------
+    results : dict[str, Any]
+        The results of a run.
+    baseline : dict[str, Any]
+        The results of an earlier run with the same configuration.
+    latency_tolerance : float
+        Allowed relative growth of the median latency. Negative to not compare latency.
+    memory_tolerance : float
+        Allowed relative growth of peak memory.
+
+    Returns
+    -------
+    list[str]
+        A description of each regression. Empty if there are none.
+    """
+    if results['config'] != baseline['config']:
+        return [(f'Configuration {results["config"]} does not match the baseline '
+                 f'{baseline["config"]}.')]
+    regressions = []
+    for case, old in baseline['cases'].items():
+        if (new := results['cases'].get(case)) is None:
+            continue
+        if new['queries'] > old['queries']:
+            regressions.append(f'{case}: {new["queries"]} queries, baseline {old["queries"]}.')
+        if latency_tolerance >= 0 and new['p50_ms'] > old['p50_ms'] * (1 + latency_tolerance):
+            regressions.append(f'{case}: median {new["p50_ms"]} ms, baseline {old["p50_ms"]} ms.')
+        if new['peak_kib'] > old['peak_kib'] * (1 + memory_tolerance):
+            regressions.append(
+                f'{case}: peak memory {new["peak_kib"]} KiB, baseline {old["peak_kib"]} KiB.')
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--packages', type=int, default=50, help='Number of package identifiers.')
+    parser.add_argument('--versions', type=int, default=5, help='Versions of each identifier.')
+    parser.add_argument('--tags', type=int, default=20, help='Number of distinct tags.')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='Bytes per package file.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the catalog.')
+    parser.add_argument('--iterations', type=int, default=50, help='Timed calls per case.')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed calls before timing.')
+    parser.add_argument('--case', action='append', choices=_CASES, help='Only run these cases.')
+    parser.add_argument('--save', type=Path, help='Write the results to this JSON file.')
+    parser.add_argument('--compare', type=Path, help='Compare with the results in this JSON file.')
+    parser.add_argument('--latency-tolerance',
+                        type=float,
+                        default=0.5,
+                        help='Allowed relative growth of median latency. Negative to ignore.')
+    parser.add_argument('--memory-tolerance',
+                        type=float,
+                        default=0.25,
+                        help='Allowed relative growth of peak memory.')
+    args = parser.parse_args()
+    media_root = tempfile.mkdtemp(prefix='minchoc-bench-')
+    try:
+        _setup_django(media_root)
+        cases = _cases(args)
+        config = {x: getattr(args, x) for x in _CONFIG_KEYS}
+        results: dict[str, Any] = {'config': config, 'cases': {}}
+        rows = [(f'{"case":<20} {"queries":>7} {"calls/s":>9} {"p50 ms":>9} {"p95 ms":>9} '
+                 f'{"p99 ms":>9} {"peak KiB":>9}')]
+        for name in args.case or _CASES:
+            r = results['cases'][name] = _measure(cases[name], args.iterations, args.warmup)
+            rows.append(f'{name:<20} {r["queries"]:>7} {r["throughput"]:>9} {r["p50_ms"]:>9} '
+                        f'{r["p95_ms"]:>9} {r["p99_ms"]:>9} {r["peak_kib"]:>9}')
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+    print('\n'.join(rows))  # ruff:ignore[print]
+    if args.save:
+        args.save.write_text(f'{json.dumps(results, indent=2, sort_keys=True)}\n', encoding='utf-8')
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text(encoding='utf-8')),
+                              args.latency_tolerance, args.memory_tolerance)
+        print('\n'.join(regressions) or 'No regressions.')  # ruff:ignore[print]
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
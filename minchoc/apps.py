@@ -1,10 +1,42 @@
 """App configuration."""
+# ruff:file-ignore[import-outside-top-level]
 from __future__ import annotations
 
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.test.signals import setting_changed
+from typing_extensions import override
+
+from .signals import package_changed
 
 
 class MainConfig(AppConfig):
     """Configuration for the minchoc app."""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'minchoc'
+
+    @override
+    def ready(self) -> None:
+        from . import coalesce, feed_cache, negative_cache, routers, static_feeds, v3
+        from .metrics import connection_created_receiver
+        from .tracing import configure as configure_tracing, setting_changed_receiver
+        package_changed.connect(coalesce.package_changed_receiver,
+                                dispatch_uid='minchoc.coalesce.package_changed_receiver')
+        package_changed.connect(feed_cache.package_changed_receiver,
+                                dispatch_uid='minchoc.feed_cache.package_changed_receiver')
+        package_changed.connect(negative_cache.package_changed_receiver,
+                                dispatch_uid='minchoc.negative_cache.package_changed_receiver')
+        package_changed.connect(routers.package_changed_receiver,
+                                dispatch_uid='minchoc.routers.package_changed_receiver')
+        package_changed.connect(static_feeds.package_changed_receiver,
+                                dispatch_uid='minchoc.static_feeds.package_changed_receiver')
+        package_changed.connect(v3.package_changed_receiver,
+                                dispatch_uid='minchoc.v3.package_changed_receiver')
+        request_started.connect(routers.request_started_receiver,
+                                dispatch_uid='minchoc.routers.request_started_receiver')
+        connection_created.connect(connection_created_receiver,
+                                   dispatch_uid='minchoc.metrics.connection_created_receiver')
+        setting_changed.connect(setting_changed_receiver,
+                                dispatch_uid='minchoc.tracing.setting_changed_receiver')
+        configure_tracing()
@@ -0,0 +1,173 @@
+"""
+Request coalescing (single-flight) for feed views.
+
+When many clients poll the same feed URL at once, only the first request runs the view. Concurrent
+identical requests in the same event loop await that render and get a copy of its response,
+headers included. The response can also be kept for ``settings.MINCHOC_COALESCE_TTL`` seconds
+(default ``0``, which turns this off) so requests arriving just after it was rendered share it too.
+Kept responses are per process, so with several workers, other workers can serve a stale feed for
+up to the TTL after an upload or deletion.
+
+Requests are identical if they have the same scheme, host, path and query parameters in any order.
+Kept responses are dropped when :py:data:`minchoc.signals.package_changed` is sent.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from functools import wraps
+from http import HTTPStatus
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Concatenate, NamedTuple, ParamSpec
+from weakref import WeakKeyDictionary
+import asyncio
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Coroutine
+
+    from django.http import HttpRequest
+
+__all__ = ('clear', 'coalesce_requests', 'coalesce_stats', 'package_changed_receiver')
+
+_P = ParamSpec('_P')
+_RequestKey = tuple[str, str, str, tuple[tuple[str, tuple[str, ...]], ...]]
+
+
+class _Result(NamedTuple):
+    status: int
+    headers: dict[str, str]
+    content: bytes
+
+
+_in_flight: WeakKeyDictionary[asyncio.AbstractEventLoop,
+                              dict[_RequestKey, asyncio.Task[_Result]]] = WeakKeyDictionary()
+_results: dict[_RequestKey, tuple[float, _Result]] = {}
+_generation = 0
+_lock = threading.Lock()
+_stats: Counter[str] = Counter()
+
+
+def _ttl() -> float:
+    return float(getattr(settings, 'MINCHOC_COALESCE_TTL', 0))
+
+
+def _request_key(request: HttpRequest) -> _RequestKey:
+    return (request.scheme or '', request.get_host(), request.path,
+            tuple(sorted((k, tuple(v)) for k, v in request.GET.lists())))
+
+
+def _response(result: _Result) -> HttpResponse:
+    return HttpResponse(result.content, status=result.status, headers=result.headers)
+
+
+def _cached(key: _RequestKey) -> _Result | None:
+    with _lock:
+        if (entry := _results.get(key)) is None:
+            return None
+        if entry[0] > monotonic():
+            return entry[1]
+        del _results[key]
+    return None
+
+
+async def _render(view: Callable[..., Awaitable[HttpResponse]], key: _RequestKey,
+                  request: HttpRequest, *args: Any, **kwargs: Any) -> _Result:
+    generation = _generation
+    response = await view(request, *args, **kwargs)
+    result = _Result(response.status_code, dict(response.items()), response.content)
+    with _lock:
+        _stats['renders'] += 1
+        ttl = _ttl()
+        # Do not keep a response rendered from data that has changed since.
+        if (ttl > 0 and generation == _generation
+                and result.status < HTTPStatus.INTERNAL_SERVER_ERROR):
+            _results[key] = (monotonic() + ttl, result)
+    return result
+
+
+def coalesce_requests(
+    view: Callable[Concatenate[HttpRequest, _P], Awaitable[HttpResponse]]
+) -> Callable[Concatenate[HttpRequest, _P], Coroutine[Any, Any, HttpResponse]]:
+    """
+    Coalesce concurrent identical ``GET`` requests to an asynchronous view.
+
+    Parameters
+    ----------
+    view : Callable[Concatenate[HttpRequest, _P], Awaitable[HttpResponse]]
+        The view. Its response must only depend on the request URL.
+
+    Returns
+    -------
+    Callable[Concatenate[HttpRequest, _P], Coroutine[Any, Any, HttpResponse]]
+        The wrapped view.
+    """
+    @wraps(view)
+    async def wrapper(request: HttpRequest, /, *args: _P.args, **kwargs: _P.kwargs) -> HttpResponse:
+        if request.method != 'GET':
+            return await view(request, *args, **kwargs)
+        key = _request_key(request)
+        _stats['requests'] += 1
+        if (result := _cached(key)) is not None:
+            _stats['cache_hits'] += 1
+            return _response(result)
+        in_flight = _in_flight.setdefault(asyncio.get_running_loop(), {})
+        if (task := in_flight.get(key)) is not None:
+            _stats['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(_render(view, key, request, *args, **kwargs))
+            in_flight[key] = task
+            task.add_done_callback(lambda _: in_flight.pop(key, None))
+        # Shielded so that a client disconnecting does not cancel the render for the others.
+        return _response(await asyncio.shield(task))
+
+    return wrapper
+
+
+def coalesce_stats() -> dict[str, int]:
+    """
+    Get counters of this process.
+
+    Returns
+    -------
+    dict[str, int]
+        ``requests`` (total handled), ``renders`` (times a view was run), ``coalesced`` (requests
+        that awaited another request's render) and ``cache_hits`` (requests answered with a kept
+        response).
+    """
+    return {k: _stats[k] for k in ('requests', 'renders', 'coalesced', 'cache_hits')}
+
+
+def clear() -> None:
+    """Drop kept responses and reset the counters."""
+    global _generation  # ruff:ignore[global-statement]
+    with _lock:
+        _generation += 1
+        _results.clear()
+        _stats.clear()
+
+
+def package_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        nuget_id: str,  # ruff:ignore[unused-function-argument]
+        **kwargs: Any,  # ruff:ignore[unused-function-argument]
+) -> None:
+    """
+    Drop kept responses after a package changed.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    nuget_id : str
+        NuGet package identifier (unused). Feeds of other identifiers can include it, e.g.
+        ``Search()``, so all kept responses are dropped.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    global _generation  # ruff:ignore[global-statement]
+    with _lock:
+        _generation += 1
+        _results.clear()
@@ -0,0 +1,151 @@
+"""
+Precompressed response bodies and ``Accept-Encoding`` negotiation.
+
+Brotli is used if the optional ``brotli`` package is installed (``pip install minchoc[brotli]``).
+Gzip is always available.
+
+This module does not depend on Django being set up, so its functions can be used in worker
+processes and benchmarks.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+__all__ = ('DEFAULT_BROTLI_QUALITY', 'DEFAULT_GZIP_LEVEL', 'FILE_EXTENSIONS', 'available_encodings',
+           'compress', 'compress_variants', 'negotiate_encoding')
+
+DEFAULT_GZIP_LEVEL = 6
+"""Gzip compression level used unless configured otherwise."""
+DEFAULT_BROTLI_QUALITY = 5
+"""Brotli quality used unless configured otherwise."""
+FILE_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+"""File name extension of each encoding, as expected by ``gzip_static`` and ``brotli_static``."""
+
+
+def available_encodings() -> tuple[str, ...]:
+    """
+    Get the content codings that can be produced, most preferred first.
+
+    Returns
+    -------
+    tuple[str, ...]
+        ``('br', 'gzip')`` if ``brotli`` is installed, otherwise ``('gzip',)``.
+    """
+    return ('gzip',) if brotli is None else ('br', 'gzip')
+
+
+def compress(content: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress content with a content coding.
+
+    Gzip output does not contain a timestamp, so the same content always gives the same bytes.
+
+    Parameters
+    ----------
+    content : bytes
+        The content.
+    encoding : str
+        ``'gzip'`` or ``'br'``.
+    level : int
+        Gzip compression level (``1`` to ``9``) or Brotli quality (``0`` to ``11``).
+
+    Returns
+    -------
+    bytes
+        The compressed content.
+
+    Raises
+    ------
+    ValueError
+        If the encoding is not available.
+    """
+    if encoding == 'gzip':
+        return gzip.compress(content, compresslevel=level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return bytes(brotli.compress(content, quality=level))
+    msg = f'Unsupported encoding: {encoding!r}'
+    raise ValueError(msg)
+
+
+def compress_variants(content: bytes,
+                      *,
+                      encodings: Iterable[str] | None = None,
+                      gzip_level: int = DEFAULT_GZIP_LEVEL,
+                      brotli_quality: int = DEFAULT_BROTLI_QUALITY) -> dict[str, bytes]:
+    """
+    Compress content with several content codings.
+
+    Parameters
+    ----------
+    content : bytes
+        The content.
+    encodings : Iterable[str] | None
+        The content codings. Defaults to every available one.
+    gzip_level : int
+        Gzip compression level.
+    brotli_quality : int
+        Brotli quality.
+
+    Returns
+    -------
+    dict[str, bytes]
+        Compressed content keyed by content coding.
+    """
+    levels = {'br': brotli_quality, 'gzip': gzip_level}
+    return {
+        x: compress(content, x, levels[x])
+        for x in (available_encodings() if encodings is None else encodings)
+    }
+
+
+def _quality(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0
+
+
+def negotiate_encoding(accept_encoding: str | None, encodings: Iterable[str]) -> str | None:
+    """
+    Choose a content coding from an ``Accept-Encoding`` header.
+
+    Parameters
+    ----------
+    accept_encoding : str | None
+        The header value, e.g. ``gzip, deflate, br;q=0.9``.
+    encodings : Iterable[str]
+        The content codings on offer, most preferred first.
+
+    Returns
+    -------
+    str | None
+        The coding with the highest quality value, preferring earlier ones on ties. ``None`` if the
+        content should be sent without a coding.
+    """
+    if not accept_encoding:
+        return None
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                quality = _quality(value.strip())
+        qualities[name.strip().lower()] = quality
+    wildcard = qualities.get('*', 0)
+    best: tuple[float, str] | None = None
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, encoding)
+    return None if best is None else best[1]
@@ -0,0 +1,163 @@
+"""
+Dependency resolution and reverse-dependency queries using the indexed dependency table.
+
+Both directions use :py:class:`~minchoc.models.PackageDependency`, whose rows are added when a
+package is saved. Its index on the lowercase dependency identifier and the lower bound of the range
+answers "who depends on X" without reading package files.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import TYPE_CHECKING, cast
+
+from django.db.models import Prefetch, Q
+
+from .models import Package, PackageDependency
+from .utils import afind_package
+from .versions import VersionRange, parse_version_range
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+__all__ = ('find_dependents', 'resolve_dependencies')
+
+
+def _version_range(row: PackageDependency) -> VersionRange:
+    return VersionRange(min_key=row.min_version_key,
+                        min_inclusive=row.min_inclusive,
+                        max_key=row.max_version_key,
+                        max_inclusive=row.max_inclusive)
+
+
+async def resolve_dependencies(nuget_id: str,
+                               version: str,
+                               *,
+                               include_prerelease: bool = False,
+                               highest: bool = False) -> list[Package] | None:
+    """
+    Resolve the transitive dependencies of a package.
+
+    Dependencies are resolved one level at a time, with a fixed number of queries per level. A
+    dependency declared for several target frameworks is satisfied by a version in any of its
+    ranges. Dependencies declared by several packages of the same level need a version in the
+    ranges of all of them. A package resolved at one level is kept for later levels. Dependencies
+    without a matching listed version are left out, so clients can look them up in other sources.
+
+    Parameters
+    ----------
+    nuget_id : str
+        NuGet package identifier, found with :py:func:`minchoc.utils.afind_package`.
+    version : str
+        Package version string.
+    include_prerelease : bool
+        Allow prerelease versions of dependencies.
+    highest : bool
+        Choose the highest matching version of each dependency instead of the lowest, which is the
+        NuGet default.
+
+    Returns
+    -------
+    list[Package] | None
+        The package followed by its dependencies in breadth-first order, or ``None`` if the package
+        does not exist. :py:func:`~minchoc.utils.afind_package` raises
+        ``Package.MultipleObjectsReturned`` if the identifier is ambiguous.
+    """
+    if (package := await afind_package(nuget_id, version)) is None:
+        return None
+    resolved = {package.nuget_id_lower: package}
+    level = [package]
+    while level:
+        ranges: defaultdict[str, defaultdict[int, list[VersionRange]]] = defaultdict(
+            lambda: defaultdict(list))
+        async for row in PackageDependency._default_manager.filter(package__in=level).exclude(
+                nuget_id_lower__in=list(resolved)):
+            ranges[row.nuget_id_lower][row.package_id].append(_version_range(row))
+        if not ranges:
+            break
+        candidates = Package._default_manager.filter(nuget_id_lower__in=ranges, listed=True)
+        if not include_prerelease:
+            candidates = candidates.filter(is_prerelease=False)
+        chosen: dict[str, int] = {}
+        async for pk, candidate_id, key in candidates.order_by(
+                'nuget_id_lower',
+                '-version_sort_key' if highest else 'version_sort_key').values_list(
+                    'pk', 'nuget_id_lower', 'version_sort_key'):
+            if candidate_id not in chosen and all(
+                    any(x.contains(key) for x in parent_ranges)
+                    for parent_ranges in ranges[candidate_id].values()):
+                chosen[candidate_id] = pk
+        level = [
+            x async for x in Package._default_manager.filter(
+                pk__in=chosen.values()).order_by('nuget_id_lower')
+        ]
+        resolved.update((x.nuget_id_lower, x) for x in level)
+    return list(resolved.values())
+
+
+def _overlaps(version_range: VersionRange) -> Q:
+    """
+    Get a filter for dependency rows whose range has a version in common with a range.
+
+    Parameters
+    ----------
+    version_range : VersionRange
+        The range to compare with.
+
+    Returns
+    -------
+    Q
+        The filter. Ranges that only touch at a bound are only matched if both include it.
+    """
+    q = Q()
+    if (max_key := version_range.max_key) is not None:
+        below = Q(min_version_key__isnull=True) | Q(min_version_key__lt=max_key)
+        if version_range.max_inclusive:
+            below |= Q(min_version_key=max_key, min_inclusive=True)
+        q &= below
+    if (min_key := version_range.min_key) is not None:
+        above = Q(max_version_key__isnull=True) | Q(max_version_key__gt=min_key)
+        if version_range.min_inclusive:
+            above |= Q(max_version_key=min_key, max_inclusive=True)
+        q &= above
+    return q
+
+
+def find_dependents(nuget_id: str,
+                    version_range: str = '',
+                    *,
+                    latest_only: bool = False) -> QuerySet[Package]:
+    """
+    Get the packages that depend on a package identifier.
+
+    The identifier is matched case-insensitively through an index. Declared ranges are compared
+    with the bounds stored for each row, so no package files are read. An invalid version range
+    raises ``ValueError``.
+
+    Each dependent package is returned once, even if it declares the dependency for several target
+    frameworks, so counting and slicing the queryset refer to packages. The matching dependency rows
+    are prefetched as ``declared_dependencies``, ordered by target framework.
+
+    Parameters
+    ----------
+    nuget_id : str
+        NuGet package identifier of the dependency.
+    version_range : str
+        Only include dependents whose declared range has a version in common with this NuGet version
+        range. Pass ``[1.0]`` for the dependents of one version. Empty for all dependents.
+    latest_only : bool
+        Only include the latest version (including prereleases) of each dependent.
+
+    Returns
+    -------
+    QuerySet[Package]
+        Dependent packages, ordered by identifier and version.
+    """
+    rows = PackageDependency._default_manager.filter(_overlaps(parse_version_range(version_range)),
+                                                     nuget_id_lower=nuget_id.lower())
+    queryset = Package._default_manager.filter(pk__in=rows.values('package'))
+    if latest_only:
+        queryset = queryset.filter(is_absolute_latest_version=True)
+    return cast(
+        'QuerySet[Package]',
+        queryset.order_by('nuget_id_lower', 'version_sort_key').prefetch_related(
+            Prefetch('declared_dependencies', queryset=rows.order_by('target_framework'))))
@@ -0,0 +1,327 @@
+"""
+Per-day download statistics.
+
+Downloads are counted in an in-memory buffer in each process instead of being written one by one.
+The buffer is flushed to :py:class:`~minchoc.models.PackageDownloadDay` when it holds
+``settings.MINCHOC_DOWNLOAD_FLUSH_SIZE`` downloads (default ``100``), by a timer thread when the
+oldest buffered download is ``settings.MINCHOC_DOWNLOAD_FLUSH_SECONDS`` seconds old (default
+``10``), and when the process exits. A flush makes a few bulk statements however many downloads it
+holds. Downloads of packages that were deleted before the flush are dropped. If the process is
+killed, at most the downloads of the last ``MINCHOC_DOWNLOAD_FLUSH_SECONDS`` seconds are lost.
+
+After each flush the new counts are rolled up into
+:py:attr:`~minchoc.models.Package.download_count`, which the feeds sum per identifier, and the feed
+cache generations of the changed identifiers are bumped. :py:func:`rollup_downloads` can also be run
+on its own, e.g. by the ``rollup_downloads`` management command, to catch up after a process
+stopped between the two steps.
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, cast
+import atexit
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .feed_cache import bump_generations
+from .models import Package, PackageDownloadDay
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import date
+
+    from django.db.models import QuerySet
+
+__all__ = ('arecord_download', 'clear', 'download_series', 'flush_downloads', 'record_download',
+           'rollup_downloads')
+
+logger = logging.getLogger(__name__)
+
+_buffer: Counter[tuple[int, date]] = Counter()
+_buffer_lock = threading.Lock()
+_timer: threading.Timer | None = None
+
+
+def _flush_size() -> int:
+    return int(getattr(settings, 'MINCHOC_DOWNLOAD_FLUSH_SIZE', 100))
+
+
+def _flush_seconds() -> float:
+    return float(getattr(settings, 'MINCHOC_DOWNLOAD_FLUSH_SECONDS', 10))
+
+
+def _flush_logging_errors() -> None:
+    try:
+        flush_downloads()
+    except Exception:
+        logger.exception('Failed to write buffered downloads.')
+
+
+def _flush_in_background() -> None:
+    try:
+        _flush_logging_errors()
+    finally:
+        # This thread's connections are not closed by the request cycle.
+        connections.close_all()
+
+
+def _start_timer() -> None:
+    """Flush the buffer when its oldest download is old enough. Call with the lock held."""
+    global _timer  # ruff:ignore[global-statement]
+    _timer = threading.Timer(_flush_seconds(), _flush_in_background)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _add(package_id: int) -> bool:
+    """
+    Count a download in the buffer.
+
+    Parameters
+    ----------
+    package_id : int
+        Primary key of the package.
+
+    Returns
+    -------
+    bool
+        ``True`` if the buffer should be flushed now.
+    """
+    with _buffer_lock:
+        _buffer[package_id, timezone.now().date()] += 1
+        if _buffer.total() >= _flush_size():
+            return True
+        if _timer is None:
+            _start_timer()
+        return False
+
+
+def record_download(package_id: int) -> None:
+    """
+    Count a download of a package.
+
+    If writing the buffer fails, the error is logged and the downloads stay buffered.
+
+    Parameters
+    ----------
+    package_id : int
+        Primary key of the package.
+    """
+    if _add(package_id):
+        _flush_logging_errors()
+
+
+async def arecord_download(package_id: int) -> None:
+    """
+    Asynchronously count a download of a package.
+
+    The database is only used if the buffer is flushed. If writing the buffer fails, the error is
+    logged and the downloads stay buffered.
+
+    Parameters
+    ----------
+    package_id : int
+        Primary key of the package.
+    """
+    if _add(package_id):
+        await sync_to_async(_flush_logging_errors)()
+
+
+def clear() -> None:
+    """Discard buffered downloads without writing them."""
+    global _buffer, _timer  # ruff:ignore[global-statement]
+    with _buffer_lock:
+        _buffer = Counter()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+
+
+def _grouped_by_count(counts: dict[int, int]) -> dict[int, list[int]]:
+    """
+    Group primary keys by their count, so each group can be updated with one statement.
+
+    Parameters
+    ----------
+    counts : dict[int, int]
+        Count by primary key.
+
+    Returns
+    -------
+    dict[int, list[int]]
+        Primary keys by count.
+    """
+    groups: defaultdict[int, list[int]] = defaultdict(list)
+    for pk, n in counts.items():
+        groups[n].append(pk)
+    return groups
+
+
+def _write_downloads(pending: Counter[tuple[int, date]]) -> None:
+    """
+    Write downloads in one transaction.
+
+    Parameters
+    ----------
+    pending : Counter[tuple[int, date]]
+        Downloads by package primary key and day. Downloads of packages that no longer exist are
+        removed from it.
+    """
+    with transaction.atomic():
+        pks = {package_id for package_id, _ in pending}
+        existing = set(Package._default_manager.filter(pk__in=pks).values_list('pk', flat=True))
+        if deleted := [x for x in pending if x[0] not in existing]:
+            logger.info('Dropping %d downloads of deleted packages.',
+                        sum(pending.pop(x) for x in deleted))
+        by_day: defaultdict[date, dict[int, int]] = defaultdict(dict)
+        for (package_id, day), n in pending.items():
+            by_day[day][package_id] = n
+        PackageDownloadDay._default_manager.bulk_create(
+            (PackageDownloadDay(package_id=package_id, day=day) for package_id, day in pending),
+            batch_size=1000,
+            ignore_conflicts=True)
+        for day, counts in by_day.items():
+            for n, package_ids in _grouped_by_count(counts).items():
+                PackageDownloadDay._default_manager.filter(
+                    day=day, package_id__in=package_ids).update(count=F('count') + n)
+
+
+def flush_downloads() -> int:
+    """
+    Write the buffered downloads of this process and roll them up.
+
+    Rows are created for new package and day pairs with one bulk insert. Counters are then
+    incremented with one ``UPDATE`` per day and distinct count, which is a handful of statements
+    since most packages are downloaded a few times between flushes. Downloads of packages that no
+    longer exist are dropped. If writing fails for another reason, the downloads are put back in
+    the buffer.
+
+    Returns
+    -------
+    int
+        Number of downloads written.
+    """
+    global _buffer, _timer  # ruff:ignore[global-statement]
+    with _buffer_lock:
+        pending, _buffer = _buffer, Counter()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not pending:
+        return 0
+    try:
+        _write_downloads(pending)
+    except IntegrityError:
+        # A package was deleted during the flush. Retrying would fail the same way.
+        logger.exception('Dropping %d buffered downloads.', pending.total())
+        return 0
+    except Exception:
+        with _buffer_lock:
+            _buffer.update(pending)
+            if _timer is None:
+                _start_timer()
+        raise
+    if not pending:
+        return 0
+    rollup_downloads({package_id for package_id, _ in pending})
+    return pending.total()
+
+
+def rollup_downloads(package_ids: Iterable[int] | None = None) -> int:
+    """
+    Add daily counts that were not rolled up yet to ``Package.download_count``.
+
+    Running it again without new downloads changes nothing. The feed cache generations of the
+    identifiers whose counts changed are bumped.
+
+    Parameters
+    ----------
+    package_ids : Iterable[int] | None
+        Only roll up these packages. ``None`` rolls up every package.
+
+    Returns
+    -------
+    int
+        Number of downloads added.
+    """
+    with transaction.atomic():
+        rows = PackageDownloadDay._default_manager.select_for_update().filter(
+            count__gt=F('rolled_up'))
+        if package_ids is not None:
+            rows = rows.filter(package_id__in=list(package_ids))
+        deltas: Counter[int] = Counter()
+        day_deltas: dict[int, int] = {}
+        for pk, package_id, count, rolled_up in rows.values_list('pk', 'package_id', 'count',
+                                                                 'rolled_up'):
+            deltas[package_id] += count - rolled_up
+            day_deltas[pk] = count - rolled_up
+        for n, pks in _grouped_by_count(day_deltas).items():
+            PackageDownloadDay._default_manager.filter(pk__in=pks).update(rolled_up=F('rolled_up') +
+                                                                          n)
+        for n, pks in _grouped_by_count(deltas).items():
+            Package._default_manager.filter(pk__in=pks).update(download_count=F('download_count') +
+                                                               n)
+        nuget_ids = set(
+            Package._default_manager.filter(pk__in=list(deltas)).values_list('nuget_id', flat=True))
+    if nuget_ids:
+        bump_generations(nuget_ids, catalog=False)
+    return deltas.total()
+
+
+def download_series(nuget_id: str | None = None,
+                    since: date | None = None,
+                    until: date | None = None,
+                    *,
+                    by_version: bool = True) -> QuerySet[PackageDownloadDay, dict[str, Any]]:
+    """
+    Get daily download counts.
+
+    Only flushed downloads are included.
+
+    Parameters
+    ----------
+    nuget_id : str | None
+        Only include this package identifier, matched case-insensitively.
+    since : date | None
+        First day to include.
+    until : date | None
+        Last day to include.
+    by_version : bool
+        Count each version separately. If ``False``, the versions of an identifier are summed.
+
+    Returns
+    -------
+    QuerySet[PackageDownloadDay, dict[str, Any]]
+        Dictionaries with ``day``, ``nuget_id``, ``version`` (if ``by_version``) and ``downloads``,
+        ordered by day, identifier and version.
+    """
+    rows = PackageDownloadDay._default_manager.all()
+    if nuget_id is not None:
+        rows = rows.filter(package__nuget_id_lower=nuget_id.lower())
+    if since is not None:
+        rows = rows.filter(day__gte=since)
+    if until is not None:
+        rows = rows.filter(day__lte=until)
+    group = {'nuget_id': F('package__nuget_id')}
+    order = ['day', 'nuget_id']
+    if by_version:
+        group['version'] = F('package__version')
+        order.append('package__version_sort_key')
+    return cast('QuerySet[PackageDownloadDay, dict[str, Any]]',
+                rows.values('day', **group).annotate(downloads=Sum('count')).order_by(*order))
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if not _buffer:
+        return
+    try:
+        flush_downloads()
+    except Exception:
+        logger.exception('Failed to write %d buffered downloads.', _buffer.total())
@@ -0,0 +1,235 @@
+"""
+Whole-response cache for feed endpoints with ``ETag`` and ``304 Not Modified`` support.
+
+Every package identifier has a generation number in the Django cache, and so does the catalog as a
+whole. Generations are timestamps in nanoseconds, so a generation that was evicted from the cache
+comes back as a new value and never repeats an old one. Uploads and deletions bump the generation of
+the identifier and of the catalog. Downloads only bump the generation of the identifier, so download
+counts in catalog-wide feeds such as ``Packages()`` can lag for up to
+``settings.MINCHOC_FEED_CACHE_TIMEOUT`` seconds.
+
+A response is keyed on the request URL and the generation it depends on. Its ``ETag`` is derived
+from the same values, so a conditional request is answered with ``304`` before anything is
+rendered. Rendered responses are stored in the Django cache for
+``settings.MINCHOC_FEED_CACHE_TIMEOUT`` seconds (default ``0``, which turns the cache off). When
+the cache is off, views are called directly: generations are not looked up and no ``ETag`` is sent.
+
+Enabling the cache requires a cache backend shared by every process, such as Redis or Memcached.
+Generations are kept in the Django cache, and generations never expire. With the default
+per-process ``LocMemCache``, a process that did not handle an upload or deletion never sees the new
+generation, so it keeps serving the stale feed and answering its ``ETag`` with ``304``.
+
+Responses are sent in the content coding chosen by the ``Accept-Encoding`` header (see
+:py:mod:`minchoc.compression`), whether the cache is on or not. Stored responses are compressed once
+with every available content coding, and each variant has its own ``ETag``. Without the cache, each
+response is compressed with the chosen coding only.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from functools import wraps
+from http import HTTPStatus
+from time import time_ns
+from typing import TYPE_CHECKING, Any, Concatenate, ParamSpec
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .compression import available_encodings, negotiate_encoding
+from .feeds import compress_feed, feed_updated
+from .routers import apin_if_changed
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Coroutine, Iterable
+
+    from django.http import HttpRequest
+
+__all__ = ('abump_generations', 'ageneration', 'bump_generations', 'cached_feed',
+           'package_changed_receiver')
+
+_P = ParamSpec('_P')
+_CATALOG = 'minchoc:generation:catalog'
+
+
+def _generation_key(nuget_id: str) -> str:
+    # Identifiers are looked up case-insensitively, so their generations are too.
+    return f'minchoc:generation:id:{hashlib.sha256(nuget_id.lower().encode()).hexdigest()}'
+
+
+def _timeout() -> int:
+    return int(getattr(settings, 'MINCHOC_FEED_CACHE_TIMEOUT', 0))
+
+
+async def ageneration(nuget_id: str | None = None) -> int:
+    """
+    Get the current generation of a package identifier or of the catalog.
+
+    Parameters
+    ----------
+    nuget_id : str | None
+        NuGet package identifier, or ``None`` for the catalog.
+
+    Returns
+    -------
+    int
+        The generation.
+    """
+    key = _CATALOG if nuget_id is None else _generation_key(nuget_id)
+    if (value := await cache.aget(key)) is None:
+        await cache.aadd(key, time_ns(), None)
+        value = await cache.aget(key)
+    return int(value)
+
+
+def _bumped(nuget_ids: Iterable[str], *, catalog: bool) -> dict[str, int]:
+    now = time_ns()
+    values = {_generation_key(x): now for x in nuget_ids}
+    if catalog:
+        values[_CATALOG] = now
+    return values
+
+
+def bump_generations(nuget_ids: Iterable[str], *, catalog: bool = True) -> None:
+    """
+    Start a new generation for package identifiers.
+
+    Parameters
+    ----------
+    nuget_ids : Iterable[str]
+        The package identifiers whose packages changed.
+    catalog : bool
+        Also start a new generation for the catalog. Pass ``False`` for changes that do not affect
+        which packages exist, such as download counts.
+    """
+    cache.set_many(_bumped(nuget_ids, catalog=catalog), None)
+
+
+async def abump_generations(nuget_ids: Iterable[str], *, catalog: bool = True) -> None:
+    """
+    Asynchronously start a new generation for package identifiers.
+
+    Parameters
+    ----------
+    nuget_ids : Iterable[str]
+        The package identifiers whose packages changed.
+    catalog : bool
+        Also start a new generation for the catalog. Pass ``False`` for changes that do not affect
+        which packages exist, such as download counts.
+    """
+    await cache.aset_many(_bumped(nuget_ids, catalog=catalog), None)
+
+
+def _etag_matches(request: HttpRequest, etag: str) -> bool:
+    if not (header := request.headers.get('If-None-Match')):
+        return False
+    candidates = {x.strip().removeprefix('W/') for x in header.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+def _with_validators(response: HttpResponse, etag: str) -> HttpResponse:
+    if response.status_code not in {HTTPStatus.OK, HTTPStatus.NOT_MODIFIED}:
+        return response
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+async def _acompressed(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    if response.status_code != HTTPStatus.OK or response.has_header('Content-Encoding'):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if (encoding := negotiate_encoding(request.headers.get('Accept-Encoding'),
+                                       available_encodings())) is not None:
+        compressed = await sync_to_async(compress_feed, thread_sensitive=False)(response.content,
+                                                                                (encoding,))
+        response.content = compressed[encoding]
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def cached_feed(
+    nuget_id_of: Callable[..., str | None]
+) -> Callable[[Callable[Concatenate[HttpRequest, _P], Awaitable[HttpResponse]]], Callable[
+        Concatenate[HttpRequest, _P], Coroutine[Any, Any, HttpResponse]]]:
+    """
+    Cache and compress the responses of an asynchronous feed view.
+
+    Parameters
+    ----------
+    nuget_id_of : Callable[..., str | None]
+        Called with the arguments of the view. Returns the package identifier the response depends
+        on, or ``None`` if it depends on the catalog.
+
+    Returns
+    -------
+    Callable
+        The decorator. The view it returns takes the same arguments as the decorated view.
+    """
+    def decorator(
+        view: Callable[Concatenate[HttpRequest, _P], Awaitable[HttpResponse]]
+    ) -> Callable[Concatenate[HttpRequest, _P], Coroutine[Any, Any, HttpResponse]]:
+        @wraps(view)
+        async def wrapper(request: HttpRequest, /, *args: _P.args,
+                          **kwargs: _P.kwargs) -> HttpResponse:
+            if request.method != 'GET':
+                return await view(request, *args, **kwargs)
+            if (timeout := _timeout()) <= 0:
+                return await _acompressed(request, await view(request, *args, **kwargs))
+            nuget_id = nuget_id_of(request, *args, **kwargs)
+            current = await ageneration(nuget_id)
+            digest = hashlib.sha256(
+                repr((request.scheme, request.get_host(), request.path, sorted(
+                    request.GET.lists()), current)).encode()).hexdigest()
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding'),
+                                          available_encodings())
+            etag = f'"{digest[:32]}"' if encoding is None else f'"{digest[:32]}-{encoding}"'
+            if _etag_matches(request, etag):
+                response: HttpResponse = HttpResponseNotModified()
+            else:
+                if (stored := await cache.aget(f'minchoc:feed:{digest}')) is None:
+                    await apin_if_changed(nuget_id)
+                    token = feed_updated.set(datetime.fromtimestamp(current / 1e9, timezone.utc))
+                    try:
+                        response = await view(request, *args, **kwargs)
+                    finally:
+                        feed_updated.reset(token)
+                    if response.status_code != HTTPStatus.OK:
+                        return _with_validators(response, etag)
+                    stored = (response['Content-Type'], response.content, await sync_to_async(
+                        compress_feed, thread_sensitive=False)(response.content))
+                    await cache.aset(f'minchoc:feed:{digest}', stored, timeout)
+                content_type, content, variants = stored
+                if encoding is not None and encoding in variants:
+                    response = HttpResponse(variants[encoding], content_type=content_type)
+                    response['Content-Encoding'] = encoding
+                else:
+                    response = HttpResponse(content, content_type=content_type)
+            return _with_validators(response, etag)
+
+        return wrapper
+
+    return decorator
+
+
+async def package_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        nuget_id: str,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Start new generations after a package was uploaded or deleted.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    nuget_id : str
+        NuGet package identifier.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    await abump_generations([nuget_id])
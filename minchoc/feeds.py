@@ -0,0 +1,387 @@
+"""Atom feed documents shared by the views and the pre-rendered static feeds."""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db.models import Case, Q, Subquery, Value, When
+
+from .compression import DEFAULT_BROTLI_QUALITY, DEFAULT_GZIP_LEVEL, compress_variants
+from .constants import FEED_XML_POST, FEED_XML_PRE
+from .dependencies import resolve_dependencies
+from .metrics import FEED_ENTRIES
+from .models import Package, PackageSearchTerm
+from .search import prefix_range, search_words
+from .tracing import span
+from .utils import afind_package, entry_fields, make_entry, prefetch_entries
+from .versions import parse_version, version_sort_key
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterable, Collection, Iterable
+
+    from django.db.models import QuerySet
+
+__all__ = ('compress_feed', 'dependencies_feed', 'feed_document', 'feed_updated',
+           'find_packages_by_id_feed', 'get_updates_feed', 'package_feed', 'render_entries',
+           'search_count', 'search_feed', 'select_fields')
+
+feed_updated: ContextVar[datetime | None] = ContextVar('feed_updated', default=None)
+"""
+Value of the feed ``<updated>`` element. If not set, the current time is used.
+
+:py:func:`minchoc.feed_cache.cached_feed` sets this to the generation of the response so that
+rendering the same data twice gives the same document.
+"""
+
+
+def feed_document(host: str, content: str, count: int | None = None) -> str:
+    """
+    Wrap rendered entries in an Atom feed document.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs, e.g. ``https://example.com``.
+    content : str
+        The rendered ``<entry>`` elements.
+    count : int | None
+        Total number of matching entries for ``$inlinecount=allpages``.
+
+    Returns
+    -------
+    str
+        The feed XML.
+    """
+    inline_count = '' if count is None else f'\n    <m:count>{count}</m:count>'
+    return (FEED_XML_PRE % {
+        'BASEURL': host,
+        'UPDATED': (feed_updated.get() or datetime.now(timezone.utc)).isoformat()
+    } + f'{inline_count}\n{content}{FEED_XML_POST}\n')
+
+
+def compress_feed(content: bytes, encodings: Iterable[str] | None = None) -> dict[str, bytes]:
+    """
+    Compress a feed document with several content codings.
+
+    The levels are ``settings.MINCHOC_FEED_GZIP_LEVEL`` (default ``6``) and
+    ``settings.MINCHOC_FEED_BROTLI_QUALITY`` (default ``5``). Run
+    ``python -m benchmarks.compression`` to compare levels.
+
+    Parameters
+    ----------
+    content : bytes
+        The feed XML.
+    encodings : Iterable[str] | None
+        The content codings. Defaults to every available one.
+
+    Returns
+    -------
+    dict[str, bytes]
+        Compressed content keyed by content coding.
+    """
+    gzip_level = int(getattr(settings, 'MINCHOC_FEED_GZIP_LEVEL', DEFAULT_GZIP_LEVEL))
+    brotli_quality = int(getattr(settings, 'MINCHOC_FEED_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY))
+    return compress_variants(content,
+                             encodings=encodings,
+                             gzip_level=gzip_level,
+                             brotli_quality=brotli_quality)
+
+
+async def render_entries(host: str,
+                         packages: Iterable[Package] | AsyncIterable[Package],
+                         select: Collection[str] | None = None) -> str:
+    """
+    Render an ``<entry>`` element for each package.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs.
+    packages : Iterable[Package] | AsyncIterable[Package]
+        The packages. Querysets are iterated asynchronously.
+    select : Collection[str] | None
+        Property names to include (``$select``), or ``None`` for all of them.
+
+    Returns
+    -------
+    str
+        The entries joined by new lines.
+    """
+    with span('feed.query'):
+        rows = ([x async for x in packages] if hasattr(packages, '__aiter__') else list(packages))
+        download_totals = await prefetch_entries(rows, select)
+    with span('feed.entries') as current:
+        entries = [
+            await make_entry(host, x, select=select, download_totals=download_totals) for x in rows
+        ]
+        if current:
+            current.attributes['entries'] = len(entries)
+    FEED_ENTRIES.observe(len(entries))
+    return '\n'.join(entries)
+
+
+def select_fields(queryset: QuerySet[Package], select: Collection[str] | None) -> QuerySet[Package]:
+    """
+    Limit the columns loaded by a queryset to those needed for the selected properties.
+
+    Parameters
+    ----------
+    queryset : QuerySet[Package]
+        The packages to render.
+    select : Collection[str] | None
+        Property names to include (``$select``), or ``None`` for all of them.
+
+    Returns
+    -------
+    QuerySet[Package]
+        The queryset, using :py:meth:`~django.db.models.query.QuerySet.only` if properties are
+        selected.
+    """
+    return queryset if select is None else queryset.only(*entry_fields(select))
+
+
+async def find_packages_by_id_feed(host: str,
+                                   nuget_id: str,
+                                   skip_after: tuple[str, str] | None = None,
+                                   *,
+                                   select: Collection[str] | None = None) -> str | None:
+    """
+    Render the ``FindPackagesById()`` feed for a package identifier.
+
+    The identifier is matched case-insensitively. Packages are in version order.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs.
+    nuget_id : str
+        NuGet package identifier.
+    skip_after : tuple[str, str] | None
+        Identifier and version of the last package the client has already seen
+        (``$skiptoken``). Only packages after it are included.
+    select : Collection[str] | None
+        Property names to include (``$select``), or ``None`` for all of them.
+
+    Returns
+    -------
+    str | None
+        The feed XML, or ``None`` if there are no packages with the identifier. With ``skip_after``,
+        a feed without entries is returned instead.
+    """
+    queryset = Package._default_manager.filter(
+        nuget_id_lower=nuget_id.lower()).order_by('version_sort_key')
+    if skip_after is not None and skip_after[0].lower() == nuget_id.lower():
+        after = await queryset.filter(version=skip_after[1]).values_list('version_sort_key',
+                                                                         flat=True).afirst()
+        if after is not None:
+            queryset = queryset.filter(version_sort_key__gt=after)
+    content = await render_entries(host, select_fields(queryset, select), select)
+    if not content and skip_after is None:
+        return None
+    return feed_document(host, content)
+
+
+async def package_feed(host: str,
+                       nuget_id: str,
+                       version: str,
+                       *,
+                       select: Collection[str] | None = None) -> str | None:
+    """
+    Render the ``Packages(Id=...,Version=...)`` feed for a single package.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs.
+    nuget_id : str
+        NuGet package identifier.
+    version : str
+        Package version string.
+    select : Collection[str] | None
+        Property names to include (``$select``), or ``None`` for all of them.
+
+    Returns
+    -------
+    str | None
+        The feed XML, or ``None`` if the package does not exist.
+        :py:func:`~minchoc.utils.afind_package` raises ``Package.MultipleObjectsReturned`` if the
+        identifier is ambiguous.
+    """
+    if package := await afind_package(nuget_id, version,
+                                      select_fields(Package._default_manager.all(), select)):
+        return feed_document(host, await make_entry(host, package, select=select))
+    return None
+
+
+async def dependencies_feed(host: str,
+                            nuget_id: str,
+                            version: str,
+                            *,
+                            include_prerelease: bool = False,
+                            highest: bool = False) -> str | None:
+    """
+    Render a feed of a package and its resolved transitive dependencies.
+
+    See :py:func:`minchoc.dependencies.resolve_dependencies`.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs.
+    nuget_id : str
+        NuGet package identifier.
+    version : str
+        Package version string.
+    include_prerelease : bool
+        Allow prerelease versions of dependencies.
+    highest : bool
+        Choose the highest matching version of each dependency instead of the lowest.
+
+    Returns
+    -------
+    str | None
+        The feed XML with the package first, or ``None`` if the package does not exist.
+    """
+    if (packages := await resolve_dependencies(nuget_id,
+                                               version,
+                                               include_prerelease=include_prerelease,
+                                               highest=highest)) is None:
+        return None
+    return feed_document(host, await render_entries(host, packages))
+
+
+async def get_updates_feed(host: str,
+                           installed: Iterable[tuple[str, str]],
+                           *,
+                           include_prerelease: bool = False,
+                           include_all_versions: bool = False) -> str:
+    """
+    Render the ``GetUpdates()`` feed for a set of installed packages.
+
+    All installed packages are checked with a single query that matches each identifier
+    (case-insensitively) to the versions whose sort key is greater than the installed version. An
+    invalid installed version raises ``ValueError``.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs.
+    installed : Iterable[tuple[str, str]]
+        Identifier and version of each installed package.
+    include_prerelease : bool
+        Also offer prerelease versions.
+    include_all_versions : bool
+        Offer every newer version instead of only the latest one.
+
+    Returns
+    -------
+    str
+        The feed XML.
+    """
+    newer = Q()
+    for nuget_id, version in installed:
+        newer |= Q(nuget_id_lower=nuget_id.lower(),
+                   version_sort_key__gt=version_sort_key(parse_version(version)))
+    if not newer:
+        return feed_document(host, '')
+    queryset = Package._default_manager.filter(newer, listed=True)
+    if not include_prerelease:
+        queryset = queryset.filter(is_prerelease=False)
+    if not include_all_versions:
+        queryset = queryset.filter(
+            **{'is_absolute_latest_version' if include_prerelease else 'is_latest_version': True})
+    return feed_document(
+        host, await render_entries(host, queryset.order_by('nuget_id', 'version_sort_key')))
+
+
+def _search_queryset(search_term: str, *, include_prerelease: bool) -> QuerySet[Package]:
+    """
+    Get the latest versions of the packages matching a search term.
+
+    Every word of the search term has to be a prefix of one of the indexed terms of a package.
+
+    Parameters
+    ----------
+    search_term : str
+        The search term. An empty search term matches every package.
+    include_prerelease : bool
+        Match the latest version including prereleases instead of the latest stable version.
+
+    Returns
+    -------
+    QuerySet[Package]
+        The packages, unordered.
+    """
+    queryset: QuerySet[Package] = Package._default_manager.filter(
+        **{'is_absolute_latest_version' if include_prerelease else 'is_latest_version': True})
+    for word in search_words(search_term):
+        low, high = prefix_range(word)
+        terms = PackageSearchTerm._default_manager.filter(term__gte=low)
+        if high is not None:
+            terms = terms.filter(term__lt=high)
+        queryset = queryset.filter(pk__in=Subquery(terms.values('package_id')))
+    return queryset
+
+
+async def search_count(search_term: str, *, include_prerelease: bool = False) -> int:
+    """
+    Count the packages matching a search term without rendering them.
+
+    Parameters
+    ----------
+    search_term : str
+        The search term.
+    include_prerelease : bool
+        Count prerelease versions.
+
+    Returns
+    -------
+    int
+        The number of matching packages.
+    """
+    return await _search_queryset(search_term, include_prerelease=include_prerelease).acount()
+
+
+async def search_feed(host: str,
+                      search_term: str,
+                      *,
+                      include_prerelease: bool = False,
+                      skip: int = 0,
+                      top: int = 30,
+                      inline_count: bool = False) -> str:
+    """
+    Render the ``Search()`` feed.
+
+    Packages whose identifier is the search term come first, then packages whose identifier starts
+    with it, then the rest. Each group is ordered by download count.
+
+    Parameters
+    ----------
+    host : str
+        The protocol and hostname prefix for URLs.
+    search_term : str
+        The search term.
+    include_prerelease : bool
+        Include prerelease versions.
+    skip : int
+        Number of packages to skip (``$skip``).
+    top : int
+        Maximum number of packages to render (``$top``).
+    inline_count : bool
+        Include the total number of matches (``$inlinecount=allpages``).
+
+    Returns
+    -------
+    str
+        The feed XML.
+    """
+    queryset = _search_queryset(search_term, include_prerelease=include_prerelease)
+    count = await queryset.acount() if inline_count else None
+    search_term = search_term.strip().lower()
+    ranked = queryset.annotate(
+        rank=Case(When(nuget_id_lower=search_term, then=Value(0)),
+                  When(nuget_id_lower__startswith=search_term, then=Value(1)),
+                  default=Value(2))).order_by('rank', '-download_count', 'nuget_id')
+    return feed_document(host, await render_entries(host, ranked[skip:skip + top]), count)
@@ -2,20 +2,26 @@
 # ruff:file-ignore[missing-blank-line-after-summary, over-indentation, new-line-after-last-paragraph, missing-trailing-period, first-word-uncapitalized]
 from __future__ import annotations
 
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Any, Literal, cast
+import threading
 
 from django.db.models import Q
 from minchoc.filterlex import tokens  # ruff:ignore[unused-import]
 from ply import yacc
 
+from .metrics import FILTER_PARSE_CACHE
+
 if TYPE_CHECKING:
     from collections.abc import Sequence
 
     from ply.lex import LexToken
 
-__all__ = ('FIELD_MAPPING', 'parser')
+__all__ = ('FIELD_MAPPING', 'PARSE_CACHE_SIZE', 'parse_filter', 'parser')
 
 FIELD_MAPPING = {'Description': 'description', 'Id': 'nuget_id', 'Tags': 'tags__name'}
+_LOWERCASE_FIELDS = {'nuget_id__iexact': 'nuget_id_lower'}
+"""Indexed lowercase columns used for ``tolower(field) eq 'value'``."""
 
 
 def setup_p0(p: yacc.YaccProduction) -> None:
@@ -86,7 +92,10 @@ def p_expression_op(p: yacc.YaccProduction) -> None:
         else:  # eq
             if not isinstance(b, int | str):
                 raise InvalidTypeForEq
-            p[0] &= Q(**{db_field: b})
+            if db_field in _LOWERCASE_FIELDS and isinstance(b, str):
+                p[0] &= Q(**{_LOWERCASE_FIELDS[db_field]: b.lower()})
+            else:
+                p[0] &= Q(**{db_field: b})
 
 
 def p_expression_str(p: yacc.YaccProduction) -> None:
@@ -124,3 +133,40 @@ def p_error(p: LexToken) -> None:
 
 parser = yacc.yacc(debug=False)
 """An extremely basic parser for parsing ``$filter`` strings. Returns a ``Q`` instance."""
+
+PARSE_CACHE_SIZE = 256
+"""Number of parsed ``$filter`` values kept by :py:func:`parse_filter`."""
+_parse_cache: OrderedDict[str, Q] = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def parse_filter(value: str) -> Q:
+    """
+    Parse an OData ``$filter`` value, reusing the result for values parsed recently.
+
+    Clients send the same few filters over and over, so the last :py:data:`PARSE_CACHE_SIZE`
+    results are kept. The returned object is shared and must not be modified. Filters that fail to
+    parse raise the parser's exception and are not cached.
+
+    Parameters
+    ----------
+    value : str
+        The filter.
+
+    Returns
+    -------
+    Q
+        The filter as a query condition.
+    """
+    with _parse_cache_lock:
+        if (q := _parse_cache.get(value)) is not None:
+            _parse_cache.move_to_end(value)
+            FILTER_PARSE_CACHE.inc(result='hit')
+            return q
+    FILTER_PARSE_CACHE.inc(result='miss')
+    q = cast('Q', parser.parse(value))
+    with _parse_cache_lock:
+        _parse_cache[value] = q
+        while len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return q
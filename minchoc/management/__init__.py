@@ -0,0 +1,2 @@
+"""Management command support."""
+from __future__ import annotations
@@ -0,0 +1,2 @@
+"""Management commands."""
+from __future__ import annotations
@@ -0,0 +1,47 @@
+"""List the packages that depend on a package identifier."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from django.core.management.base import BaseCommand, CommandError
+from minchoc.dependencies import find_dependents
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+
+class Command(BaseCommand):
+    """List the packages that depend on a package identifier."""
+    help = ('List the packages that depend on a package identifier, for example before deleting '
+            'it. Uses the dependency index, so no package files are read.')
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('nuget_id', metavar='ID', help='Package identifier.')
+        parser.add_argument('-r',
+                            '--range',
+                            default='',
+                            help='Only list dependents whose declared range has a version in '
+                            'common with this NuGet version range, e.g. "[1.0]".')
+        parser.add_argument('--latest-only',
+                            action='store_true',
+                            help='Only list the latest version of each dependent.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            queryset = find_dependents(options['nuget_id'],
+                                       options['range'],
+                                       latest_only=options['latest_only'])
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        count = 0
+        for package in queryset.iterator(chunk_size=2000):
+            count += 1
+            ranges = ', '.join(' '.join(x for x in (row.version_range or '*', row.target_framework)
+                                        if x) for row in package.declared_dependencies.all())
+            self.stdout.write(f'{package.nuget_id} {package.version} {ranges}')
+        self.stdout.write(self.style.SUCCESS(f'{count} dependents of {options["nuget_id"]}.'))
@@ -0,0 +1,142 @@
+"""Write a snapshot of the package catalog."""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from minchoc import __version__
+from minchoc.models import Author, NugetUser, Package, Tag
+from minchoc.snapshot import (
+    SNAPSHOT_FORMAT,
+    SNAPSHOT_PACKAGE_FIELDS,
+    SnapshotJSONEncoder,
+    open_snapshot,
+)
+from minchoc.utils import hash_file
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+_CHUNK_SIZE = 500
+
+
+def _export_blob(package: Package, blobs: Path | None, *, link: bool) -> str | None:
+    """
+    Hash the file of a package and optionally copy or hard link it.
+
+    Parameters
+    ----------
+    package : Package
+        The package.
+    blobs : Path | None
+        Directory to copy the file to, keeping its storage name.
+    link : bool
+        Hard link the file instead of copying it if the storage is on the local file system.
+
+    Returns
+    -------
+    str | None
+        Base64-encoded SHA512 digest of the file, or ``None`` if it is missing from storage.
+    """
+    storage = package.file.storage
+    name = package.file.name
+    if not name or not storage.exists(name):
+        return None
+    dest = None if blobs is None else blobs / name
+    if dest is not None:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if link:
+            try:
+                os.link(storage.path(name), dest)
+            except (NotImplementedError, OSError):
+                pass
+            else:
+                dest = None
+    with storage.open(name, 'rb') as f:
+        if dest is None:
+            return hash_file(f)
+        with dest.open('wb') as out:
+            return hash_file(f, out)
+
+
+class Command(BaseCommand):
+    """Write a snapshot of the package catalog."""
+    help = ('Write a line-delimited JSON snapshot of users, tags, authors and packages, including '
+            'unlisted packages.')
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('output',
+                            help='Snapshot file to write. It is gzip compressed if the name ends '
+                            'with .gz.')
+        parser.add_argument('--blobs', help='Directory to copy package files to.')
+        parser.add_argument('--link',
+                            action='store_true',
+                            help='Hard link package files into the blobs directory where possible.')
+        parser.add_argument('-j',
+                            '--jobs',
+                            default=min(32, (os.cpu_count() or 1) + 4),
+                            type=int,
+                            help='Number of threads used to hash and copy package files.')
+        parser.add_argument('--exclude-tokens',
+                            action='store_true',
+                            help='Leave out the API tokens of users. Restored users keep their '
+                            'token or get a new one.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        blobs = Path(options['blobs']) if options['blobs'] else None
+        export_blob = partial(_export_blob, blobs=blobs, link=options['link'])
+        count = 0
+        jobs = max(options['jobs'], 1)
+        with open_snapshot(options['output'], 'w') as f, ThreadPoolExecutor(jobs) as executor:
+
+            def write(record: dict[str, Any]) -> None:
+                f.write(json.dumps(record, cls=SnapshotJSONEncoder, separators=(',', ':')))
+                f.write('\n')
+
+            write({'type': 'header', 'format': SNAPSHOT_FORMAT, 'minchoc': __version__})
+            for user in NugetUser._default_manager.select_related('base', 'company').order_by('pk'):
+                record = {
+                    'type': 'user',
+                    'username': user.base.get_username(),
+                    'token': user.token,
+                    'company': user.company.name if user.company else None
+                }
+                if options['exclude_tokens']:
+                    del record['token']
+                write(record)
+            for name in Tag._default_manager.order_by('pk').values_list('name', flat=True):
+                write({'type': 'tag', 'name': name})
+            for name in Author._default_manager.order_by('pk').values_list('name', flat=True):
+                write({'type': 'author', 'name': name})
+            packages = (Package._default_manager.select_related('uploader__base').prefetch_related(
+                'tags', 'authors').order_by('pk').iterator(chunk_size=_CHUNK_SIZE))
+            while chunk := list(islice(packages, _CHUNK_SIZE)):
+                for package, sha512 in zip(chunk, executor.map(export_blob, chunk), strict=True):
+                    if sha512 is None:
+                        self.stderr.write(f'File of {package.nuget_id} {package.version} is '
+                                          'missing from storage.')
+                    write({
+                        'type': 'package',
+                        **{
+                            x.attname: x.value_from_object(package)
+                            for x in SNAPSHOT_PACKAGE_FIELDS
+                        }, 'authors': [x.name for x in package.authors.all()],
+                        'file': package.file.name,
+                        'sha512': sha512,
+                        'tags': [x.name for x in package.tags.all()],
+                        'uploader': package.uploader.base.get_username()
+                    })
+                count += len(chunk)
+                self.stdout.write(f'{count} packages exported.')
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} packages.'))
@@ -0,0 +1,43 @@
+"""Export daily download counts as CSV."""
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, Any
+import csv
+
+from django.core.management.base import BaseCommand
+from minchoc.downloads import download_series
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+
+class Command(BaseCommand):
+    """Export daily download counts as CSV."""
+    help = 'Write the number of downloads per day and package as CSV.'
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--id', dest='nuget_id', help='Only export this package identifier.')
+        parser.add_argument('--since',
+                            type=date.fromisoformat,
+                            help='First day to export, e.g. 2026-01-31.')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day to export.')
+        parser.add_argument('--by-id',
+                            action='store_true',
+                            help='Sum the versions of each identifier.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        by_version = not options['by_id']
+        fields = ['day', 'nuget_id', *(['version'] if by_version else []), 'downloads']
+        writer = csv.DictWriter(self.stdout, fields, lineterminator='\n')
+        writer.writeheader()
+        for row in download_series(options['nuget_id'],
+                                   options['since'],
+                                   options['until'],
+                                   by_version=by_version).iterator(chunk_size=2000):
+            writer.writerow(row)
@@ -0,0 +1,205 @@
+"""Import a directory or tarball of ``.nupkg`` files."""
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import monotonic
+from typing import TYPE_CHECKING, Any, NamedTuple
+import os
+import shutil
+import tarfile
+import zipfile
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from minchoc.models import NugetUser, Package
+from minchoc.nuspec import NuspecError, nupkg_values
+from minchoc.signals import package_changed
+from minchoc.utils import apply_nuspec_values, apply_version_fields, bulk_create_packages
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+
+class _Pending(NamedTuple):
+    package: Package
+    path: Path
+    tag_names: list[str]
+    author_names: list[str]
+
+
+def _extract_tarball(tarball: Path, dest: Path) -> list[Path]:
+    """
+    Extract the ``.nupkg`` members of a tarball.
+
+    Members are written with generated names so that no path inside the archive is trusted.
+
+    Parameters
+    ----------
+    tarball : Path
+        The tarball.
+    dest : Path
+        Directory to extract to.
+
+    Returns
+    -------
+    list[Path]
+        Paths to the extracted packages.
+    """
+    ret: list[Path] = []
+    with tarfile.open(tarball) as tar:
+        for i, member in enumerate(tar):
+            if (not member.isfile() or not member.name.lower().endswith('.nupkg')
+                    or (f := tar.extractfile(member)) is None):
+                continue
+            target = dest / f'{i}.nupkg'
+            with f, target.open('wb') as out:
+                shutil.copyfileobj(f, out)
+            ret.append(target)
+    return ret
+
+
+def _prepare(path: Path, values: dict[str, str], uploader: NugetUser) -> _Pending:
+    """
+    Build an unsaved package from the nuspec values of a package file.
+
+    Parameters
+    ----------
+    path : Path
+        The package file.
+    values : dict[str, str]
+        Values returned by :py:func:`minchoc.nuspec.nupkg_values`.
+    uploader : NugetUser
+        The user to record as the uploader.
+
+    Returns
+    -------
+    _Pending
+        The package with the names of its tags and authors.
+
+    Raises
+    ------
+    NuspecError
+        If the nuspec has no ``id`` or ``version``.
+    """
+    if 'nuget_id' not in values or 'version' not in values:
+        msg = 'Missing id or version'
+        raise NuspecError(msg)
+    package = Package(uploader=uploader, size=path.stat().st_size)
+    tag_names, author_names = apply_nuspec_values(package, values)
+    apply_version_fields(package)
+    return _Pending(package, path, tag_names, author_names)
+
+
+def _insert_batch(batch: list[_Pending]) -> None:
+    """
+    Store the files of a batch of packages and insert the rows in bulk.
+
+    Stored files are deleted again if the batch cannot be inserted.
+
+    Parameters
+    ----------
+    batch : list[_Pending]
+        The packages to insert.
+    """
+    stored: list[Package] = []
+    try:
+        for item in batch:
+            with item.path.open('rb') as f:
+                item.package.file.save(f'{item.package.nuget_id}.{item.package.version}.nupkg',
+                                       File(f),
+                                       save=False)
+            stored.append(item.package)
+        bulk_create_packages((x.package, x.tag_names, x.author_names) for x in batch)
+    except Exception:
+        for package in stored:
+            package.file.delete(save=False)
+        raise
+    for nuget_id in sorted({x.package.nuget_id for x in batch}):
+        package_changed.send_robust(sender=Package, nuget_id=nuget_id)
+
+
+class Command(BaseCommand):
+    """Import a directory or tarball of ``.nupkg`` files."""
+    help = 'Import a directory or tarball of .nupkg files.'
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('source', help='Directory or tarball containing .nupkg files.')
+        parser.add_argument('-u',
+                            '--uploader',
+                            required=True,
+                            help='Username of the user to record as the uploader.')
+        parser.add_argument('-b',
+                            '--batch-size',
+                            default=500,
+                            type=int,
+                            help='Number of packages to insert per transaction.')
+        parser.add_argument('-j',
+                            '--jobs',
+                            default=os.cpu_count() or 1,
+                            type=int,
+                            help='Number of processes used to parse nuspec files.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        source = Path(options['source'])
+        uploader = NugetUser._default_manager.filter(base__username=options['uploader']).first()
+        if uploader is None:
+            msg = f'No NuGet user with username {options["uploader"]!r}.'
+            raise CommandError(msg)
+        with TemporaryDirectory(suffix='.minchoc-import') as temp_dir:
+            if source.is_dir():
+                paths = sorted(x for x in source.rglob('*') if x.suffix.lower() == '.nupkg')
+            elif source.is_file() and tarfile.is_tarfile(source):
+                paths = _extract_tarball(source, Path(temp_dir))
+            else:
+                msg = f'{source} is not a directory or a tarball.'
+                raise CommandError(msg)
+            jobs = max(options['jobs'], 1)
+            with (ThreadPoolExecutor(1) if jobs == 1 else ProcessPoolExecutor(jobs)) as executor:
+                self._import(executor, paths, uploader, max(options['batch_size'], 1))
+
+    def _import(self, executor: Executor, paths: Iterable[Path], uploader: NugetUser,
+                batch_size: int) -> None:
+        # Packages that are already present are skipped, so an interrupted import can be resumed
+        # by running the same command again.
+        seen = set(Package._default_manager.values_list('nuget_id', 'version'))
+        futures = [(path, executor.submit(nupkg_values, path)) for path in paths]
+        total = len(futures)
+        imported = skipped = failed = 0
+        start = monotonic()
+        batch: list[_Pending] = []
+        for i, (path, future) in enumerate(futures, 1):
+            try:
+                item = _prepare(path, future.result(), uploader)
+            except (NuspecError, OSError, SyntaxError, ValueError, zipfile.BadZipFile) as e:
+                self.stderr.write(f'Skipping {path}: {e}')
+                failed += 1
+                continue
+            key = (item.package.nuget_id, item.package.version)
+            if key in seen:
+                skipped += 1
+                continue
+            seen.add(key)
+            batch.append(item)
+            if len(batch) >= batch_size:
+                _insert_batch(batch)
+                imported += len(batch)
+                batch = []
+                self.stdout.write(f'{i}/{total} processed, {imported} imported '
+                                  f'({imported / (monotonic() - start):.1f} packages/s).')
+        if batch:
+            _insert_batch(batch)
+            imported += len(batch)
+        elapsed = monotonic() - start
+        self.stdout.write(
+            self.style.SUCCESS(f'Imported {imported} packages in {elapsed:.1f} s '
+                               f'({imported / elapsed if elapsed else 0:.1f} packages/s). '
+                               f'Skipped {skipped} already present, {failed} failed.'))
@@ -0,0 +1,64 @@
+"""Pre-render static feeds for read-only mirrors."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from minchoc.models import Package
+from minchoc.static_feeds import (
+    FIND_PACKAGES_BY_ID_DIR,
+    render_static_feeds,
+    static_feed_host,
+    static_feed_root,
+)
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+
+class Command(BaseCommand):
+    """Pre-render static feeds for read-only mirrors."""
+    help = ('Render the FindPackagesById() and Packages(Id=...,Version=...) feeds of every package '
+            'to static files.')
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('nuget_ids',
+                            metavar='ID',
+                            nargs='*',
+                            help='Only render these package identifiers.')
+        parser.add_argument('-o',
+                            '--output',
+                            help='Output directory. Defaults to settings.MINCHOC_STATIC_FEED_ROOT.')
+        parser.add_argument('--host',
+                            help='Protocol and hostname prefix for URLs. Defaults to '
+                            'settings.MINCHOC_STATIC_FEED_HOST.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        root = Path(options['output']) if options['output'] else static_feed_root()
+        if root is None:
+            msg = 'Pass --output or set MINCHOC_STATIC_FEED_ROOT.'
+            raise CommandError(msg)
+        host = options['host'].rstrip('/') if options['host'] else static_feed_host()
+        nuget_ids: list[str] = options['nuget_ids']
+        if not nuget_ids:
+            nuget_ids = list(
+                Package._default_manager.order_by('nuget_id').values_list('nuget_id',
+                                                                          flat=True).distinct())
+            # Identifiers that were rendered before but no longer have any packages.
+            nuget_ids.extend(
+                sorted({x.stem
+                        for x in (root / FIND_PACKAGES_BY_ID_DIR).glob('*.xml')} - set(nuget_ids)))
+        files = 0
+        for i, nuget_id in enumerate(nuget_ids, 1):
+            files += async_to_sync(render_static_feeds)(root, host, nuget_id)
+            if i % 100 == 0:
+                self.stdout.write(f'{i}/{len(nuget_ids)} identifiers rendered.')
+        self.stdout.write(
+            self.style.SUCCESS(f'Rendered {files} files for {len(nuget_ids)} identifiers.'))
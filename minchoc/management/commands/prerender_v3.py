@@ -0,0 +1,70 @@
+"""Pre-render NuGet v3 resources to static files."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from minchoc.models import Package
+from minchoc.v3 import (
+    FLAT_CONTAINER_DIR,
+    REGISTRATION_DIR,
+    render_v3,
+    v3_base_url,
+    v3_root,
+    write_service_index,
+)
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+
+class Command(BaseCommand):
+    """Pre-render NuGet v3 resources to static files."""
+    help = ('Render the NuGet v3 service index, flat container and registration files of every '
+            'package to static files.')
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('nuget_ids',
+                            metavar='ID',
+                            nargs='*',
+                            help='Only render these package identifiers.')
+        parser.add_argument('-o',
+                            '--output',
+                            help='Output directory. Defaults to settings.MINCHOC_V3_ROOT.')
+        parser.add_argument('--base-url',
+                            help='URL the output directory is served at. Defaults to '
+                            'settings.MINCHOC_V3_BASE_URL.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        root = Path(options['output']) if options['output'] else v3_root()
+        if root is None:
+            msg = 'Pass --output or set MINCHOC_V3_ROOT.'
+            raise CommandError(msg)
+        base_url = options['base_url'].rstrip('/') if options['base_url'] else v3_base_url()
+        write_service_index(root, base_url)
+        nuget_ids: list[str] = options['nuget_ids']
+        if not nuget_ids:
+            nuget_ids = list(
+                Package._default_manager.order_by('nuget_id_lower').values_list(
+                    'nuget_id_lower', flat=True).distinct())
+            # Identifiers that were rendered before but no longer have any packages.
+            nuget_ids.extend(
+                sorted({
+                    x.name
+                    for directory in (FLAT_CONTAINER_DIR, REGISTRATION_DIR)
+                    for x in (root / directory).glob('*') if x.is_dir()
+                } - set(nuget_ids)))
+        files = 0
+        for i, nuget_id in enumerate(nuget_ids, 1):
+            files += async_to_sync(render_v3)(root, base_url, nuget_id)
+            if i % 100 == 0:
+                self.stdout.write(f'{i}/{len(nuget_ids)} identifiers rendered.')
+        self.stdout.write(
+            self.style.SUCCESS(f'Rendered {files} files for {len(nuget_ids)} identifiers.'))
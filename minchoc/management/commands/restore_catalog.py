@@ -0,0 +1,249 @@
+"""Restore a snapshot of the package catalog."""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+import json
+import os
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from minchoc.models import Author, Company, NugetUser, Package, Tag
+from minchoc.signals import package_changed
+from minchoc.snapshot import SNAPSHOT_FORMAT, SNAPSHOT_PACKAGE_FIELDS, open_snapshot
+from minchoc.utils import (
+    apply_version_fields,
+    bulk_create_packages,
+    get_or_create_by_name,
+    hash_file,
+)
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from django.contrib.auth.models import AbstractUser
+    from django.core.management.base import CommandParser
+
+__all__ = ('Command',)
+
+_PackageItem = tuple[Package, list[str], list[str]]
+
+
+def _restore_user(record: dict[str, Any]) -> NugetUser:
+    """
+    Get or create the user described by a snapshot record.
+
+    Parameters
+    ----------
+    record : dict[str, Any]
+        The ``user`` record.
+
+    Returns
+    -------
+    NugetUser
+        The NuGet user, with the token from the snapshot if it has one.
+
+    Raises
+    ------
+    CommandError
+        If the token of the record belongs to another user.
+    """
+    # Every user model has USERNAME_FIELD, but the stubs only declare it on AbstractUser.
+    user_model = cast('type[AbstractUser]', get_user_model())
+    username_field = user_model.USERNAME_FIELD
+    defaults: dict[str, Any] = {}
+    if record.get('token'):
+        defaults['token'] = uuid.UUID(record['token'])
+        same_user = {f'base__{username_field}': record['username']}
+        if NugetUser._default_manager.filter(token=defaults['token']).exclude(**same_user).exists():
+            msg = f'The token of {record["username"]} belongs to another user.'
+            raise CommandError(msg)
+    user, _ = user_model._default_manager.get_or_create(**{username_field: record['username']})
+    defaults['company'] = (Company._default_manager.get_or_create(
+        name=record['company'])[0] if record['company'] else None)
+    nuget_user: NugetUser = NugetUser._default_manager.update_or_create(base=user,
+                                                                        defaults=defaults)[0]
+    return nuget_user
+
+
+def _package_from_record(record: dict[str, Any], users: dict[str, NugetUser]) -> _PackageItem:
+    """
+    Build an unsaved package from a snapshot record.
+
+    Raises ``ValueError`` if the record has no version sort key and its version is invalid.
+
+    Parameters
+    ----------
+    record : dict[str, Any]
+        The ``package`` record.
+    users : dict[str, NugetUser]
+        Restored users by username.
+
+    Returns
+    -------
+    tuple[Package, list[str], list[str]]
+        The package with the names of its tags and authors.
+    """
+    package = Package(uploader=users[record['uploader']])
+    for field in SNAPSHOT_PACKAGE_FIELDS:
+        if field.attname in record:
+            setattr(package, field.attname, field.to_python(record[field.attname]))
+    if not package.version_sort_key:
+        # Snapshots written before the version sort key was added.
+        apply_version_fields(package)
+    package.file.name = record['file']
+    return package, record['tags'], record['authors']
+
+
+def _restore_blob(package: Package, sha512: str | None, blobs: Path) -> None:
+    """
+    Verify a package file from a blobs directory and save it to storage.
+
+    Parameters
+    ----------
+    package : Package
+        The package. Its file name is the name in the blobs directory.
+    sha512 : str | None
+        The expected digest, if known.
+    blobs : Path
+        The blobs directory.
+
+    Raises
+    ------
+    CommandError
+        If the file does not match the digest.
+    """
+    src = blobs / cast('str', package.file.name)
+    with src.open('rb') as f:
+        if sha512 and hash_file(f) != sha512:
+            msg = f'Checksum mismatch for {src}.'
+            raise CommandError(msg)
+        f.seek(0)
+        package.file.name = package.file.storage.save(package.file.name, File(f))
+
+
+def _restore_blobs(executor: Executor, batch: list[tuple[_PackageItem, str | None]],
+                   blobs: Path) -> None:
+    """
+    Verify and store the files of a batch of packages in parallel.
+
+    If any file cannot be stored, the files that were stored are deleted again.
+
+    Parameters
+    ----------
+    executor : Executor
+        Executor to run :py:func:`_restore_blob` in.
+    batch : list[tuple[tuple[Package, list[str], list[str]], str | None]]
+        The packages with their expected digests.
+    blobs : Path
+        The blobs directory.
+    """
+    futures = [(item[0], executor.submit(_restore_blob, item[0], sha512, blobs))
+               for item, sha512 in batch]
+    wait([future for _, future in futures])
+    if errors := [e for _, future in futures if (e := future.exception()) is not None]:
+        for package, future in futures:
+            if future.exception() is None:
+                package.file.delete(save=False)
+        raise errors[0]
+
+
+class Command(BaseCommand):
+    """Restore a snapshot of the package catalog."""
+    help = 'Restore a snapshot written by export_catalog.'
+
+    @override
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('snapshot', help='Snapshot file written by export_catalog.')
+        parser.add_argument('--blobs',
+                            help='Directory of package files written by export_catalog --blobs. '
+                            'Without this option the files must already be in storage.')
+        parser.add_argument('-b',
+                            '--batch-size',
+                            default=1000,
+                            type=int,
+                            help='Number of packages to insert per transaction.')
+        parser.add_argument('-j',
+                            '--jobs',
+                            default=min(32, (os.cpu_count() or 1) + 4),
+                            type=int,
+                            help='Number of threads used to verify and store package files.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        blobs = Path(options['blobs']) if options['blobs'] else None
+        batch_size = max(options['batch_size'], 1)
+        seen = set(Package._default_manager.values_list('nuget_id', 'version'))
+        users: dict[str, NugetUser] = {}
+        names: dict[type[Author | Tag], list[str]] = {Author: [], Tag: []}
+        batch: list[tuple[_PackageItem, str | None]] = []
+        restored = skipped = failed = 0
+        jobs = max(options['jobs'], 1)
+        with open_snapshot(options['snapshot'], 'r') as f, ThreadPoolExecutor(jobs) as executor:
+            header = json.loads(f.readline() or 'null')
+            if (not isinstance(header, dict) or header.get('type') != 'header'
+                    or header.get('format') != SNAPSHOT_FORMAT):
+                msg = 'Not a supported snapshot.'
+                raise CommandError(msg)
+            for line in f:
+                record = json.loads(line)
+                match record['type']:
+                    case 'user':
+                        users[record['username']] = _restore_user(record)
+                    case 'author':
+                        names[Author].append(record['name'])
+                    case 'tag':
+                        names[Tag].append(record['name'])
+                    case 'package':
+                        key = (record['nuget_id'], record['version'])
+                        if key in seen:
+                            skipped += 1
+                            continue
+                        try:
+                            item = _package_from_record(record, users)
+                        except ValueError as e:
+                            self.stderr.write(f'Skipping {key[0]} {key[1]}: {e}')
+                            failed += 1
+                            continue
+                        seen.add(key)
+                        batch.append((item, record['sha512']))
+                        if len(batch) >= batch_size:
+                            restored += self._restore_batch(executor, batch, blobs)
+                            batch = []
+                            self.stdout.write(f'{restored} packages restored.')
+                    case other:  # pragma no cover
+                        self.stderr.write(f'Ignoring unknown record type {other!r}.')
+            if batch:
+                restored += self._restore_batch(executor, batch, blobs)
+        # Tags and authors not used by any package.
+        get_or_create_by_name(Author, names[Author])
+        get_or_create_by_name(Tag, names[Tag])
+        self.stdout.write(
+            self.style.SUCCESS(f'Restored {restored} packages. Skipped {skipped} already present, '
+                               f'{failed} failed.'))
+
+    @staticmethod
+    def _restore_batch(executor: Executor, batch: list[tuple[_PackageItem, str | None]],
+                       blobs: Path | None) -> int:
+        items = [item for item, _ in batch]
+        published = [package.published for package, _, __ in items]
+        if blobs is not None:
+            _restore_blobs(executor, batch, blobs)
+        try:
+            packages = bulk_create_packages(items)
+        except Exception:
+            if blobs is not None:
+                for package, _, __ in items:
+                    package.file.delete(save=False)
+            raise
+        # ``published`` is set automatically on insert, so it is restored afterwards.
+        for package, value in zip(packages, published, strict=True):
+            package.published = value
+        Package._default_manager.bulk_update(packages, ['published'])
+        for nuget_id in sorted({x.nuget_id for x in packages}):
+            package_changed.send_robust(sender=Package, nuget_id=nuget_id)
+        return len(packages)
@@ -0,0 +1,21 @@
+"""Roll up daily download counts into package download counts."""
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from minchoc.downloads import rollup_downloads
+from typing_extensions import override
+
+__all__ = ('Command',)
+
+
+class Command(BaseCommand):
+    """Roll up daily download counts into package download counts."""
+    help = ('Add daily download counts that were not rolled up yet to the download count of each '
+            'package. Safe to run at any time, e.g. from cron.')
+
+    @override
+    def handle(self, *args: Any, **options: Any) -> None:
+        count = rollup_downloads()
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {count} downloads.'))
@@ -0,0 +1,434 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Metrics are kept in memory in each process and rendered by :py:func:`render_metrics`, which the
+view at ``settings.MINCHOC_METRICS_URL`` (for example ``metrics``; the view is not routed if it is
+not set) returns. No client library or external service is needed. With several worker processes,
+each one has its own values, so scrape every process or run a single process per host.
+
+Add :py:class:`MetricsMiddleware` to ``settings.MIDDLEWARE`` to record the latency, number of
+database queries and response size of every request, labelled with the name of the view. Other
+metrics are recorded wherever the work is done:
+
+- ``minchoc_feed_entries``: entries per rendered feed.
+- ``minchoc_filter_parse_cache_total``: ``$filter`` parse cache hits and misses.
+- ``minchoc_storage_seconds``: package file reads, saves and deletions.
+- ``minchoc_upload_phase_seconds``: the phases of an upload (``read``, ``validate``, ``store`` and
+  ``insert``).
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, cast
+import math
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Generator, Iterator, Sequence
+
+    from django.db.backends.base.base import BaseDatabaseWrapper
+    from django.http import HttpRequest
+    from django.http.response import HttpResponseBase
+
+__all__ = ('COUNT_BUCKETS', 'DB_QUERIES', 'DURATION_BUCKETS', 'FEED_ENTRIES', 'FILTER_PARSE_CACHE',
+           'REQUEST_DURATION', 'RESPONSE_BYTES', 'STORAGE_DURATION', 'UPLOAD_PHASE_DURATION',
+           'Counter', 'Histogram', 'MetricsMiddleware', 'clear', 'connection_created_receiver',
+           'count_queries', 'render_metrics')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Default histogram buckets for durations in seconds."""
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+"""Histogram buckets for counts such as queries per request."""
+
+_registry: list[_Metric] = []
+_query_count: ContextVar[list[int] | None] = ContextVar('minchoc_query_count', default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return f'{{{",".join(pairs)}}}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class _Metric(ABC):
+    """
+    Base class of metrics.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    description : str
+        Help text.
+    label_names : Sequence[str]
+        Names of the labels every sample has.
+    """
+    kind = ''
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[x]) for x in self.label_names)
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Reset all values."""
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """
+        Render the samples.
+
+        Yields
+        ------
+        str
+            Sample lines.
+        """
+
+    def render(self) -> str:
+        """
+        Render the metric with its help and type lines.
+
+        Returns
+        -------
+        str
+            The lines of the metric.
+        """
+        return '\n'.join((f'# HELP {self.name} {_escape(self.description)}',
+                          f'# TYPE {self.name} {self.kind}', *self.samples()))
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, description, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increase the value.
+
+        Parameters
+        ----------
+        amount : float
+            The increase.
+        **labels : str
+            A value for each label name.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        """
+        Get the value.
+
+        Parameters
+        ----------
+        **labels : str
+            A value for each label name.
+
+        Returns
+        -------
+        float
+            The value, ``0`` if it was never increased.
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    @override
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    @override
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}'
+
+
+class Histogram(_Metric):
+    """
+    Observations counted in cumulative buckets.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    description : str
+        Help text.
+    label_names : Sequence[str]
+        Names of the labels every sample has.
+    buckets : Sequence[float]
+        Upper bounds of the buckets, in increasing order. ``+Inf`` is added.
+    """
+    kind = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS) -> None:
+        super().__init__(name, description, label_names)
+        self.buckets = (*buckets, math.inf)
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record an observation.
+
+        Parameters
+        ----------
+        value : float
+            The observed value.
+        **labels : str
+            A value for each label name.
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Generator[None, None, None]:
+        """
+        Observe the duration of a block in seconds.
+
+        Parameters
+        ----------
+        **labels : str
+            A value for each label name.
+
+        Yields
+        ------
+        None
+            Nothing.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        """
+        Get the number of observations.
+
+        Parameters
+        ----------
+        **labels : str
+            A value for each label name.
+
+        Returns
+        -------
+        int
+            The number of observations.
+        """
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([], [0.0]))
+            return sum(counts)
+
+    @override
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    @override
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted((k, (list(c), t[0])) for k, (c, t) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts, strict=True):
+                cumulative += n
+                labels = _format_labels(self.label_names, key, f'le="{_format_number(bound)}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.label_names, key)
+            yield f'{self.name}_sum{labels} {_format_number(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+REQUEST_DURATION = Histogram('minchoc_request_duration_seconds', 'Time taken to answer a request.',
+                             ('view', 'method'))
+DB_QUERIES = Histogram('minchoc_request_db_queries', 'Database queries made to answer a request.',
+                       ('view',), COUNT_BUCKETS)
+RESPONSE_BYTES = Counter('minchoc_response_bytes_total', 'Bytes of response bodies sent.',
+                         ('view',))
+FEED_ENTRIES = Histogram('minchoc_feed_entries', 'Entries per rendered feed.', (),
+                         (0, 1, 10, 30, 100, 300, 1000, 3000))
+FILTER_PARSE_CACHE = Counter('minchoc_filter_parse_cache_total',
+                             'Lookups in the $filter parse cache.', ('result',))
+STORAGE_DURATION = Histogram('minchoc_storage_seconds', 'Time taken by package file operations.',
+                             ('operation',))
+UPLOAD_PHASE_DURATION = Histogram('minchoc_upload_phase_seconds',
+                                  'Time taken by each phase of a package upload.', ('phase',))
+
+
+def render_metrics() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns
+    -------
+    str
+        The exposition, ending with a newline.
+    """
+    return '\n'.join(x.render() for x in _registry) + '\n'
+
+
+def clear() -> None:
+    """Reset every metric."""
+    for metric in _registry:
+        metric.clear()
+
+
+def _count_query(
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,  # ruff:ignore[boolean-type-hint-positional-argument]
+        context: dict[str, Any]) -> Any:
+    if (count := _query_count.get()) is not None:
+        count[0] += 1
+    return execute(sql, params, many, context)
+
+
+def connection_created_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        connection: BaseDatabaseWrapper,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Count the queries of each new database connection.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    connection : BaseDatabaseWrapper
+        The new connection.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextmanager
+def count_queries() -> Generator[list[int], None, None]:
+    """
+    Count the database queries made in a block.
+
+    Queries made by ``sync_to_async`` functions called in the block are counted too. Only
+    connections created after the app was loaded are counted.
+
+    Yields
+    ------
+    list[int]
+        A list whose only item is the number of queries so far.
+    """
+    queries = [0]
+    token = _query_count.set(queries)
+    try:
+        yield queries
+    finally:
+        _query_count.reset(token)
+
+
+def _view_name(request: HttpRequest) -> str:
+    if (match := request.resolver_match) is None:
+        return 'unmatched'
+    func = getattr(match.func, 'view_class', match.func)
+    return str(getattr(func, '__name__', match.view_name))
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, database queries and response size of each request.
+
+    Parameters
+    ----------
+    get_response : Callable[[HttpRequest], HttpResponse | Awaitable[HttpResponse]]
+        The next middleware or view.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(
+            self, get_response: Callable[[HttpRequest],
+                                         HttpResponse | Awaitable[HttpResponse]]) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _record(request: HttpRequest, response: HttpResponseBase, start: float,
+                queries: int) -> None:
+        view = _view_name(request)
+        REQUEST_DURATION.observe(perf_counter() - start, view=view, method=request.method or '')
+        DB_QUERIES.observe(queries, view=view)
+        if isinstance(response, HttpResponse):
+            RESPONSE_BYTES.inc(len(response.content), view=view)
+        elif response.has_header('Content-Length'):
+            # Streaming responses such as package downloads are counted by their declared length.
+            RESPONSE_BYTES.inc(int(response['Content-Length']), view=view)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        """
+        Handle a request.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            The request.
+
+        Returns
+        -------
+        Any
+            The response, or an awaitable of it when called asynchronously.
+        """
+        if self.is_async:
+            return self._acall(request)
+        start = perf_counter()
+        with count_queries() as queries:
+            response = cast('HttpResponse', self.get_response(request))
+        self._record(request, response, start, queries[0])
+        return response
+
+    async def _acall(self, request: HttpRequest) -> HttpResponse:
+        start = perf_counter()
+        with count_queries() as queries:
+            response = await cast('Awaitable[HttpResponse]', self.get_response(request))
+        self._record(request, response, start, queries[0])
+        return response
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:47
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.db import migrations, models
+from minchoc.versions import parse_version, version_sort_key
+
+if TYPE_CHECKING:
+    from django.apps.registry import Apps
+    from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def fill_version_fields(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    package_model = apps.get_model('minchoc', 'Package')  # type: ignore[misc]
+    db_alias = schema_editor.connection.alias
+    packages = []
+    for package in package_model._default_manager.using(db_alias).iterator():
+        try:
+            parsed = parse_version(package.version)
+        except ValueError:
+            continue
+        package.version_beta = parsed.prerelease
+        package.is_prerelease = parsed.is_prerelease
+        package.version_sort_key = version_sort_key(parsed)[:255]
+        packages.append(package)
+    package_model._default_manager.using(db_alias).bulk_update(
+        packages, ['is_prerelease', 'version_beta', 'version_sort_key'], batch_size=500)
+    latest: dict[str, tuple[str, int]] = {}
+    absolute_latest: dict[str, tuple[str, int]] = {}
+    for pk, nuget_id, key, is_prerelease in package_model._default_manager.using(db_alias).filter(
+            listed=True).values_list('pk', 'nuget_id', 'version_sort_key', 'is_prerelease'):
+        if nuget_id not in absolute_latest or absolute_latest[nuget_id] < (key, pk):
+            absolute_latest[nuget_id] = (key, pk)
+        if not is_prerelease and (nuget_id not in latest or latest[nuget_id] < (key, pk)):
+            latest[nuget_id] = (key, pk)
+    package_model._default_manager.using(db_alias).update(
+        is_latest_version=models.Case(models.When(pk__in=[x[1] for x in latest.values()],
+                                                  then=models.Value(True)),
+                                      default=models.Value(False)),
+        is_absolute_latest_version=models.Case(models.When(
+            pk__in=[x[1] for x in absolute_latest.values()], then=models.Value(True)),
+                                               default=models.Value(False)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0002_alter_company_options_alter_package_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='version_sort_key',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['nuget_id', 'version_sort_key'],
+                               name='package_id_version_key_idx'),
+        ),
+        migrations.RunPython(fill_version_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:50
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.db import migrations, models
+from minchoc.search import search_terms
+import django.db.models.deletion
+
+if TYPE_CHECKING:
+    from django.apps.registry import Apps
+    from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def index_packages(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    package_model = apps.get_model('minchoc', 'Package')  # type: ignore[misc]
+    term_model = apps.get_model('minchoc', 'PackageSearchTerm')  # type: ignore[misc]
+    db_alias = schema_editor.connection.alias
+    terms: list[models.Model] = []
+    for package in package_model._default_manager.using(db_alias).prefetch_related('tags'):
+        terms.extend(
+            term_model(package_id=package.pk, term=term)
+            for term in search_terms(package.nuget_id, (package.title, package.description,
+                                                        *(x.name for x in package.tags.all()))))
+    term_model._default_manager.using(db_alias).bulk_create(terms, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0003_package_version_sort_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageSearchTerm',
+            fields=[
+                ('id',
+                 models.BigAutoField(auto_created=True,
+                                     primary_key=True,
+                                     serialize=False,
+                                     verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('package',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   related_name='search_terms',
+                                   to='minchoc.package')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('package', 'term'),
+                                            name='package_search_term_uniq')
+                ],
+            },
+        ),
+        migrations.RunPython(index_packages, migrations.RunPython.noop),
+    ]
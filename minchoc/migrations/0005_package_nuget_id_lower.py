@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:05
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.db import migrations, models
+
+if TYPE_CHECKING:
+    from django.apps.registry import Apps
+    from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def fill_nuget_id_lower(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    package_model = apps.get_model('minchoc', 'Package')  # type: ignore[misc]
+    db_alias = schema_editor.connection.alias
+    # Lowercased in Python because SQL LOWER() only handles ASCII on some backends.
+    packages = []
+    for package in package_model._default_manager.using(db_alias).only('nuget_id').iterator():
+        package.nuget_id_lower = package.nuget_id.lower()
+        packages.append(package)
+    package_model._default_manager.using(db_alias).bulk_update(packages, ['nuget_id_lower'],
+                                                               batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0004_packagesearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='nuget_id_lower',
+            field=models.CharField(default='', editable=False, max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['nuget_id_lower', 'version_sort_key'],
+                               name='package_id_lower_version_idx'),
+        ),
+        migrations.RunPython(fill_nuget_id_lower, migrations.RunPython.noop),
+    ]
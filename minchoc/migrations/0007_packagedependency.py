@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:11
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.db import migrations, models
+from minchoc.versions import parse_version_range
+import django.db.models.deletion
+
+if TYPE_CHECKING:
+    from django.apps.registry import Apps
+    from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def index_dependencies(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    package_model = apps.get_model('minchoc', 'Package')  # type: ignore[misc]
+    dependency_model = apps.get_model('minchoc', 'PackageDependency')  # type: ignore[misc]
+    db_alias = schema_editor.connection.alias
+    rows = []
+    for package in package_model._default_manager.using(db_alias).filter(
+            dependencies__isnull=False).only('dependencies').iterator():
+        for dependency in package.dependencies or ():
+            try:
+                version_range = parse_version_range(dependency['version_range'])
+            except ValueError:
+                version_range = parse_version_range('')
+            rows.append(
+                dependency_model(package_id=package.pk,
+                                 nuget_id=dependency['nuget_id'],
+                                 nuget_id_lower=dependency['nuget_id'].lower(),
+                                 target_framework=dependency['target_framework'],
+                                 version_range=dependency['version_range'],
+                                 min_version_key=version_range.min_key,
+                                 min_inclusive=version_range.min_inclusive,
+                                 max_version_key=version_range.max_key,
+                                 max_inclusive=version_range.max_inclusive))
+    dependency_model._default_manager.using(db_alias).bulk_create(rows,
+                                                                  batch_size=1000,
+                                                                  ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0006_package_order_by_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageDependency',
+            fields=[
+                ('id',
+                 models.BigAutoField(auto_created=True,
+                                     primary_key=True,
+                                     serialize=False,
+                                     verbose_name='ID')),
+                ('nuget_id', models.CharField(max_length=128)),
+                ('nuget_id_lower', models.CharField(max_length=128)),
+                ('target_framework', models.CharField(default='', max_length=64)),
+                ('version_range', models.CharField(default='', max_length=255)),
+                ('min_version_key', models.CharField(max_length=255, null=True)),
+                ('min_inclusive', models.BooleanField(default=False)),
+                ('max_version_key', models.CharField(max_length=255, null=True)),
+                ('max_inclusive', models.BooleanField(default=False)),
+                ('package',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   related_name='declared_dependencies',
+                                   to='minchoc.package')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['nuget_id_lower', 'min_version_key'],
+                                 name='package_dependency_id_idx')
+                ],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('package', 'nuget_id_lower', 'target_framework'),
+                        name='package_dependency_uniq')
+                ],
+            },
+        ),
+        migrations.RunPython(index_dependencies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:16
+
+import minchoc.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0007_packagedependency'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='package',
+            name='file',
+            field=models.FileField(storage=minchoc.storage.package_storage, upload_to='packages'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0008_package_file_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageDownloadDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('rolled_up', models.PositiveBigIntegerField(default=0)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='download_days', to='minchoc.package')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='package_download_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('package', 'day'), name='package_download_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:04
+
+import minchoc.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minchoc', '0009_packagedownloadday'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='package',
+            name='version_sort_key',
+            field=minchoc.models.SortKeyField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='packagedependency',
+            name='max_version_key',
+            field=minchoc.models.SortKeyField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='packagedependency',
+            name='min_version_key',
+            field=minchoc.models.SortKeyField(max_length=255, null=True),
+        ),
+    ]
@@ -11,11 +11,37 @@ from django.db.models.signals import post_save
 from django_stubs_ext.db.models import TypedModelMeta
 from typing_extensions import override
 
+from .search import MAX_TERM_LENGTH
+from .storage import package_storage
+
 if TYPE_CHECKING:
     from django.contrib.auth.models import AbstractUser
+    from django.db.backends.base.base import BaseDatabaseWrapper
+    from django.db.models.fields.related_descriptors import RelatedManager
     from django.http import HttpRequest
 
-__all__ = ('Author', 'Company', 'NugetUser', 'Package')
+__all__ = ('Author', 'Company', 'NugetUser', 'Package', 'PackageDependency', 'PackageDownloadDay',
+           'PackageSearchTerm', 'SortKeyField')
+
+BINARY_COLLATIONS = {'mysql': 'utf8mb4_bin', 'oracle': 'BINARY', 'postgresql': 'C'}
+"""Collation used by :py:class:`SortKeyField` for each database vendor. SQLite compares bytewise
+by default."""
+
+
+class SortKeyField(models.CharField[Any, Any]):
+    """
+    Character field for :py:func:`~minchoc.versions.version_sort_key` values.
+
+    Sort keys only order correctly when compared bytewise, so the column uses a binary collation
+    from :py:data:`BINARY_COLLATIONS` unless ``db_collation`` is given. Linguistic collations such
+    as ICU or ``en_US.UTF-8`` on PostgreSQL ignore the punctuation in sort keys.
+    """
+    @override
+    def db_parameters(self, connection: BaseDatabaseWrapper) -> dict[str, Any]:
+        params = super().db_parameters(connection)
+        if self.db_collation is None:
+            params['collation'] = BINARY_COLLATIONS.get(connection.vendor)
+        return params
 
 
 class Company(models.Model):
@@ -148,9 +174,13 @@ class Package(models.Model):
     authors = models.ManyToManyField(Author)
     copyright = models.TextField(null=True)
     dependencies = models.JSONField(null=True)
+    """Dependencies declared in the nuspec, as a list of
+    :py:class:`~minchoc.nuspec.NuspecDependency` dictionaries. Indexed in
+    :py:class:`PackageDependency`."""
     description = models.TextField(null=True)
     download_count = models.PositiveBigIntegerField(default=0)
-    file = models.FileField(upload_to='packages')
+    file = models.FileField(upload_to='packages', storage=package_storage)
+    """The package file, in :py:func:`minchoc.storage.package_storage`."""
     hash = models.TextField(null=True)
     hash_algorithm = models.CharField(max_length=32, null=True)
     icon_url = models.URLField(null=True)
@@ -160,6 +190,8 @@ class Package(models.Model):
     license_url = models.URLField(null=True)
     listed = models.BooleanField(default=True)
     nuget_id = models.CharField(max_length=128)
+    nuget_id_lower = models.CharField(max_length=128, default='', editable=False)
+    """Lowercase ``nuget_id`` for case-insensitive lookups with an index. Set on save."""
     project_url = models.URLField()
     published = models.DateTimeField(auto_now_add=True, blank=True)
     references = models.JSONField(default=dict)
@@ -177,11 +209,92 @@ class Package(models.Model):
     version2 = models.PositiveIntegerField(null=True)
     version3 = models.PositiveIntegerField(null=True)
     version_beta = models.CharField(max_length=128, null=True)
-
+    version_sort_key = SortKeyField(max_length=255, default='')
+    """Normalised version that sorts in NuGet version order. See
+    :py:func:`minchoc.versions.version_sort_key`."""
+    declared_dependencies: RelatedManager[PackageDependency]
+    """Index rows of :py:attr:`dependencies`. See :py:class:`PackageDependency`."""
     class Meta(TypedModelMeta):
         constraints = (models.UniqueConstraint(fields=('nuget_id', 'version'),
                                                name='id_and_version_uniq'),)
+        # Lookups by identifier, then one index for each ``$orderby`` property.
+        indexes = (models.Index(fields=('nuget_id', 'version_sort_key'),
+                                name='package_id_version_key_idx'),
+                   models.Index(fields=('nuget_id_lower', 'version_sort_key'),
+                                name='package_id_lower_version_idx'),
+                   models.Index(fields=('download_count',), name='package_download_count_idx'),
+                   models.Index(fields=('published',), name='package_published_idx'),
+                   models.Index(fields=('title',), name='package_title_idx'),
+                   models.Index(fields=('version_sort_key',), name='package_version_key_idx'))
 
     @override
     def __str__(self) -> str:
         return f'{self.title} {self.version}'
+
+    @override
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        self.nuget_id_lower = self.nuget_id.lower()
+        super().save(*args, **kwargs)
+
+
+class PackageSearchTerm(models.Model):
+    """A word in the identifier, title, description or tags of a package, used by ``Search()``."""
+    package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=MAX_TERM_LENGTH, db_index=True)
+
+    class Meta(TypedModelMeta):
+        constraints = (models.UniqueConstraint(fields=('package', 'term'),
+                                               name='package_search_term_uniq'),)
+
+    @override
+    def __str__(self) -> str:
+        return self.term
+
+
+class PackageDependency(models.Model):
+    """A dependency declared by a package, with the bounds of its version range."""
+    package = models.ForeignKey(Package,
+                                on_delete=models.CASCADE,
+                                related_name='declared_dependencies')
+    nuget_id = models.CharField(max_length=128)
+    """NuGet package identifier of the dependency."""
+    nuget_id_lower = models.CharField(max_length=128)
+    """Lowercase ``nuget_id`` for case-insensitive lookups with an index."""
+    target_framework = models.CharField(max_length=64, default='')
+    version_range = models.CharField(max_length=255, default='')
+    """The version range as written in the nuspec."""
+    min_version_key = SortKeyField(max_length=255, null=True)
+    """Sort key of the lower bound of the range. ``None`` if there is no lower bound. See
+    :py:func:`minchoc.versions.parse_version_range`."""
+    min_inclusive = models.BooleanField(default=False)
+    max_version_key = SortKeyField(max_length=255, null=True)
+    """Sort key of the upper bound of the range. ``None`` if there is no upper bound."""
+    max_inclusive = models.BooleanField(default=False)
+
+    class Meta(TypedModelMeta):
+        constraints = (models.UniqueConstraint(
+            fields=('package', 'nuget_id_lower', 'target_framework'),
+            name='package_dependency_uniq'),)
+        indexes = (models.Index(fields=('nuget_id_lower', 'min_version_key'),
+                                name='package_dependency_id_idx'),)
+
+    @override
+    def __str__(self) -> str:
+        return f'{self.nuget_id} {self.version_range}'.strip()
+
+
+class PackageDownloadDay(models.Model):
+    """Number of downloads of a package on one day (UTC). Written by :py:mod:`minchoc.downloads`."""
+    package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='download_days')
+    day = models.DateField()
+    count = models.PositiveBigIntegerField(default=0)
+    rolled_up = models.PositiveBigIntegerField(default=0)
+    """Part of ``count`` already added to :py:attr:`Package.download_count`."""
+    class Meta(TypedModelMeta):
+        constraints = (models.UniqueConstraint(fields=('package', 'day'),
+                                               name='package_download_day_uniq'),)
+        indexes = (models.Index(fields=('day',), name='package_download_day_idx'),)
+
+    @override
+    def __str__(self) -> str:
+        return f'{self.day}: {self.count}'
@@ -0,0 +1,110 @@
+"""
+In-process cache of package identifiers and versions that do not exist.
+
+Clients are often configured with several sources, so many requests ask for packages that are not
+hosted here. Misses are remembered for ``settings.MINCHOC_NEGATIVE_CACHE_TTL`` seconds (default
+``0``, which disables the cache) so repeated requests for them are answered without a query. At
+most ``settings.MINCHOC_NEGATIVE_CACHE_SIZE`` (default ``10000``) misses are kept; the least
+recently added are evicted first.
+
+Identifiers are compared case-insensitively. Entries of an identifier are removed when
+:py:data:`minchoc.signals.package_changed` is sent for it. The signal is only received by the
+process that sent it, so other processes may answer with a miss for up to the TTL after a package
+is added elsewhere. Only enable the cache with a single process, or if a delay of up to the TTL
+before new packages can be found is acceptable.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any
+import threading
+
+from django.conf import settings
+
+__all__ = ('add_missing', 'clear', 'is_missing', 'package_changed_receiver')
+
+_entries: OrderedDict[tuple[str, str | None], float] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ttl() -> float:
+    return float(getattr(settings, 'MINCHOC_NEGATIVE_CACHE_TTL', 0))
+
+
+def is_missing(nuget_id: str, version: str | None = None) -> bool:
+    """
+    Check if a package identifier or version is known not to exist.
+
+    Parameters
+    ----------
+    nuget_id : str
+        NuGet package identifier.
+    version : str | None
+        Package version string. If the identifier has no packages at all, every version of it is
+        missing.
+
+    Returns
+    -------
+    bool
+        ``True`` if a recent lookup found nothing.
+    """
+    now = monotonic()
+    nuget_id = nuget_id.lower()
+    with _lock:
+        for key in ((nuget_id, None), (nuget_id, version)):
+            if (expires := _entries.get(key)) is not None:
+                if expires > now:
+                    return True
+                del _entries[key]
+    return False
+
+
+def add_missing(nuget_id: str, version: str | None = None) -> None:
+    """
+    Remember that a package identifier or version does not exist.
+
+    Parameters
+    ----------
+    nuget_id : str
+        NuGet package identifier.
+    version : str | None
+        Package version string, or ``None`` if the identifier has no packages at all.
+    """
+    if (ttl := _ttl()) <= 0:
+        return
+    max_size = int(getattr(settings, 'MINCHOC_NEGATIVE_CACHE_SIZE', 10000))
+    nuget_id = nuget_id.lower()
+    with _lock:
+        _entries[nuget_id, version] = monotonic() + ttl
+        _entries.move_to_end((nuget_id, version))
+        while len(_entries) > max_size:
+            _entries.popitem(last=False)
+
+
+def clear() -> None:
+    """Forget all misses."""
+    with _lock:
+        _entries.clear()
+
+
+def package_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        nuget_id: str,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Forget the misses of a package identifier after it changed.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    nuget_id : str
+        NuGet package identifier.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    nuget_id = nuget_id.lower()
+    with _lock:
+        for key in [x for x in _entries if x[0] == nuget_id]:
+            del _entries[key]
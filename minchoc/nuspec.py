@@ -0,0 +1,256 @@
+"""
+Nuspec parsing.
+
+This module does not depend on Django being set up, so its functions can be used in worker
+processes.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import IO, TYPE_CHECKING, NamedTuple
+import logging
+import re
+import zipfile
+
+from defusedxml.ElementTree import parse as parse_xml
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from os import PathLike
+    from xml.etree.ElementTree import Element
+
+__all__ = ('NUSPEC_FIELD_MAPPINGS', 'NUSPEC_NAMESPACES', 'NuspecDependency', 'NuspecError',
+           'format_dependencies', 'nupkg_values', 'nuspec_dependencies', 'nuspec_values',
+           'parse_dependencies', 'read_nuspec_metadata', 'split_authors', 'split_tags')
+
+NUSPEC_NAMESPACES = {'': 'http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd'}
+NUSPEC_FIELD_AUTHORS = 'authors'
+NUSPEC_FIELD_DEPENDENCIES = 'dependencies'
+NUSPEC_FIELD_DESCRIPTION = 'description'
+NUSPEC_FIELD_ID = 'id'
+NUSPEC_FIELD_PROJECT_URL = 'projectUrl'
+NUSPEC_FIELD_REQUIRE_LICENSE_ACCEPTANCE = 'requireLicenseAcceptance'
+NUSPEC_FIELD_SOURCE_URL = 'packageSourceUrl'
+NUSPEC_FIELD_SUMMARY = 'summary'
+NUSPEC_FIELD_TAGS = 'tags'
+NUSPEC_FIELD_TITLE = 'title'
+NUSPEC_FIELD_VERSION = 'version'
+NUSPEC_FIELD_MAPPINGS = {
+    NUSPEC_FIELD_AUTHORS: 'authors',
+    NUSPEC_FIELD_DESCRIPTION: 'description',
+    NUSPEC_FIELD_ID: 'nuget_id',
+    NUSPEC_FIELD_PROJECT_URL: 'project_url',
+    NUSPEC_FIELD_REQUIRE_LICENSE_ACCEPTANCE: 'require_license_acceptance',
+    NUSPEC_FIELD_SOURCE_URL: 'source_url',
+    NUSPEC_FIELD_SUMMARY: 'summary',
+    NUSPEC_FIELD_TAGS: 'tags',
+    NUSPEC_FIELD_TITLE: 'title',
+    NUSPEC_FIELD_VERSION: 'version'
+}
+"""Nuspec ``metadata`` child element names mapped to :py:class:`~minchoc.models.Package` fields."""
+_TAG_SEPARATOR_RE = re.compile(r'\s+')
+
+logger = logging.getLogger(__name__)
+
+
+class NuspecError(Exception):
+    """Raised when a package does not contain a usable nuspec file."""
+
+
+class NuspecDependency(NamedTuple):
+    """A dependency declared in a nuspec file."""
+    nuget_id: str
+    """NuGet package identifier of the dependency."""
+    version_range: str
+    """NuGet version range, e.g. ``[1.0,2.0)``. Empty if any version is accepted."""
+    target_framework: str
+    """Target framework of the ``<group>`` declaring the dependency. Empty if there is none."""
+
+
+def read_nuspec_metadata(file: str | PathLike[str] | IO[bytes]) -> Element:
+    """
+    Extract and parse the nuspec file contained in a package.
+
+    Parameters
+    ----------
+    file : str | PathLike[str] | IO[bytes]
+        Path to the package or the open package file.
+
+    Returns
+    -------
+    Element
+        The ``metadata`` element of the nuspec file.
+
+    Raises
+    ------
+    NuspecError
+        If the package does not contain exactly one nuspec file, or the nuspec is not valid XML.
+    """
+    with zipfile.ZipFile(file) as z:
+        nuspecs = [x for x in z.filelist if x.filename.endswith('.nuspec')]
+        if len(nuspecs) > 1 or not nuspecs:
+            msg = 'There should be exactly 1 nuspec file present. 0 or more than 1 were found.'
+            raise NuspecError(msg)
+        with TemporaryDirectory(suffix='.nuget-parse') as temp_dir:
+            z.extract(nuspecs[0], temp_dir)
+            root = parse_xml(Path(temp_dir) / nuspecs[0].filename).getroot()
+    if root is None:
+        msg = 'Invalid nuspec'
+        raise NuspecError(msg)
+    return root[0]
+
+
+def nuspec_values(nuspec_metadata: Element) -> dict[str, str]:
+    """
+    Get the text of the supported nuspec fields.
+
+    Parameters
+    ----------
+    nuspec_metadata : Element
+        The ``metadata`` element of the nuspec file.
+
+    Returns
+    -------
+    dict[str, str]
+        Non-empty values keyed by :py:class:`~minchoc.models.Package` field name. Dependencies are
+        serialised with :py:func:`format_dependencies`.
+    """
+    ret: dict[str, str] = {}
+    for key, column_name in NUSPEC_FIELD_MAPPINGS.items():
+        tag = nuspec_metadata.find(key, NUSPEC_NAMESPACES)
+        if tag is None or not tag.text:  # pragma no cover
+            logger.warning('No value for key %s', key)
+            continue
+        ret[column_name] = tag.text
+    if dependencies := nuspec_dependencies(nuspec_metadata):
+        ret['dependencies'] = format_dependencies(dependencies)
+    return ret
+
+
+def nuspec_dependencies(nuspec_metadata: Element) -> list[NuspecDependency]:
+    """
+    Get the dependencies declared in a nuspec file.
+
+    Dependencies can be direct children of ``<dependencies>`` or be in ``<group>`` elements with a
+    ``targetFramework`` attribute. Elements without an ``id`` are ignored.
+
+    Parameters
+    ----------
+    nuspec_metadata : Element
+        The ``metadata`` element of the nuspec file.
+
+    Returns
+    -------
+    list[NuspecDependency]
+        The dependencies in document order.
+    """
+    if (dependencies := nuspec_metadata.find(NUSPEC_FIELD_DEPENDENCIES, NUSPEC_NAMESPACES)) is None:
+        return []
+    groups = [('', dependencies)] + [(x.get('targetFramework', '').strip(), x)
+                                     for x in dependencies.findall('group', NUSPEC_NAMESPACES)]
+    return [
+        NuspecDependency(nuget_id=nuget_id,
+                         version_range=x.get('version', '').strip(),
+                         target_framework=target_framework) for target_framework, group in groups
+        for x in group.findall('dependency', NUSPEC_NAMESPACES)
+        if (nuget_id := x.get('id', '').strip())
+    ]
+
+
+def format_dependencies(dependencies: Iterable[NuspecDependency]) -> str:
+    """
+    Serialise dependencies in the format of the ``Dependencies`` feed property.
+
+    Parameters
+    ----------
+    dependencies : Iterable[NuspecDependency]
+        The dependencies.
+
+    Returns
+    -------
+    str
+        ``id:range:framework`` items separated by ``|``, e.g. ``a:[1.0,2.0)|b:1.5:net45``. The
+        framework and the colon before it are left out if there is no framework.
+    """
+    return '|'.join(
+        f'{x.nuget_id}:{x.version_range}' + (f':{x.target_framework}' if x.target_framework else '')
+        for x in dependencies)
+
+
+def parse_dependencies(value: str) -> list[NuspecDependency]:
+    """
+    Parse the format written by :py:func:`format_dependencies`.
+
+    Parameters
+    ----------
+    value : str
+        ``id:range:framework`` items separated by ``|``.
+
+    Returns
+    -------
+    list[NuspecDependency]
+        The dependencies. Items without an identifier are ignored.
+    """
+    ret = []
+    for item in value.split('|'):
+        nuget_id, _, rest = item.partition(':')
+        version_range, _, target_framework = rest.partition(':')
+        if nuget_id.strip():
+            ret.append(
+                NuspecDependency(nuget_id.strip(), version_range.strip(), target_framework.strip()))
+    return ret
+
+
+def nupkg_values(path: str | PathLike[str]) -> dict[str, str]:
+    """
+    Get the supported nuspec field values of a package file.
+
+    This is a picklable shortcut for :py:func:`read_nuspec_metadata` followed by
+    :py:func:`nuspec_values`, intended for process pools.
+
+    Parameters
+    ----------
+    path : str | PathLike[str]
+        Path to the package.
+
+    Returns
+    -------
+    dict[str, str]
+        Non-empty values keyed by :py:class:`~minchoc.models.Package` field name.
+    """
+    return nuspec_values(read_nuspec_metadata(path))
+
+
+def split_tags(value: str) -> list[str]:
+    """
+    Split a nuspec ``tags`` value into tag names.
+
+    Parameters
+    ----------
+    value : str
+        Whitespace-separated tag names.
+
+    Returns
+    -------
+    list[str]
+        The tag names, in the order they appear in the value.
+    """
+    return [x for x in (name.strip() for name in _TAG_SEPARATOR_RE.split(value)) if x]
+
+
+def split_authors(value: str) -> list[str]:
+    """
+    Split a nuspec ``authors`` value into author names.
+
+    Parameters
+    ----------
+    value : str
+        Comma-separated author names.
+
+    Returns
+    -------
+    list[str]
+        The author names, in the order they appear in the value.
+    """
+    return [x for x in (name.strip() for name in value.split(',')) if x]
@@ -0,0 +1,334 @@
+"""
+Database routing to read replicas.
+
+Add :py:class:`ReplicaRouter` to ``settings.DATABASE_ROUTERS`` and list the aliases of the replicas
+in ``settings.MINCHOC_READ_REPLICAS``. Reads of minchoc models are spread over the replicas in
+turn, and writes and migrations go to ``settings.MINCHOC_PRIMARY_DATABASE`` (default
+``default``).
+
+Reads go to the primary instead when:
+
+- A write was made earlier in the same request or task. The pin is reset when a request starts
+  (:py:func:`request_started_receiver`), so with or without the middleware it does not carry over
+  to later requests handled by the same thread.
+- The primary is in a transaction, so the transaction sees its own changes.
+- The client uploaded or deleted a package in the last ``settings.MINCHOC_REPLICA_PIN_SECONDS``
+  seconds (default ``5``). :py:class:`ReplicaPinMiddleware` marks the client with a cookie that
+  expires after that time, which gives the uploader read-your-writes behaviour. Other clients keep
+  reading from the replicas.
+- A feed of a package identifier that changed in the last ``settings.MINCHOC_REPLICA_PIN_SECONDS``
+  seconds, or of the whole catalog, is rendered for the feed cache (see
+  :py:func:`apin_if_changed`). This keeps the feed cache from storing feeds rendered from a replica
+  that has not caught up. Recent changes are shared between processes through the Django cache.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from itertools import count
+from typing import TYPE_CHECKING, Any, cast
+import hashlib
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from django.db.models import Model
+    from django.http import HttpRequest, HttpResponseBase
+
+__all__ = ('PIN_COOKIE', 'ReplicaPinMiddleware', 'ReplicaRouter', 'apin_if_changed', 'is_pinned',
+           'package_changed_receiver', 'pin_primary', 'primary_database', 'read_replicas',
+           'request_started_receiver')
+
+PIN_COOKIE = 'minchoc_replica_pin'
+"""Name of the cookie that pins the reads of a client to the primary after it changed a package."""
+_CATALOG_PIN_KEY = 'minchoc:replica-pin:catalog'
+_changed: ContextVar[list[str] | None] = ContextVar('minchoc_replica_changed', default=None)
+_pinned: ContextVar[bool] = ContextVar('minchoc_replica_pinned', default=False)
+_turn = count()
+
+logger = logging.getLogger(__name__)
+
+
+def primary_database() -> str:
+    """
+    Get the alias of the primary database.
+
+    Returns
+    -------
+    str
+        ``settings.MINCHOC_PRIMARY_DATABASE``, or ``default`` if it is not set.
+    """
+    return str(getattr(settings, 'MINCHOC_PRIMARY_DATABASE', 'default'))
+
+
+def read_replicas() -> list[str]:
+    """
+    Get the aliases of the read replicas.
+
+    Returns
+    -------
+    list[str]
+        ``settings.MINCHOC_READ_REPLICAS``, or an empty list if it is not set.
+    """
+    return list(getattr(settings, 'MINCHOC_READ_REPLICAS', ()))
+
+
+def _pin_seconds() -> int:
+    return int(getattr(settings, 'MINCHOC_REPLICA_PIN_SECONDS', 5))
+
+
+def _pin_key(nuget_id: str) -> str:
+    # Identifiers are looked up case-insensitively, so their pins are too.
+    return f'minchoc:replica-pin:id:{hashlib.sha256(nuget_id.lower().encode()).hexdigest()}'
+
+
+def pin_primary() -> None:
+    """Send the remaining reads of the current request or task to the primary."""
+    _pinned.set(True)
+
+
+def is_pinned() -> bool:
+    """
+    Check if reads of the current request or task go to the primary.
+
+    Returns
+    -------
+    bool
+        ``True`` after :py:func:`pin_primary` was called or a write was routed.
+    """
+    return _pinned.get()
+
+
+async def apin_if_changed(nuget_id: str | None) -> None:
+    """
+    Pin the reads of the current request or task to the primary if a package changed recently.
+
+    Nothing is looked up unless ``settings.MINCHOC_READ_REPLICAS`` is set.
+
+    Parameters
+    ----------
+    nuget_id : str | None
+        NuGet package identifier, or ``None`` to check for a change to any package.
+    """
+    if (read_replicas() and not _pinned.get() and await
+            cache.aget(_CATALOG_PIN_KEY if nuget_id is None else _pin_key(nuget_id)) is not None):
+        pin_primary()
+
+
+class ReplicaRouter:
+    """Route reads of minchoc models to read replicas and writes to the primary."""
+    @staticmethod
+    def _is_minchoc(model: type[Model]) -> bool:
+        return model._meta.app_label == 'minchoc'
+
+    def db_for_read(self, model: type[Model],
+                    **hints: Any) -> str | None:  # ruff:ignore[unused-method-argument]
+        """
+        Choose the database for a read.
+
+        Parameters
+        ----------
+        model : type[Model]
+            The model.
+        **hints : Any
+            Routing hints (unused).
+
+        Returns
+        -------
+        str | None
+            The next replica in turn, the primary if reads are pinned to it, or ``None`` for models
+            of other apps.
+        """
+        if not self._is_minchoc(model):
+            return None
+        primary = primary_database()
+        if not (replicas :=
+                read_replicas()) or _pinned.get() or connections[primary].in_atomic_block:
+            return primary
+        return replicas[next(_turn) % len(replicas)]
+
+    def db_for_write(self, model: type[Model],
+                     **hints: Any) -> str | None:  # ruff:ignore[unused-method-argument]
+        """
+        Choose the database for a write and pin later reads to it.
+
+        Parameters
+        ----------
+        model : type[Model]
+            The model.
+        **hints : Any
+            Routing hints (unused).
+
+        Returns
+        -------
+        str | None
+            The primary, or ``None`` for models of other apps.
+        """
+        if not self._is_minchoc(model):
+            return None
+        _pinned.set(True)
+        return primary_database()
+
+    @staticmethod
+    def allow_relation(obj1: Model, obj2: Model,
+                       **hints: Any) -> bool | None:  # ruff:ignore[unused-static-method-argument]
+        """
+        Allow relations between objects read from the primary or any replica.
+
+        Parameters
+        ----------
+        obj1 : Model
+            The first object.
+        obj2 : Model
+            The second object.
+        **hints : Any
+            Routing hints (unused).
+
+        Returns
+        -------
+        bool | None
+            ``True`` if both objects come from the primary or a replica, otherwise ``None``.
+        """
+        databases = {primary_database(), *read_replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:  # ruff:ignore[private-member-access]
+            return True
+        return None
+
+    @staticmethod
+    def allow_migrate(db: str, app_label: str,
+                      **hints: Any) -> bool | None:  # ruff:ignore[unused-static-method-argument]
+        """
+        Prevent migrations of minchoc on the replicas, which receive changes through replication.
+
+        Parameters
+        ----------
+        db : str
+            The database alias.
+        app_label : str
+            The app label.
+        **hints : Any
+            Routing hints (unused).
+
+        Returns
+        -------
+        bool | None
+            ``False`` for minchoc on a replica, otherwise ``None``.
+        """
+        return False if app_label == 'minchoc' and db in read_replicas() else None
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin the reads of a request to the primary if its client changed a package recently.
+
+    A request that uploads or deletes a package gets a :py:data:`PIN_COOKIE` cookie that expires
+    after ``settings.MINCHOC_REPLICA_PIN_SECONDS`` seconds. Nothing is done unless
+    ``settings.MINCHOC_READ_REPLICAS`` is set.
+
+    Parameters
+    ----------
+    get_response : Callable[[HttpRequest], HttpResponseBase | Awaitable[HttpResponseBase]]
+        The next middleware or view.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(
+        self, get_response: Callable[[HttpRequest],
+                                     HttpResponseBase | Awaitable[HttpResponseBase]]) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        """
+        Handle a request.
+
+        Parameters
+        ----------
+        request : HttpRequest
+            The request.
+
+        Returns
+        -------
+        Any
+            The response, or an awaitable of it when called asynchronously.
+        """
+        if self.is_async:
+            return self._acall(request)
+        if not read_replicas():
+            return self.get_response(request)
+        changed: list[str] = []
+        tokens = _changed.set(changed), _pinned.set(PIN_COOKIE in request.COOKIES)
+        try:
+            return self._with_cookie(cast('HttpResponseBase', self.get_response(request)), changed)
+        finally:
+            _changed.reset(tokens[0])
+            _pinned.reset(tokens[1])
+
+    async def _acall(self, request: HttpRequest) -> HttpResponseBase:
+        if not read_replicas():
+            return await cast('Awaitable[HttpResponseBase]', self.get_response(request))
+        changed: list[str] = []
+        tokens = _changed.set(changed), _pinned.set(PIN_COOKIE in request.COOKIES)
+        try:
+            return self._with_cookie(
+                await cast('Awaitable[HttpResponseBase]', self.get_response(request)), changed)
+        finally:
+            _changed.reset(tokens[0])
+            _pinned.reset(tokens[1])
+
+    @staticmethod
+    def _with_cookie(response: HttpResponseBase, changed: list[str]) -> HttpResponseBase:
+        if changed and (seconds := _pin_seconds()) > 0:
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+
+async def package_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        nuget_id: str,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Pin reads to the primary for ``settings.MINCHOC_REPLICA_PIN_SECONDS`` seconds.
+
+    The pin applies to the client that made the change (through :py:class:`ReplicaPinMiddleware`)
+    and to rendering feeds of the identifier or the catalog for the feed cache (through
+    :py:func:`apin_if_changed`). Nothing is done unless ``settings.MINCHOC_READ_REPLICAS`` is set.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    nuget_id : str
+        NuGet package identifier.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    if read_replicas() and (seconds := _pin_seconds()) > 0:
+        logger.debug('Pinning reads to the primary for %d seconds after %s changed.', seconds,
+                     nuget_id)
+        if (changed := _changed.get()) is not None:
+            changed.append(nuget_id)
+        await cache.aset_many({_pin_key(nuget_id): 1, _CATALOG_PIN_KEY: 1}, seconds)
+
+
+def request_started_receiver(**kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Unpin reads at the start of a request.
+
+    Threads serving synchronous requests keep their context between requests, so without this a
+    write would pin the reads of every later request of the thread.
+
+    Parameters
+    ----------
+    **kwargs : Any
+        Signal arguments (unused).
+    """
+    _pinned.set(False)
@@ -0,0 +1,87 @@
+"""
+Search term extraction.
+
+This module does not depend on Django being set up, so its functions can be used in migrations.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import re
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+__all__ = ('MAX_TERM_LENGTH', 'prefix_range', 'search_terms', 'search_words')
+
+MAX_TERM_LENGTH = 64
+"""Longer words are truncated to this length."""
+_WORD_RE = re.compile(r'[0-9a-z]+')
+_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def search_words(text: str) -> list[str]:
+    """
+    Split text into lowercase words as they are stored in the search index.
+
+    Parameters
+    ----------
+    text : str
+        The text, e.g. a search query.
+
+    Returns
+    -------
+    list[str]
+        The words in order, without duplicates.
+    """
+    return list(dict.fromkeys(x[:MAX_TERM_LENGTH] for x in _WORD_RE.findall(text.lower())))
+
+
+def search_terms(nuget_id: str, texts: Iterable[str | None]) -> set[str]:
+    """
+    Get the search terms of a package.
+
+    Parameters
+    ----------
+    nuget_id : str
+        The package identifier. It is indexed whole as well as split into words.
+    texts : Iterable[str | None]
+        Other text to index, such as the title, description and tag names.
+
+    Returns
+    -------
+    set[str]
+        The terms.
+    """
+    ret = {nuget_id.lower()[:MAX_TERM_LENGTH], *search_words(nuget_id)}
+    for text in texts:
+        if text:
+            ret.update(search_words(text))
+    return ret
+
+
+def prefix_range(word: str) -> tuple[str, str | None]:
+    """
+    Get the range of terms that start with a word.
+
+    Filtering on ``term >= low AND term < high`` can use a plain B-tree index on every database,
+    unlike ``LIKE 'word%'``. Words only contain ``0-9`` and ``a-z``, but the terms of a package also
+    include its whole lowercase identifier, which can contain ``.``, ``-`` and ``_``. Compared
+    bytewise, the range holds exactly the terms that start with the word. Collations that ignore
+    punctuation, such as ``en_US.UTF-8`` on PostgreSQL, can also place an identifier like
+    ``a.b.c`` in the range of ``abc``, so the result may include such extra matches.
+
+    Parameters
+    ----------
+    word : str
+        A word returned by :py:func:`search_words`.
+
+    Returns
+    -------
+    tuple[str, str | None]
+        The inclusive lower bound and the exclusive upper bound. The upper bound is ``None`` if the
+        word consists only of ``z`` characters.
+    """
+    prefix = word.rstrip(_ALPHABET[-1])
+    if not prefix:
+        return word, None
+    return word, prefix[:-1] + _ALPHABET[_ALPHABET.index(prefix[-1]) + 1]
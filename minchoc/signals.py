@@ -0,0 +1,16 @@
+"""Signals."""
+from __future__ import annotations
+
+from django.dispatch import Signal
+
+__all__ = ('package_changed',)
+
+package_changed = Signal()
+"""
+Sent after a package was uploaded or deleted.
+
+Receivers are called with the ``nuget_id`` keyword argument and may be asynchronous. It is also sent
+for each identifier added by the ``import_packages`` and ``restore_catalog`` management commands.
+The change has already been committed when it is sent, so it is sent with ``send_robust``: an
+exception in a receiver is logged by Django and does not fail the request or command.
+"""
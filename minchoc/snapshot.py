@@ -0,0 +1,59 @@
+"""Catalog snapshot format shared by the ``export_catalog`` and ``restore_catalog`` commands."""
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, cast
+import gzip
+
+from django.core.serializers.json import DjangoJSONEncoder
+from typing_extensions import override
+
+from .models import Package
+
+if TYPE_CHECKING:
+    import os
+
+__all__ = ('SNAPSHOT_FORMAT', 'SNAPSHOT_PACKAGE_FIELDS', 'SnapshotJSONEncoder', 'open_snapshot')
+
+SNAPSHOT_FORMAT = 1
+"""Version of the snapshot format. Restoring a snapshot with a different version fails."""
+SNAPSHOT_PACKAGE_FIELDS = tuple(
+    f for f in Package._meta.concrete_fields if f.name not in {'file', 'id', 'uploader'})
+"""Package fields written as-is to a snapshot."""
+
+
+class SnapshotJSONEncoder(DjangoJSONEncoder):
+    """JSON encoder that keeps the full precision of date and time values."""
+    @override
+    def default(self, o: Any) -> Any:
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_snapshot(path: str | os.PathLike[str], mode: str) -> IO[str]:
+    """
+    Open a snapshot file for text reading or writing.
+
+    Snapshots contain the API tokens of users unless they are left out, so a file opened for writing
+    is only readable by its owner (mode ``0600``).
+
+    Parameters
+    ----------
+    path : str | os.PathLike[str]
+        The snapshot file. It is gzip compressed if the name ends with ``.gz``.
+    mode : str
+        ``'r'`` or ``'w'``.
+
+    Returns
+    -------
+    IO[str]
+        The open file.
+    """
+    if mode == 'w':
+        Path(path).touch(0o600)
+        Path(path).chmod(0o600)
+    if str(path).endswith('.gz'):
+        return cast('IO[str]', gzip.open(path, f'{mode}t', encoding='utf-8'))
+    return Path(path).open(mode, encoding='utf-8')
@@ -0,0 +1,282 @@
+"""
+Pre-rendered static feeds for read-only mirrors.
+
+Files are written below ``settings.MINCHOC_STATIC_FEED_ROOT``:
+
+- ``FindPackagesById()/<id>.xml`` for ``FindPackagesById()?id=<id>``.
+- ``Packages(Id='<id>',Version='<version>').xml`` for the URL of the same name.
+
+Entry URLs use ``settings.MINCHOC_STATIC_FEED_HOST`` as the protocol and hostname prefix.
+
+Each file is also written compressed with every available content coding, e.g. ``<id>.xml.gz``
+and ``<id>.xml.br``, for web servers that serve precompressed files (``gzip_static`` and
+``brotli_static`` in nginx).
+
+After an upload or deletion, the feeds of the identifier are re-rendered in a background thread so
+the request does not wait for them. Renders run one at a time, and an identifier that is already
+waiting to be rendered is not queued again. Queued renders are finished before the process exits.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+import glob
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .compression import FILE_EXTENSIONS
+from .feeds import compress_feed, feed_document
+from .models import Package
+from .utils import make_entry, prefetch_entries
+
+__all__ = ('FIND_PACKAGES_BY_ID_DIR', 'is_safe_name', 'package_changed_receiver',
+           'render_static_feeds', 'schedule_render', 'static_feed_host', 'static_feed_root',
+           'wait_for_renders', 'write_static_file')
+
+FIND_PACKAGES_BY_ID_DIR = 'FindPackagesById()'
+"""Directory containing the pre-rendered ``FindPackagesById()`` feeds."""
+_SAFE_NAME_RE = re.compile(r'^[A-Za-z0-9_+-][A-Za-z0-9_.+-]*$')
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_pending: set[tuple[Path, str, str]] = set()
+
+
+def static_feed_root() -> Path | None:
+    """
+    Get the directory static feeds are written to.
+
+    Returns
+    -------
+    Path | None
+        ``settings.MINCHOC_STATIC_FEED_ROOT``, or ``None`` if it is not set.
+    """
+    root = getattr(settings, 'MINCHOC_STATIC_FEED_ROOT', None)
+    return Path(root) if root else None
+
+
+def static_feed_host() -> str:
+    """
+    Get the protocol and hostname prefix used for URLs in static feeds.
+
+    Returns
+    -------
+    str
+        ``settings.MINCHOC_STATIC_FEED_HOST``, or ``http://localhost`` if it is not set.
+    """
+    return str(getattr(settings, 'MINCHOC_STATIC_FEED_HOST', 'http://localhost')).rstrip('/')
+
+
+def is_safe_name(value: str) -> bool:
+    """
+    Check if a package identifier or version can be used in a file name.
+
+    Parameters
+    ----------
+    value : str
+        The identifier or version.
+
+    Returns
+    -------
+    bool
+        ``True`` if the value only has letters, digits and ``_+-.`` and does not start with ``.``.
+    """
+    return _SAFE_NAME_RE.match(value) is not None
+
+
+def _package_feed_path(root: Path, nuget_id: str, version: str) -> Path:
+    return root / f"Packages(Id='{nuget_id}',Version='{version}').xml"
+
+
+def _write_file(path: Path, content: bytes) -> None:
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    Path(temp_name).replace(path)
+
+
+def write_static_file(path: Path, data: bytes) -> list[Path]:
+    """
+    Atomically write a static file and its compressed variants.
+
+    Each file is written to a temporary file first and then renamed, so a static file server never
+    serves a partially written file. The uncompressed file is replaced last so it is never newer
+    than its variants.
+
+    Parameters
+    ----------
+    path : Path
+        The file. Its directory must exist.
+    data : bytes
+        The content.
+
+    Returns
+    -------
+    list[Path]
+        The paths written, including the compressed variants.
+    """
+    written = []
+    for encoding, compressed in compress_feed(data).items():
+        variant = path.with_name(f'{path.name}{FILE_EXTENSIONS[encoding]}')
+        _write_file(variant, compressed)
+        written.append(variant)
+    _write_file(path, data)
+    written.append(path)
+    return written
+
+
+def _write_files(root: Path, nuget_id: str, files: dict[Path, str]) -> None:
+    """
+    Replace the static feeds of a package identifier.
+
+    Files are written with :py:func:`write_static_file`. Feeds of versions that no longer exist are
+    removed.
+
+    Parameters
+    ----------
+    root : Path
+        The static feed directory.
+    nuget_id : str
+        NuGet package identifier.
+    files : dict[Path, str]
+        Content keyed by path. If empty, all feeds of the identifier are removed.
+    """
+    (root / FIND_PACKAGES_BY_ID_DIR).mkdir(parents=True, exist_ok=True)
+    written: set[Path] = set()
+    for path, content in files.items():
+        written.update(write_static_file(path, content.encode()))
+    stale = set(root.glob(f"Packages(Id='{glob.escape(nuget_id)}',Version='*').xml*"))
+    find_path = root / FIND_PACKAGES_BY_ID_DIR / f'{nuget_id}.xml'
+    stale.update([
+        find_path, *(find_path.with_name(f'{find_path.name}{x}') for x in FILE_EXTENSIONS.values())
+    ])
+    for path in stale - written:
+        path.unlink(missing_ok=True)
+
+
+async def render_static_feeds(root: Path, host: str, nuget_id: str) -> int:
+    """
+    Render the static feeds of a package identifier.
+
+    Parameters
+    ----------
+    root : Path
+        The static feed directory.
+    host : str
+        The protocol and hostname prefix for URLs.
+    nuget_id : str
+        NuGet package identifier.
+
+    Returns
+    -------
+    int
+        Number of feeds written, not counting compressed variants.
+    """
+    if not is_safe_name(nuget_id):
+        logger.warning('Not rendering static feeds for unsafe identifier %r.', nuget_id)
+        return 0
+    # The same packages in the same order as the live FindPackagesById() feed.
+    packages = [
+        x async for x in Package._default_manager.filter(
+            nuget_id_lower=nuget_id.lower()).order_by('version_sort_key') if is_safe_name(x.version)
+    ]
+    download_totals = await prefetch_entries(packages)
+    entries = [(package, await make_entry(host, package, download_totals=download_totals))
+               for package in packages]
+    by_version: dict[str, list[tuple[Package, str]]] = defaultdict(list)
+    for package, entry in entries:
+        by_version[package.version].append((package, entry))
+    files = {}
+    for version, matches in by_version.items():
+        # Like the live feed, prefer an exact match and skip ambiguous ones.
+        exact = [entry for package, entry in matches if package.nuget_id == nuget_id]
+        if exact or len(matches) == 1:
+            files[_package_feed_path(root, nuget_id, version)] = feed_document(
+                host, exact[0] if exact else matches[0][1])
+    if entries:
+        files[root / FIND_PACKAGES_BY_ID_DIR / f'{nuget_id}.xml'] = feed_document(
+            host, '\n'.join(entry for _, entry in entries))
+    await sync_to_async(_write_files)(root, nuget_id, files)
+    return len(files)
+
+
+def _render_in_background(root: Path, host: str, nuget_id: str) -> None:
+    with _executor_lock:
+        # Changes made from now on need another render.
+        _pending.discard((root, host, nuget_id))
+    try:
+        async_to_sync(render_static_feeds)(root, host, nuget_id)
+    except Exception:
+        logger.exception('Failed to render static feeds for %s.', nuget_id)
+    finally:
+        # This thread's connections are not closed by the request cycle.
+        connections.close_all()
+
+
+def schedule_render(root: Path, host: str, nuget_id: str) -> None:
+    """
+    Render the static feeds of a package identifier in a background thread.
+
+    Errors are logged.
+
+    Parameters
+    ----------
+    root : Path
+        The static feed directory.
+    host : str
+        The protocol and hostname prefix for URLs.
+    nuget_id : str
+        NuGet package identifier.
+    """
+    global _executor  # ruff:ignore[global-statement]
+    key = (root, host, nuget_id)
+    with _executor_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+        if _executor is None:
+            # A single thread, so that renders of the same identifier never overlap.
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='minchoc-static-feeds')
+        _executor.submit(_render_in_background, root, host, nuget_id)
+
+
+def wait_for_renders() -> None:
+    """Wait until the renders scheduled so far are done."""
+    with _executor_lock:
+        executor = _executor
+    if executor is not None:
+        executor.submit(lambda: None).result()
+
+
+def package_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        nuget_id: str,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Schedule a render of the static feeds of a package identifier after it changed.
+
+    Nothing is done unless ``settings.MINCHOC_STATIC_FEED_ROOT`` is set. See
+    :py:func:`schedule_render`.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    nuget_id : str
+        NuGet package identifier.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    if (root := static_feed_root()) is not None:
+        schedule_render(root, static_feed_host(), nuget_id)
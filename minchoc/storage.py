@@ -0,0 +1,397 @@
+"""
+Package file storage with asynchronous read, write and delete.
+
+Package files are stored in the storage configured as ``STORAGES['minchoc']``, or in the default
+storage if there is no such entry. The asynchronous functions :py:func:`aopen` (with
+:py:func:`aiter_chunks` to stream the file), :py:func:`aread`, :py:func:`asave` and
+:py:func:`adelete` are used by the views. Storages derived from :py:class:`AsyncStorage`
+provide them natively; for other storages the synchronous methods are run in a dedicated thread
+pool of ``settings.MINCHOC_STORAGE_THREADS`` threads (default ``8``). Either way slow storage does
+not block the event loop, and it cannot use up the default executor that ``sync_to_async`` shares
+with the ORM.
+
+Two storages are included:
+
+* :py:class:`FileSystemPackageStorage`, the local file system.
+* :py:class:`S3PackageStorage`, any S3-compatible object store. It needs ``boto3``
+  (``pip install minchoc[s3]``) unless a client is passed.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import IO, TYPE_CHECKING, Any, TypeVar, cast
+import asyncio
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, Storage, storages
+from django.utils.deconstruct import deconstructible
+from typing_extensions import override
+
+from .metrics import STORAGE_DURATION
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover
+    boto3 = None
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable
+
+__all__ = ('CHUNK_SIZE', 'AsyncStorage', 'FileSystemPackageStorage', 'S3PackageStorage', 'adelete',
+           'aiter_chunks', 'aopen', 'aread', 'asave', 'io_executor', 'package_storage')
+
+_T = TypeVar('_T')
+CHUNK_SIZE = 64 * 1024
+"""Number of bytes read at a time when streaming a file."""
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def io_executor() -> ThreadPoolExecutor:
+    """
+    Get the thread pool used for blocking storage calls.
+
+    Returns
+    -------
+    ThreadPoolExecutor
+        The pool, created on first use with ``settings.MINCHOC_STORAGE_THREADS`` threads.
+    """
+    global _executor  # ruff:ignore[global-statement]
+    with _executor_lock:
+        if _executor is None:
+            threads = int(getattr(settings, 'MINCHOC_STORAGE_THREADS', 8))
+            _executor = ThreadPoolExecutor(max_workers=threads,
+                                           thread_name_prefix='minchoc-storage')
+        return _executor
+
+
+async def _run(func: Callable[..., _T], *args: Any) -> _T:
+    return await asyncio.get_running_loop().run_in_executor(io_executor(), partial(func, *args))
+
+
+def _read(storage: Storage, name: str) -> bytes:
+    with storage.open(name, 'rb') as f:
+        return cast('bytes', f.read())
+
+
+def _open(storage: Storage, name: str) -> File[bytes]:
+    f = storage.open(name, 'rb')
+    # Look up the size here, as it can take a system call or a request.
+    _ = f.size
+    return cast('File[bytes]', f)
+
+
+class AsyncStorage(Storage):
+    """
+    Base class of storages with asynchronous methods.
+
+    The default implementations run the synchronous methods in :py:func:`io_executor`. Subclasses
+    backed by an asynchronous client can override them.
+    """
+    if TYPE_CHECKING:
+        # Implemented by Django's storages but missing from their stubs.
+        def _open(self, name: str, mode: str = 'rb') -> File[bytes]:
+            ...
+
+        def _save(self, name: str, content: File[bytes]) -> str:
+            ...
+
+    async def aopen(self, name: str) -> File[bytes]:
+        """
+        Asynchronously open a file for reading.
+
+        Parameters
+        ----------
+        name : str
+            The storage name of the file.
+
+        Returns
+        -------
+        File[bytes]
+            The open file. Its ``size`` is already known.
+        """
+        return await _run(_open, self, name)
+
+    async def aread(self, name: str) -> bytes:
+        """
+        Asynchronously read a file.
+
+        Parameters
+        ----------
+        name : str
+            The storage name of the file.
+
+        Returns
+        -------
+        bytes
+            The content.
+        """
+        return await _run(_read, self, name)
+
+    async def asave(self, name: str, content: IO[bytes], max_length: int | None = None) -> str:
+        """
+        Asynchronously save a file.
+
+        Parameters
+        ----------
+        name : str
+            The wanted storage name.
+        content : IO[bytes]
+            The content.
+        max_length : int | None
+            Maximum length of the name.
+
+        Returns
+        -------
+        str
+            The name the file was saved as, which differs from ``name`` if that was taken.
+        """
+        return await _run(partial(self.save, max_length=max_length), name, content)
+
+    async def adelete(self, name: str) -> None:
+        """
+        Asynchronously delete a file.
+
+        Parameters
+        ----------
+        name : str
+            The storage name of the file.
+        """
+        await _run(self.delete, name)
+
+
+@deconstructible(path='minchoc.storage.FileSystemPackageStorage')
+class FileSystemPackageStorage(AsyncStorage, FileSystemStorage):
+    """
+    File system storage with asynchronous methods.
+
+    It takes the same options as :py:class:`~django.core.files.storage.FileSystemStorage`.
+    """
+
+
+def _is_missing(e: Exception) -> bool:
+    code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+    return isinstance(e, FileNotFoundError) or code in {'404', 'NoSuchKey'}
+
+
+@deconstructible(path='minchoc.storage.S3PackageStorage')
+class S3PackageStorage(AsyncStorage):
+    """
+    Storage in a bucket of an S3-compatible object store.
+
+    Parameters
+    ----------
+    bucket : str
+        The bucket name.
+    prefix : str
+        Prefix of every key, e.g. ``minchoc/``.
+    client : Any
+        A ``boto3`` S3 client or a compatible object with its ``upload_fileobj``, ``get_object``,
+        ``delete_object`` and ``list_objects_v2`` methods. If not given, one is made with
+        ``boto3.client('s3', **client_options)`` on first use.
+    **client_options : Any
+        Options for ``boto3.client``, e.g. ``endpoint_url`` and ``region_name``.
+    """
+    def __init__(self,
+                 bucket: str,
+                 prefix: str = '',
+                 client: Any = None,
+                 **client_options: Any) -> None:
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self._client = client
+        self._client_options = client_options
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        """
+        The S3 client.
+
+        Raises
+        ------
+        ImproperlyConfigured
+            If no client was given and ``boto3`` is not installed.
+        """
+        with self._client_lock:
+            if self._client is None:
+                if boto3 is None:  # pragma: no cover
+                    msg = 'S3PackageStorage needs boto3 (pip install minchoc[s3]) or a client.'
+                    raise ImproperlyConfigured(msg)
+                self._client = boto3.client('s3', **self._client_options)  # pragma: no cover
+            return self._client
+
+    def _key(self, name: str) -> str:
+        return f'{self.prefix}/{name}' if self.prefix else name
+
+    def _stat(self, name: str) -> dict[str, Any] | None:
+        key = self._key(name)
+        response = self.client.list_objects_v2(Bucket=self.bucket, Prefix=key, MaxKeys=1)
+        return next((x for x in response.get('Contents', ()) if x['Key'] == key), None)
+
+    @override
+    def _open(self, name: str, mode: str = 'rb') -> File[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as e:
+            if _is_missing(e):
+                raise FileNotFoundError(name) from e
+            raise
+        # Stream the body instead of reading it into memory.
+        f = File(response['Body'], name=name)
+        f.size = int(response['ContentLength'])
+        return f
+
+    @override
+    def _save(self, name: str, content: File[bytes]) -> str:
+        content.seek(0)
+        self.client.upload_fileobj(Fileobj=content, Bucket=self.bucket, Key=self._key(name))
+        return name
+
+    @override
+    def delete(self, name: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    @override
+    def exists(self, name: str) -> bool:
+        return self._stat(name) is not None
+
+    @override
+    def size(self, name: str) -> int:
+        if (stat := self._stat(name)) is None:
+            raise FileNotFoundError(name)
+        return int(stat['Size'])
+
+
+def package_storage() -> Storage:
+    """
+    Get the storage of package files.
+
+    This is the ``storage`` of :py:attr:`minchoc.models.Package.file`.
+
+    Returns
+    -------
+    Storage
+        ``STORAGES['minchoc']`` if configured, otherwise the default storage.
+    """
+    return storages['minchoc' if 'minchoc' in storages.backends else 'default']
+
+
+async def aopen(storage: Storage, name: str) -> File[bytes]:
+    """
+    Open a file for reading without blocking the event loop.
+
+    Read it with :py:func:`aiter_chunks` to stream it without loading it into memory.
+
+    Parameters
+    ----------
+    storage : Storage
+        The storage.
+    name : str
+        The storage name of the file.
+
+    Returns
+    -------
+    File[bytes]
+        The open file. Its ``size`` is already known.
+    """
+    with STORAGE_DURATION.time(operation='open'):
+        if isinstance(storage, AsyncStorage):
+            return await storage.aopen(name)
+        return await _run(_open, storage, name)
+
+
+async def aiter_chunks(f: File[bytes], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Read an open file in chunks without blocking the event loop, then close it.
+
+    Parameters
+    ----------
+    f : File[bytes]
+        The file, e.g. from :py:func:`aopen`.
+    chunk_size : int
+        Maximum number of bytes per chunk.
+
+    Yields
+    ------
+    bytes
+        The chunks.
+    """
+    try:
+        while chunk := await _run(f.read, chunk_size):
+            yield chunk
+    finally:
+        await _run(f.close)
+
+
+async def aread(storage: Storage, name: str) -> bytes:
+    """
+    Read a file without blocking the event loop.
+
+    Parameters
+    ----------
+    storage : Storage
+        The storage.
+    name : str
+        The storage name of the file.
+
+    Returns
+    -------
+    bytes
+        The content.
+    """
+    with STORAGE_DURATION.time(operation='read'):
+        if isinstance(storage, AsyncStorage):
+            return await storage.aread(name)
+        return await _run(_read, storage, name)
+
+
+async def asave(storage: Storage,
+                name: str,
+                content: IO[bytes],
+                max_length: int | None = None) -> str:
+    """
+    Save a file without blocking the event loop.
+
+    Parameters
+    ----------
+    storage : Storage
+        The storage.
+    name : str
+        The wanted storage name.
+    content : IO[bytes]
+        The content.
+    max_length : int | None
+        Maximum length of the name.
+
+    Returns
+    -------
+    str
+        The name the file was saved as.
+    """
+    with STORAGE_DURATION.time(operation='save'):
+        if isinstance(storage, AsyncStorage):
+            return await storage.asave(name, content, max_length)
+        return await _run(partial(storage.save, max_length=max_length), name, content)
+
+
+async def adelete(storage: Storage, name: str) -> None:
+    """
+    Delete a file without blocking the event loop.
+
+    Parameters
+    ----------
+    storage : Storage
+        The storage.
+    name : str
+        The storage name of the file.
+    """
+    with STORAGE_DURATION.time(operation='delete'):
+        if isinstance(storage, AsyncStorage):
+            await storage.adelete(name)
+        else:
+            await _run(storage.delete, name)
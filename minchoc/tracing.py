@@ -0,0 +1,293 @@
+"""
+Lightweight tracing of the phases of feed requests and uploads.
+
+Set ``settings.MINCHOC_TRACE_EXPORTER`` to the dotted path of a :py:class:`SpanExporter` subclass
+to record spans, and ``settings.MINCHOC_TRACE_EXPORTER_OPTIONS`` to the keyword arguments it is
+created with. For example, to write spans to a file for local testing:
+
+.. code-block:: python
+
+    MINCHOC_TRACE_EXPORTER = 'minchoc.tracing.JSONLinesExporter'
+    MINCHOC_TRACE_EXPORTER_OPTIONS = {'path': '/tmp/minchoc-spans.jsonl'}
+
+Spans started inside another span in the same request or task are its children and share its
+trace identifier. When no exporter is set, :py:func:`span` returns a shared no-op context manager,
+so tracing costs one global lookup per phase.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Any, ParamSpec, TextIO, TypeVar
+import json
+import secrets
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Generator
+    from contextlib import AbstractContextManager
+
+__all__ = ('InMemoryExporter', 'JSONLinesExporter', 'Span', 'SpanExporter', 'configure',
+           'current_span', 'get_exporter', 'set_exporter', 'setting_changed_receiver', 'span',
+           'traced')
+
+_P = ParamSpec('_P')
+_T = TypeVar('_T')
+_exporter: SpanExporter | None = None
+_current: ContextVar[Span | None] = ContextVar('minchoc_current_span', default=None)
+_NO_SPAN: AbstractContextManager[None] = nullcontext()
+
+
+class Span:
+    """
+    A timed phase of work.
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase.
+    parent : Span | None
+        The enclosing span, or ``None`` to start a new trace.
+    attributes : dict[str, Any]
+        Values describing the work, which must be serialisable as JSON.
+    """
+    def __init__(self, name: str, parent: Span | None, attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id: str = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = time()
+        """Start time as a Unix timestamp."""
+        self.duration = 0.0
+        """Duration in seconds, set when the span ends."""
+        self.error: str | None = None
+        """Name of the exception type that ended the span, if any."""
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Convert the span to a dictionary.
+
+        Returns
+        -------
+        dict[str, Any]
+            The span, serialisable as JSON.
+        """
+        return {
+            'attributes': self.attributes,
+            'duration': self.duration,
+            'error': self.error,
+            'name': self.name,
+            'parent_id': self.parent_id,
+            'span_id': self.span_id,
+            'start': self.start,
+            'trace_id': self.trace_id
+        }
+
+
+class SpanExporter(ABC):
+    """Base class of span exporters."""
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """
+        Export a finished span.
+
+        Called from the thread or task that ran the span, so it must be fast and thread-safe.
+
+        Parameters
+        ----------
+        span : Span
+            The span.
+        """
+
+
+class InMemoryExporter(SpanExporter):
+    """Keep finished spans in a list, for tests."""
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    @override
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        """Forget the exported spans."""
+        with self._lock:
+            self.spans.clear()
+
+
+class JSONLinesExporter(SpanExporter):
+    """
+    Append finished spans to a file, one JSON object per line.
+
+    Parameters
+    ----------
+    path : str | Path
+        The file. It is created if it does not exist.
+    """
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._file: TextIO | None = None
+        self._lock = threading.Lock()
+
+    @override
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str, separators=(',', ':'))
+        with self._lock:
+            if self._file is None:
+                self._file = self.path.open('a', encoding='utf-8', buffering=1)
+            self._file.write(f'{line}\n')
+
+    def close(self) -> None:
+        """Close the file. It is opened again by the next export."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def get_exporter() -> SpanExporter | None:
+    """
+    Get the exporter spans are sent to.
+
+    Returns
+    -------
+    SpanExporter | None
+        The exporter, or ``None`` if tracing is off.
+    """
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter | None) -> None:
+    """
+    Send spans to an exporter.
+
+    Parameters
+    ----------
+    exporter : SpanExporter | None
+        The exporter, or ``None`` to turn tracing off.
+    """
+    global _exporter  # ruff:ignore[global-statement]
+    if isinstance(_exporter, JSONLinesExporter) and _exporter is not exporter:
+        _exporter.close()
+    _exporter = exporter
+
+
+def configure() -> None:
+    """Create the exporter set in ``settings.MINCHOC_TRACE_EXPORTER``, or turn tracing off."""
+    if path := getattr(settings, 'MINCHOC_TRACE_EXPORTER', None):
+        set_exporter(
+            import_string(path)(**getattr(settings, 'MINCHOC_TRACE_EXPORTER_OPTIONS', None) or {}))
+    else:
+        set_exporter(None)
+
+
+def setting_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        setting: str,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Reconfigure tracing when its settings change, e.g. in tests.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    setting : str
+        Name of the changed setting.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    if setting in {'MINCHOC_TRACE_EXPORTER', 'MINCHOC_TRACE_EXPORTER_OPTIONS'}:
+        configure()
+
+
+def current_span() -> Span | None:
+    """
+    Get the innermost span of the current request or task.
+
+    Returns
+    -------
+    Span | None
+        The span, or ``None`` outside of spans and when tracing is off.
+    """
+    return _current.get()
+
+
+@contextmanager
+def _record(exporter: SpanExporter, name: str,
+            attributes: dict[str, Any]) -> Generator[Span, None, None]:
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    start = perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = perf_counter() - start
+        _current.reset(token)
+        exporter.export(current)
+
+
+def span(name: str, **attributes: Any) -> AbstractContextManager[Span | None]:
+    """
+    Time a block of code as a span.
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase, for example ``feed.query``.
+    **attributes : Any
+        Values describing the work. They are only used if tracing is on, so they should be cheap to
+        compute.
+
+    Returns
+    -------
+    AbstractContextManager[Span | None]
+        Context manager yielding the span, or ``None`` if tracing is off. Attributes can be added
+        to the span while it runs.
+    """
+    if (exporter := _exporter) is None:
+        return _NO_SPAN
+    return _record(exporter, name, attributes)
+
+
+def traced(name: str) -> Callable[[Callable[_P, Awaitable[_T]]], Callable[_P, Awaitable[_T]]]:
+    """
+    Run each call of a coroutine function in a span.
+
+    Spans started by the function are children of this span.
+
+    Parameters
+    ----------
+    name : str
+        Name of the span.
+
+    Returns
+    -------
+    Callable[[Callable[_P, Awaitable[_T]]], Callable[_P, Awaitable[_T]]]
+        The decorator.
+    """
+    def decorator(func: Callable[_P, Awaitable[_T]]) -> Callable[_P, Awaitable[_T]]:
+        @wraps(func)
+        async def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+            if (exporter := _exporter) is None:
+                return await func(*args, **kwargs)
+            with _record(exporter, name, {}):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,6 +1,7 @@
 """URL patterns."""
 from __future__ import annotations
 
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -10,10 +11,17 @@ __all__ = ('urlpatterns',)
 # https://learn.microsoft.com/en-us/nuget/api/package-publish-resource
 urlpatterns = [
     path('$metadata', views.metadata),
+    path('Dependents()', views.dependents),
     path('FindPackagesById()', views.find_packages_by_id),
+    path('GetUpdates()', views.get_updates),
+    path('ResolveDependencies()', views.resolve_dependencies),
+    path('Search()', views.search),
+    path('Search()/$count', views.search_count_view),
     path('Packages()', views.packages),
     path("Packages(Id='<name>',Version='<version>')", views.packages_with_args),
     path('package/<name>/<version>', views.fetch_package_file),
     path('package/', views.APIV2PackageView.as_view()),
     path('', views.home)
 ]
+if metrics_url := getattr(settings, 'MINCHOC_METRICS_URL', None):
+    urlpatterns.insert(0, path(metrics_url, views.metrics))
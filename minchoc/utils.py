@@ -1,19 +1,531 @@
 """Utility functions."""
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import IO, TYPE_CHECKING, NamedTuple, TypeVar, cast
+import base64
+import hashlib
+import logging
 
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import (
+    Case,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+    When,
+    aprefetch_related_objects,
+)
 
-from .models import Package
+from .models import Author, Package, PackageDependency, PackageSearchTerm, Tag
+from .nuspec import (
+    NuspecDependency,
+    format_dependencies,
+    parse_dependencies,
+    split_authors,
+    split_tags,
+)
+from .search import search_terms
+from .versions import parse_version, parse_version_range, version_sort_key
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Collection, Iterable, Mapping
     from xml.etree.ElementTree import Element
 
-__all__ = ('make_entry', 'tag_text_or')
+    from django.db.models import Model, QuerySet
 
+    from .models import SortKeyField
 
-async def make_entry(host: str, package: Package, ending: str = '\n') -> str:
+__all__ = ('ENTRY_PROPERTIES', 'afind_package', 'apply_nuspec_values', 'apply_version_fields',
+           'bulk_create_packages', 'entry_fields', 'get_or_create_by_name', 'hash_file',
+           'index_dependencies', 'index_search_terms', 'make_entry', 'parse_select',
+           'prefetch_entries', 'tag_text_or', 'update_latest_versions')
+
+_NamedModelT = TypeVar('_NamedModelT', Author, Tag)
+PACKAGE_FIELDS = {f.name: f for f in Package._meta.get_fields()}
+_VERSION_SORT_KEY_MAX_LENGTH = cast('SortKeyField',
+                                    Package._meta.get_field('version_sort_key')).max_length
+
+logger = logging.getLogger(__name__)
+
+
+def apply_nuspec_values(package: Package, values: dict[str, str]) -> tuple[list[str], list[str]]:
+    """
+    Copy nuspec field values on to an unsaved package.
+
+    Parameters
+    ----------
+    package : Package
+        The package to populate.
+    values : dict[str, str]
+        Values keyed by field name, as returned by :py:func:`minchoc.nuspec.nuspec_values`.
+
+    Returns
+    -------
+    tuple[list[str], list[str]]
+        The names of the tags and authors to attach once the package has been saved.
+    """
+    tag_names: list[str] = []
+    author_names: list[str] = []
+    for column_name, value in values.items():
+        column_type = (None if column_name not in PACKAGE_FIELDS else
+                       PACKAGE_FIELDS[column_name].get_internal_type())
+        if not column_type or column_type == 'ManyToManyField':
+            if column_name == 'tags':
+                tag_names.extend(split_tags(value))
+            elif column_name == 'authors':
+                author_names.extend(split_authors(value))
+            else:  # pragma no cover
+                logger.warning('Did not set %s', column_name)
+        elif column_type == 'BooleanField':
+            setattr(package, column_name, value.lower() == 'true')
+        elif column_type == 'JSONField' and column_name == 'dependencies':
+            package.dependencies = [x._asdict() for x in parse_dependencies(value)]
+        else:
+            setattr(package, column_name, value)
+    return tag_names, author_names
+
+
+def apply_version_fields(package: Package) -> None:
+    """
+    Parse the package version string on to the version columns.
+
+    This sets the numeric version columns, ``version_beta``, ``is_prerelease`` and
+    ``version_sort_key``. :py:func:`minchoc.versions.parse_version` raises ``ValueError`` if the
+    version is not a valid NuGet version.
+
+    Parameters
+    ----------
+    package : Package
+        The package to populate.
+    """
+    parsed = parse_version(package.version)
+    package.version0 = parsed.major
+    package.version1 = parsed.minor
+    package.version2 = parsed.patch
+    package.version3 = parsed.revision
+    package.version_beta = parsed.prerelease
+    package.is_prerelease = parsed.is_prerelease
+    package.version_sort_key = version_sort_key(parsed)[:_VERSION_SORT_KEY_MAX_LENGTH]
+
+
+def update_latest_versions(nuget_ids: Iterable[str]) -> None:
+    """
+    Recompute ``is_latest_version`` and ``is_absolute_latest_version`` for package identifiers.
+
+    The latest versions are found with the ``(nuget_id, version_sort_key)`` index and the flags are
+    written with a single ``UPDATE``. Only listed packages can be the latest version.
+
+    Parameters
+    ----------
+    nuget_ids : Iterable[str]
+        The package identifiers whose packages changed.
+    """
+    nuget_ids = set(nuget_ids)
+    if not nuget_ids:
+        return
+    manager = Package._default_manager
+    listed = manager.filter(nuget_id=OuterRef('nuget_id'),
+                            listed=True).order_by('-version_sort_key')
+    newest = Subquery(listed.values('pk')[:1])
+    newest_stable = Subquery(listed.filter(is_prerelease=False).values('pk')[:1])
+    absolute_latest = list(
+        manager.filter(nuget_id__in=nuget_ids, pk=newest).values_list('pk', flat=True))
+    latest = list(
+        manager.filter(nuget_id__in=nuget_ids, pk=newest_stable).values_list('pk', flat=True))
+    manager.filter(nuget_id__in=nuget_ids).update(
+        is_latest_version=Case(When(pk__in=latest, then=Value(value=True)),
+                               default=Value(value=False)),
+        is_absolute_latest_version=Case(When(pk__in=absolute_latest, then=Value(value=True)),
+                                        default=Value(value=False)))
+
+
+def index_search_terms(items: Iterable[tuple[Package, list[str]]]) -> None:
+    """
+    Add saved packages to the search index used by ``Search()``.
+
+    Terms a package is already indexed under are ignored.
+
+    Parameters
+    ----------
+    items : Iterable[tuple[Package, list[str]]]
+        Saved packages, each with the names of its tags.
+    """
+    terms = [
+        PackageSearchTerm(package_id=package.pk, term=term) for package, tag_names in items
+        for term in search_terms(package.nuget_id, (package.title, package.description, *tag_names))
+    ]
+    PackageSearchTerm._default_manager.bulk_create(terms, ignore_conflicts=True)
+
+
+def index_dependencies(packages: Iterable[Package]) -> None:
+    """
+    Add the dependencies of saved packages to the dependency table.
+
+    The rows are made from :py:attr:`~minchoc.models.Package.dependencies`. A version range that
+    cannot be parsed is stored without bounds so the dependency is still found by identifier.
+
+    Parameters
+    ----------
+    packages : Iterable[Package]
+        Saved packages.
+    """
+    rows = []
+    for package in packages:
+        for dependency in (NuspecDependency(**x) for x in package.dependencies or ()):
+            try:
+                version_range = parse_version_range(dependency.version_range)
+            except ValueError:
+                logger.warning('Invalid version range %r for dependency %s of %s',
+                               dependency.version_range, dependency.nuget_id, package)
+                version_range = parse_version_range('')
+            rows.append(
+                PackageDependency(package_id=package.pk,
+                                  nuget_id=dependency.nuget_id,
+                                  nuget_id_lower=dependency.nuget_id.lower(),
+                                  target_framework=dependency.target_framework,
+                                  version_range=dependency.version_range,
+                                  min_version_key=version_range.min_key,
+                                  min_inclusive=version_range.min_inclusive,
+                                  max_version_key=version_range.max_key,
+                                  max_inclusive=version_range.max_inclusive))
+    PackageDependency._default_manager.bulk_create(rows, ignore_conflicts=True)
+
+
+def get_or_create_by_name(model: type[_NamedModelT], names: Iterable[str]) -> list[_NamedModelT]:
+    """
+    Get or create model instances by their unique ``name`` in a fixed number of queries.
+
+    Missing rows are inserted with a single ``bulk_create`` call that ignores conflicts, so this is
+    safe to run concurrently with another upload adding the same names.
+
+    Parameters
+    ----------
+    model : type[Author] | type[Tag]
+        The model class. It must have a unique ``name`` field.
+    names : Iterable[str]
+        The names to look up. Duplicates are ignored.
+
+    Returns
+    -------
+    list[Author] | list[Tag]
+        The instances, in the order the names first appear.
+    """
+    unique_names = list(dict.fromkeys(names))
+    if not unique_names:
+        return []
+    model._default_manager.bulk_create([model(name=name) for name in unique_names],
+                                       ignore_conflicts=True)
+    by_name = {x.name: x for x in model._default_manager.filter(name__in=unique_names)}
+    return [by_name[name] for name in unique_names]
+
+
+def bulk_create_packages(items: Iterable[tuple[Package, list[str], list[str]]]) -> list[Package]:
+    """
+    Insert packages with their tags and authors in one transaction and a fixed number of queries.
+
+    Search terms and dependency rows are added in the same transaction. Package files must already
+    be stored.
+
+    Parameters
+    ----------
+    items : Iterable[tuple[Package, list[str], list[str]]]
+        Unsaved packages, each with the names of its tags and the names of its authors.
+
+    Returns
+    -------
+    list[Package]
+        The saved packages.
+    """
+    items = list(items)
+    for package, _, __ in items:
+        # ``bulk_create`` does not call ``save``.
+        package.nuget_id_lower = package.nuget_id.lower()
+    with transaction.atomic():
+        tags = {
+            x.name: x
+            for x in get_or_create_by_name(Tag, (n for _, tag_names, __ in items
+                                                 for n in tag_names))
+        }
+        authors = {
+            x.name: x
+            for x in get_or_create_by_name(Author, (n for _, __, author_names in items
+                                                    for n in author_names))
+        }
+        packages: list[Package] = Package._default_manager.bulk_create(
+            [package for package, _, __ in items])
+        if any(x.pk is None for x in packages):  # pragma no cover
+            # Backends that cannot return primary keys from a bulk insert.
+            pks = {
+                (nuget_id, version): pk
+                for pk, nuget_id, version in Package._default_manager.filter(
+                    nuget_id__in={x.nuget_id
+                                  for x in packages}).values_list('pk', 'nuget_id', 'version')
+            }
+            for x in packages:
+                x.pk = pks[x.nuget_id, x.version]
+        tag_through = cast('type[Model]', Package.tags.through)
+        tag_through._default_manager.bulk_create([
+            tag_through(package_id=package.pk, tag_id=tags[name].pk)
+            for package, tag_names, _ in items for name in dict.fromkeys(tag_names)
+        ])
+        author_through = cast('type[Model]', Package.authors.through)
+        author_through._default_manager.bulk_create([
+            author_through(package_id=package.pk, author_id=authors[name].pk)
+            for package, _, author_names in items for name in dict.fromkeys(author_names)
+        ])
+        index_search_terms((package, tag_names) for package, tag_names, _ in items)
+        index_dependencies(packages)
+        update_latest_versions(x.nuget_id for x in packages)
+    return packages
+
+
+def hash_file(f: IO[bytes], out: IO[bytes] | None = None, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a file the way NuGet does, optionally copying it at the same time.
+
+    Parameters
+    ----------
+    f : IO[bytes]
+        The file to hash. It is read from the current position.
+    out : IO[bytes] | None
+        If given, everything read is also written to this file.
+    chunk_size : int
+        Number of bytes to read at a time.
+
+    Returns
+    -------
+    str
+        Base64-encoded SHA512 digest.
+    """
+    h = hashlib.sha512()
+    while chunk := f.read(chunk_size):
+        h.update(chunk)
+        if out is not None:
+            out.write(chunk)
+    return base64.b64encode(h.digest()).decode()
+
+
+class _EntryValues(NamedTuple):
+    host: str
+    package: Package
+    total_downloads: int | None
+    tag_names: str
+
+
+def _xml_bool(value: bool) -> str:  # ruff:ignore[boolean-type-hint-positional-argument]
+    return 'true' if value else 'false'
+
+
+def _dependencies(package: Package) -> str:
+    return format_dependencies(NuspecDependency(**x) for x in package.dependencies or ())
+
+
+def _gallery_url(v: _EntryValues) -> str:
+    return f'{v.host}/package/{v.package.nuget_id}/{v.package.version}'
+
+
+_ENTRY_PROPERTIES: dict[str, tuple[tuple[str, ...], Callable[[_EntryValues], str]]] = {
+    'Copyright': (
+        ('copyright',), lambda v: f"<d:Copyright>{v.package.copyright or ''}</d:Copyright>"),
+    'Dependencies': (('dependencies',),
+                     lambda v: f'<d:Dependencies>{_dependencies(v.package)}</d:Dependencies>'),
+    'Description': (('description',),
+                    lambda v: f"<d:Description>{v.package.description or ''}</d:Description>"),
+    'DownloadCount': (
+        (), lambda v: f'<d:DownloadCount m:type="Edm.Int32">{v.total_downloads}</d:DownloadCount>'),
+    'GalleryDetailsUrl': (
+        (), lambda v: f'<d:GalleryDetailsUrl>{_gallery_url(v)}</d:GalleryDetailsUrl>'),
+    'IconUrl': (('icon_url',), lambda v: f"<d:IconUrl>{v.package.icon_url or ''}</d:IconUrl>"),
+    'IsAbsoluteLatestVersion': (('is_absolute_latest_version',), lambda v:
+                                ('<d:IsAbsoluteLatestVersion m:type="Edm.Boolean">'
+                                 f'{_xml_bool(v.package.is_absolute_latest_version)}'
+                                 '</d:IsAbsoluteLatestVersion>')),
+    'IsApproved': ((), lambda _: '<d:IsApproved m:type="Edm.Boolean">true</d:IsApproved>'),
+    'IsLatestVersion': (('is_latest_version',), lambda v:
+                        ('<d:IsLatestVersion m:type="Edm.Boolean">'
+                         f'{_xml_bool(v.package.is_latest_version)}</d:IsLatestVersion>')),
+    'IsPrerelease': (('is_prerelease',), lambda v:
+                     ('<d:IsPrerelease m:type="Edm.Boolean">'
+                      f'{_xml_bool(v.package.is_prerelease)}</d:IsPrerelease>')),
+    'Language': ((), lambda _: '<d:Language m:null="true" />'),
+    'LastEdited': ((), lambda _: '<d:LastEdited m:type="Edm.DateTime" m:null="true" />'),
+    'LicenseNames': ((), lambda _: '<d:LicenseNames m:null="true" />'),
+    'LicenseReportUrl': ((), lambda _: '<d:LicenseReportUrl m:null="true" />'),
+    'LicenseUrl': (
+        ('license_url',), lambda v: f"<d:LicenseUrl>{v.package.license_url or ''}</d:LicenseUrl>"),
+    'PackageHash': (('hash',), lambda v: f"<d:PackageHash>{v.package.hash or ''}</d:PackageHash>"),
+    'PackageHashAlgorithm': (('hash_algorithm',), lambda v:
+                             (f"<d:PackageHashAlgorithm>{v.package.hash_algorithm or ''}"
+                              '</d:PackageHashAlgorithm>')),
+    'PackageSize': (
+        ('size',), lambda v: f'<d:PackageSize m:type="Edm.Int64">{v.package.size}</d:PackageSize>'),
+    'ProjectUrl': (
+        ('project_url',), lambda v: f'<d:ProjectUrl>{v.package.project_url}</d:ProjectUrl>'),
+    'Published': ((), lambda v: ('<d:Published m:type="Edm.DateTime">'
+                                 f'{v.package.published.isoformat()}</d:Published>')),
+    'ReleaseNotes': (('release_notes',),
+                     lambda v: f"<d:ReleaseNotes>{v.package.release_notes or ''}</d:ReleaseNotes>"),
+    'RequireLicenseAcceptance': (('require_license_acceptance',), lambda v:
+                                 ('<d:RequireLicenseAcceptance m:type="Edm.Boolean">'
+                                  f'{_xml_bool(v.package.require_license_acceptance)}'
+                                  '</d:RequireLicenseAcceptance>')),
+    'Summary': (('summary',), lambda v: f"<d:Summary>{v.package.summary or ''}</d:Summary>"),
+    'Tags': ((), lambda v: f'<d:Tags xml:space="preserve"> {v.tag_names} </d:Tags>'),
+    'Title': (('title',), lambda v: f'<d:Title>{v.package.title}</d:Title>'),
+    'Version': ((), lambda v: f'<d:Version>{v.package.version}</d:Version>'),
+    'VersionDownloadCount': (('download_count',), lambda v:
+                             ('<d:VersionDownloadCount m:type="Edm.Int32">'
+                              f'{v.package.download_count}</d:VersionDownloadCount>')),
+}
+ENTRY_PROPERTIES = ('Authors', 'Id', *_ENTRY_PROPERTIES)
+"""Property names accepted by ``$select``."""
+_ENTRY_BASE_FIELDS = ('id', 'nuget_id', 'published', 'version')
+
+
+def parse_select(value: str | None) -> frozenset[str] | None:
+    """
+    Parse an OData ``$select`` parameter.
+
+    Parameters
+    ----------
+    value : str | None
+        The parameter value, e.g. ``Id,Version,IsLatestVersion``.
+
+    Returns
+    -------
+    frozenset[str] | None
+        The selected property names, or ``None`` if all properties are selected.
+
+    Raises
+    ------
+    ValueError
+        If a property name is not one of :py:data:`ENTRY_PROPERTIES`.
+    """
+    names = frozenset(x.strip() for x in (value or '').split(',') if x.strip())
+    if not names or '*' in names:
+        return None
+    if unknown := names - set(ENTRY_PROPERTIES):
+        msg = f'Unknown properties: {", ".join(sorted(unknown))}'
+        raise ValueError(msg)
+    return names
+
+
+def entry_fields(select: Collection[str]) -> list[str]:
+    """
+    Get the package columns needed to render the selected properties of an entry.
+
+    Pass the result to :py:meth:`django.db.models.query.QuerySet.only`.
+
+    Parameters
+    ----------
+    select : Collection[str]
+        Selected property names.
+
+    Returns
+    -------
+    list[str]
+        Field names.
+    """
+    fields = list(_ENTRY_BASE_FIELDS)
+    for name in select:
+        if name in _ENTRY_PROPERTIES:
+            fields.extend(_ENTRY_PROPERTIES[name][0])
+    return fields
+
+
+async def afind_package(nuget_id: str,
+                        version: str,
+                        queryset: QuerySet[Package] | None = None) -> Package | None:
+    """
+    Find a package by identifier and version.
+
+    An exact match of the identifier is preferred. Otherwise the identifier is matched
+    case-insensitively, but only if that matches exactly one package: identifiers that differ only
+    in case are distinct packages and must not be confused with each other. This takes one query.
+
+    Parameters
+    ----------
+    nuget_id : str
+        NuGet package identifier.
+    version : str
+        Package version string.
+    queryset : QuerySet[Package] | None
+        Queryset to search, for example with deferred fields. It must load ``nuget_id``. Defaults
+        to all packages.
+
+    Returns
+    -------
+    Package | None
+        The package, or ``None`` if there is no match.
+
+    Raises
+    ------
+    Package.MultipleObjectsReturned
+        If there is no exact match and more than one package matches case-insensitively.
+    """
+    if queryset is None:
+        queryset = Package._default_manager.all()
+    matches: list[Package] = [
+        x async for x in queryset.filter(nuget_id_lower=nuget_id.lower(), version=version)
+    ]
+    for package in matches:
+        if package.nuget_id == nuget_id:
+            return package
+    if len(matches) > 1:
+        raise Package.MultipleObjectsReturned
+    return matches[0] if matches else None
+
+
+def _is_prefetched(package: Package, name: str) -> bool:
+    return name in getattr(package, '_prefetched_objects_cache', ())
+
+
+async def prefetch_entries(packages: list[Package],
+                           select: Collection[str] | None = None) -> dict[str, int] | None:
+    """
+    Load what :py:func:`make_entry` needs for many packages in a fixed number of queries.
+
+    Authors and tags are prefetched on to the packages. Pass the returned totals to
+    :py:func:`make_entry` as ``download_totals``.
+
+    Parameters
+    ----------
+    packages : list[Package]
+        The packages to render.
+    select : Collection[str] | None
+        Property names to include (``$select``), or ``None`` for all of them. Only the data needed
+        for the selected properties is loaded.
+
+    Returns
+    -------
+    dict[str, int] | None
+        Download totals keyed by identifier, or ``None`` if ``DownloadCount`` is not selected.
+    """
+    lookups = [
+        Prefetch(name, queryset=model._default_manager.order_by('pk'))
+        for name, model, prop in (('authors', Author, 'Authors'), ('tags', Tag, 'Tags'))
+        if select is None or prop in select
+    ]
+    if lookups:
+        await aprefetch_related_objects(packages, *lookups)
+    if select is not None and 'DownloadCount' not in select:
+        return None
+    return {
+        x['nuget_id']: x['total_downloads']
+        async for x in Package._default_manager.filter(
+            nuget_id__in={x.nuget_id
+                          for x in packages}).values('nuget_id').annotate(
+                              total_downloads=Sum('download_count')).order_by()
+    }
+
+
+async def make_entry(host: str,
+                     package: Package,
+                     ending: str = '\n',
+                     select: Collection[str] | None = None,
+                     download_totals: Mapping[str, int] | None = None) -> str:
     """
     Create a package ``<entry>`` element for a package XML feed.
 
@@ -25,16 +537,40 @@ async def make_entry(host: str, package: Package, ending: str = '\n') -> str:
         The :py:class:`~minchoc.models.Package` instance to render.
     ending : str
         Trailing string appended after the closing ``</entry>`` tag.
+    select : Collection[str] | None
+        Property names to include (``$select``). ``None`` includes all of them. The author, tag and
+        download total queries are only made if ``Authors``, ``Tags`` or ``DownloadCount`` are
+        selected.
+    download_totals : Mapping[str, int] | None
+        Download totals keyed by identifier, from :py:func:`prefetch_entries`. If ``None``, the
+        total is queried. Authors and tags are also queried unless they were prefetched.
 
     Returns
     -------
     str
         The rendered XML ``<entry>`` element.
     """
-    total_downloads = (await Package._default_manager.filter(nuget_id=package.nuget_id).aaggregate(
-        total_downloads=Sum('download_count')))['total_downloads']
-    first_author = await package.authors.afirst()
-    tag_names = ' '.join([t.name async for t in package.tags.all()])
+    names = _ENTRY_PROPERTIES.keys() if select is None else [
+        x for x in _ENTRY_PROPERTIES if x in select
+    ]
+    total_downloads = None
+    if 'DownloadCount' in names:
+        if download_totals is not None:
+            total_downloads = download_totals.get(package.nuget_id)
+        else:
+            total_downloads = (await Package._default_manager.filter(
+                nuget_id=package.nuget_id).aaggregate(total_downloads=Sum('download_count')
+                                                      ))['total_downloads']
+    first_author = None
+    if select is None or 'Authors' in select:
+        first_author = (next(iter(package.authors.all()), None) if _is_prefetched(
+            package, 'authors') else await package.authors.afirst())
+    tag_names = ''
+    if 'Tags' in names:
+        tag_names = ' '.join([t.name for t in package.tags.all(
+        )] if _is_prefetched(package, 'tags') else [t.name async for t in package.tags.all()])
+    values = _EntryValues(host, package, total_downloads, tag_names)
+    properties = '\n        '.join(_ENTRY_PROPERTIES[x][1](values) for x in names)
     return f"""<entry>
     <id>{host}/api/v2/Packages(Id='{package.nuget_id}',Version='{package.version}')</id>
     <category term="NuGetGallery.V2FeedPackage"
@@ -51,35 +587,9 @@ async def make_entry(host: str, package: Package, ending: str = '\n') -> str:
         src="{host}/api/v2/package/{package.nuget_id}/{package.version}" />
     <m:properties xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata"
                   xmlns:d="http://schemas.microsoft.com/ado/2007/08/dataservices">
-        <d:Copyright>{package.copyright or ''}</d:Copyright>
-        <d:Dependencies></d:Dependencies>
-        <d:Description>{package.description or ''}</d:Description>
-        <d:DownloadCount m:type="Edm.Int32">{total_downloads}</d:DownloadCount>
-        <d:GalleryDetailsUrl>{host}/package/{package.nuget_id}/{package.version}</d:GalleryDetailsUrl>
-        <d:IconUrl>{package.icon_url or ''}</d:IconUrl>
-        <d:IsAbsoluteLatestVersion m:type="Edm.Boolean">{'true' if package.is_absolute_latest_version else 'false'}</d:IsAbsoluteLatestVersion>
-        <d:IsApproved m:type="Edm.Boolean">true</d:IsApproved>
-        <d:IsLatestVersion m:type="Edm.Boolean">{'true' if package.is_latest_version else 'false'}</d:IsLatestVersion>
-        <d:IsPrerelease m:type="Edm.Boolean">{'true' if package.is_prerelease else 'false'}</d:IsPrerelease>
-        <d:Language m:null="true" />
-        <d:LastEdited m:type="Edm.DateTime" m:null="true" />
-        <d:LicenseNames m:null="true" />
-        <d:LicenseReportUrl m:null="true" />
-        <d:LicenseUrl>{package.license_url or ''}</d:LicenseUrl>
-        <d:PackageHash>{package.hash or ''}</d:PackageHash>
-        <d:PackageHashAlgorithm>{package.hash_algorithm or ''}</d:PackageHashAlgorithm>
-        <d:PackageSize m:type="Edm.Int64">{package.size}</d:PackageSize>
-        <d:ProjectUrl>{package.project_url}</d:ProjectUrl>
-        <d:Published m:type="Edm.DateTime">{package.published.isoformat()}</d:Published>
-        <d:ReleaseNotes>{package.release_notes or ''}</d:ReleaseNotes>
-        <d:RequireLicenseAcceptance m:type="Edm.Boolean">{'true' if package.require_license_acceptance else 'false'}</d:RequireLicenseAcceptance>
-        <d:Summary>{package.summary or ''}</d:Summary>
-        <d:Tags xml:space="preserve"> {tag_names} </d:Tags>
-        <d:Title>{package.title}</d:Title>
-        <d:Version>{package.version}</d:Version>
-        <d:VersionDownloadCount m:type="Edm.Int32">{package.download_count}</d:VersionDownloadCount>
+        {properties}
     </m:properties>
-</entry>{ending}"""  # ruff:ignore[line-too-long]
+</entry>{ending}"""
 
 
 def tag_text_or(tag: Element | None, default: str | None = None) -> str | None:
@@ -0,0 +1,331 @@
+"""
+Pre-rendered NuGet v3 resources for clients that support the v3 protocol.
+
+Files are written below ``settings.MINCHOC_V3_ROOT``, which must be served at
+``settings.MINCHOC_V3_BASE_URL``:
+
+- ``index.json``, the service index.
+- ``flatcontainer/<id>/index.json`` with the versions of a package identifier, and
+  ``flatcontainer/<id>/<version>/<id>.<version>.nupkg`` with each package file
+  (``PackageBaseAddress/3.0.0``).
+- ``registration/<id>/index.json`` with the metadata of every version in inlined pages, and
+  ``registration/<id>/<version>.json`` for each version (``RegistrationsBaseUrl``).
+
+Identifiers and versions are lowercase in paths, and versions are normalised (see
+:py:func:`minchoc.versions.normalize_version`). The files of an identifier are rewritten when one of
+its packages is uploaded or deleted, so a static file server or CDN can answer v3 clients without
+Django. JSON files are also written compressed, like the static feeds. Package files are hard linked
+from storage where possible and copied otherwise.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+from .models import Package
+from .static_feeds import is_safe_name, write_static_file
+from .storage import io_executor
+from .versions import normalize_version, parse_version
+
+if TYPE_CHECKING:
+    from django.core.files.storage import Storage
+
+__all__ = ('FLAT_CONTAINER_DIR', 'REGISTRATION_DIR', 'REGISTRATION_PAGE_SIZE',
+           'package_changed_receiver', 'render_v3', 'v3_base_url', 'v3_root', 'write_service_index')
+
+FLAT_CONTAINER_DIR = 'flatcontainer'
+"""Directory of the ``PackageBaseAddress/3.0.0`` resource."""
+REGISTRATION_DIR = 'registration'
+"""Directory of the ``RegistrationsBaseUrl`` resource."""
+REGISTRATION_PAGE_SIZE = 64
+"""Maximum number of versions in a registration page."""
+_REGISTRATION_TYPES = ('RegistrationsBaseUrl', 'RegistrationsBaseUrl/3.0.0-beta',
+                       'RegistrationsBaseUrl/3.0.0-rc')
+
+logger = logging.getLogger(__name__)
+
+
+def v3_root() -> Path | None:
+    """
+    Get the directory v3 resources are written to.
+
+    Returns
+    -------
+    Path | None
+        ``settings.MINCHOC_V3_ROOT``, or ``None`` if it is not set.
+    """
+    root = getattr(settings, 'MINCHOC_V3_ROOT', None)
+    return Path(root) if root else None
+
+
+def v3_base_url() -> str:
+    """
+    Get the URL the v3 directory is served at.
+
+    Returns
+    -------
+    str
+        ``settings.MINCHOC_V3_BASE_URL``, or ``http://localhost/v3`` if it is not set.
+    """
+    return str(getattr(settings, 'MINCHOC_V3_BASE_URL', 'http://localhost/v3')).rstrip('/')
+
+
+def _dumps(document: dict[str, Any]) -> bytes:
+    return json.dumps(document, separators=(',', ':')).encode()
+
+
+def write_service_index(root: Path, base_url: str) -> None:
+    """
+    Write the v3 service index.
+
+    Parameters
+    ----------
+    root : Path
+        The v3 directory.
+    base_url : str
+        The URL the v3 directory is served at.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    resources = [{
+        '@id': f'{base_url}/{FLAT_CONTAINER_DIR}/',
+        '@type': 'PackageBaseAddress/3.0.0',
+        'comment': 'Base URL of package files and version lists.'
+    }, *({
+        '@id': f'{base_url}/{REGISTRATION_DIR}/',
+        '@type': x,
+        'comment': 'Base URL of package metadata.'
+    } for x in _REGISTRATION_TYPES)]
+    write_static_file(root / 'index.json', _dumps({'version': '3.0.0', 'resources': resources}))
+
+
+def _dependency_groups(package: Package) -> list[dict[str, Any]]:
+    groups: defaultdict[str, list[dict[str, str]]] = defaultdict(list)
+    for dependency in package.dependencies or ():
+        groups[dependency['target_framework']].append({
+            'id': dependency['nuget_id'],
+            'range': dependency['version_range'] or '(, )'
+        })
+    return [{
+        'dependencies': dependencies
+    } | ({
+        'targetFramework': framework
+    } if framework else {}) for framework, dependencies in groups.items()]
+
+
+def _registration_leaf(base_url: str, id_lower: str, version: str,
+                       package: Package) -> dict[str, Any]:
+    leaf_url = f'{base_url}/{REGISTRATION_DIR}/{id_lower}/{version}.json'
+    content_url = (f'{base_url}/{FLAT_CONTAINER_DIR}/{id_lower}/{version}/'
+                   f'{id_lower}.{version}.nupkg')
+    return {
+        '@id': leaf_url,
+        'catalogEntry': {
+            '@id': f'{leaf_url}#catalogEntry',
+            'authors': ', '.join(x.name for x in package.authors.all()),
+            'dependencyGroups': _dependency_groups(package),
+            'description': package.description or '',
+            'iconUrl': package.icon_url or '',
+            'id': package.nuget_id,
+            'licenseUrl': package.license_url or '',
+            'listed': package.listed,
+            'packageContent': content_url,
+            'projectUrl': package.project_url,
+            'published': package.published.isoformat(),
+            'requireLicenseAcceptance': package.require_license_acceptance,
+            'summary': package.summary or '',
+            'tags': [x.name for x in package.tags.all()],
+            'title': package.title,
+            'version': normalize_version(parse_version(package.version), metadata=True)
+        },
+        'packageContent': content_url,
+        'registration': f'{base_url}/{REGISTRATION_DIR}/{id_lower}/index.json'
+    }
+
+
+def _registration_index(base_url: str, id_lower: str,
+                        leaves: list[tuple[str, dict[str, Any]]]) -> dict[str, Any]:
+    index_url = f'{base_url}/{REGISTRATION_DIR}/{id_lower}/index.json'
+    pages = []
+    for start in range(0, len(leaves), REGISTRATION_PAGE_SIZE):
+        chunk = leaves[start:start + REGISTRATION_PAGE_SIZE]
+        lower, upper = chunk[0][0], chunk[-1][0]
+        pages.append({
+            '@id': f'{index_url}#page/{lower}/{upper}',
+            'count': len(chunk),
+            'items': [x for _, x in chunk],
+            'lower': lower,
+            'parent': index_url,
+            'upper': upper
+        })
+    return {'@id': index_url, 'count': len(pages), 'items': pages}
+
+
+def _copy_package_file(storage: Storage, name: str, dest: Path) -> None:
+    """
+    Hard link or copy a package file from storage, unless it is already there.
+
+    Package files never change once uploaded, so an existing file is kept. A file missing from
+    storage is logged and skipped.
+
+    Parameters
+    ----------
+    storage : Storage
+        The storage of the package file.
+    name : str
+        Storage name of the package file.
+    dest : Path
+        The destination.
+    """
+    if not name or dest.exists():
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(storage.path(name), dest)
+    except (NotImplementedError, OSError):
+        pass
+    else:
+        return
+    try:
+        f = storage.open(name, 'rb')
+    except FileNotFoundError:
+        logger.warning('Package file %s is missing from storage.', name)
+        return
+    fd, temp_name = tempfile.mkstemp(dir=dest.parent, prefix='.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as out, f:
+        shutil.copyfileobj(f, out)
+    Path(temp_name).replace(dest)
+
+
+def _write_files(root: Path, id_lower: str, package_files: dict[Path, tuple[Storage, str]],
+                 documents: dict[Path, dict[str, Any]]) -> None:
+    """
+    Replace the v3 files of a package identifier.
+
+    Package files are written first and the version list last, so clients never see a version
+    before its package file is available. Files of versions that no longer exist are removed.
+
+    Parameters
+    ----------
+    root : Path
+        The v3 directory.
+    id_lower : str
+        Lowercase NuGet package identifier.
+    package_files : dict[Path, tuple[Storage, str]]
+        The storage and storage name of each package file, keyed by destination.
+    documents : dict[Path, dict[str, Any]]
+        JSON documents keyed by path, in the order they are written. If empty, all files of the
+        identifier are removed.
+    """
+    flat_dir = root / FLAT_CONTAINER_DIR / id_lower
+    registration_dir = root / REGISTRATION_DIR / id_lower
+    if not documents:
+        shutil.rmtree(flat_dir, ignore_errors=True)
+        shutil.rmtree(registration_dir, ignore_errors=True)
+        return
+    for dest, (storage, name) in package_files.items():
+        _copy_package_file(storage, name, dest)
+    flat_dir.mkdir(parents=True, exist_ok=True)
+    registration_dir.mkdir(parents=True, exist_ok=True)
+    written: set[Path] = set()
+    for path, document in documents.items():
+        written.update(write_static_file(path, _dumps(document)))
+    for path in set(registration_dir.glob('*.json*')) - written:
+        path.unlink(missing_ok=True)
+    kept = {x.parent for x in package_files}
+    for path in flat_dir.iterdir():
+        if path.is_dir() and path not in kept:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+async def render_v3(root: Path, base_url: str, nuget_id: str) -> int:
+    """
+    Render the v3 files of a package identifier.
+
+    The service index is written too if it does not exist.
+
+    Parameters
+    ----------
+    root : Path
+        The v3 directory.
+    base_url : str
+        The URL the v3 directory is served at.
+    nuget_id : str
+        NuGet package identifier, matched case-insensitively.
+
+    Returns
+    -------
+    int
+        Number of JSON files written, not counting compressed variants or package files.
+    """
+    id_lower = nuget_id.lower()
+    if not is_safe_name(id_lower):
+        logger.warning('Not rendering v3 files for unsafe identifier %r.', nuget_id)
+        return 0
+    flat_dir = root / FLAT_CONTAINER_DIR / id_lower
+    registration_dir = root / REGISTRATION_DIR / id_lower
+    leaves: list[tuple[str, dict[str, Any]]] = []
+    package_files: dict[Path, tuple[Storage, str]] = {}
+    async for package in Package._default_manager.filter(
+            nuget_id_lower=id_lower).order_by('version_sort_key').prefetch_related(
+                'authors', 'tags'):
+        try:
+            version = normalize_version(parse_version(package.version)).lower()
+        except ValueError:
+            logger.warning('Not rendering v3 files for invalid version %r of %s.', package.version,
+                           package.nuget_id)
+            continue
+        if leaves and leaves[-1][0] == version:
+            # Versions such as 1.0 and 1.0.0 normalise to the same version. Keep the first one.
+            continue
+        leaves.append((version, _registration_leaf(base_url, id_lower, version, package)))
+        package_files[flat_dir / version / f'{id_lower}.{version}.nupkg'] = (package.file.storage,
+                                                                             package.file.name)
+    documents: dict[Path, dict[str, Any]] = {
+        registration_dir / f'{version}.json': leaf
+        for version, leaf in leaves
+    }
+    if leaves:
+        documents[registration_dir / 'index.json'] = _registration_index(base_url, id_lower, leaves)
+        documents[flat_dir / 'index.json'] = {'versions': [x for x, _ in leaves]}
+    loop = asyncio.get_running_loop()
+    if not (root / 'index.json').exists():
+        await loop.run_in_executor(io_executor(), write_service_index, root, base_url)
+    await loop.run_in_executor(io_executor(),
+                               partial(_write_files, root, id_lower, package_files, documents))
+    return len(documents)
+
+
+async def package_changed_receiver(
+        sender: Any,  # ruff:ignore[unused-function-argument]
+        nuget_id: str,
+        **kwargs: Any) -> None:  # ruff:ignore[unused-function-argument]
+    """
+    Re-render the v3 files of a package identifier after it changed.
+
+    Nothing is done unless ``settings.MINCHOC_V3_ROOT`` is set.
+
+    Parameters
+    ----------
+    sender : Any
+        The sender (unused).
+    nuget_id : str
+        NuGet package identifier.
+    **kwargs : Any
+        Other signal arguments (unused).
+    """
+    if (root := v3_root()) is None:
+        return
+    try:
+        await render_v3(root, v3_base_url(), nuget_id)
+    except OSError:
+        logger.exception('Failed to render v3 files for %s.', nuget_id)
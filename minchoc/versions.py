@@ -0,0 +1,242 @@
+"""
+NuGet and SemVer 2 version parsing.
+
+This module does not depend on Django being set up, so its functions can be used in worker
+processes and migrations.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+import re
+
+__all__ = ('ParsedVersion', 'VersionRange', 'normalize_version', 'parse_version',
+           'parse_version_range', 'version_sort_key')
+
+_VERSION_RE = re.compile(r'^(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?'
+                         r'(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?'
+                         r'(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?$')
+_NUMERIC_WIDTH = 10
+_MAX_PART = 2 ** 31 - 1
+_RELEASE_MARKER = 'z'
+_PRERELEASE_MARKER = 'a'
+_IDENTIFIER_SEPARATOR = '!'
+_NUMERIC_PREFIX = '0'
+_ALPHANUMERIC_PREFIX = '1'
+
+
+class ParsedVersion(NamedTuple):
+    """A parsed NuGet version."""
+    major: int
+    """First number."""
+    minor: int
+    """Second number. ``0`` if the version only has one part."""
+    patch: int | None
+    """Third number, if present."""
+    revision: int | None
+    """Fourth number (NuGet legacy versions), if present."""
+    prerelease: str | None
+    """Prerelease label without the leading ``-``, e.g. ``beta.1``."""
+    metadata: str | None
+    """Build metadata without the leading ``+``. It is ignored for ordering."""
+    @property
+    def is_prerelease(self) -> bool:
+        """``True`` if the version has a prerelease label."""
+        return self.prerelease is not None
+
+
+def parse_version(version: str) -> ParsedVersion:
+    """
+    Parse a NuGet version string.
+
+    NuGet versions are SemVer 2 versions with an optional fourth number. Leading zeros are
+    accepted in the numbers as NuGet does.
+
+    Parameters
+    ----------
+    version : str
+        The version string, e.g. ``1.2.3-beta.1+build.5``.
+
+    Returns
+    -------
+    ParsedVersion
+        The parts of the version.
+
+    Raises
+    ------
+    ValueError
+        If the string is not a valid version or a number is too large to be stored.
+    """
+    if (m := _VERSION_RE.match(version.strip())) is None:
+        msg = f'Invalid version: {version!r}'
+        raise ValueError(msg)
+    major, minor, patch, revision, prerelease, metadata = m.groups()
+    numbers = [None if x is None else int(x) for x in (major, minor, patch, revision)]
+    if any(x is not None and x > _MAX_PART
+           for x in numbers) or (prerelease
+                                 and any(x.isdigit() and len(x.lstrip('0')) > _NUMERIC_WIDTH
+                                         for x in prerelease.split('.'))):
+        msg = f'Version number too large: {version!r}'
+        raise ValueError(msg)
+    return ParsedVersion(major=int(major),
+                         minor=numbers[1] or 0,
+                         patch=numbers[2],
+                         revision=numbers[3],
+                         prerelease=prerelease,
+                         metadata=metadata)
+
+
+def normalize_version(version: ParsedVersion, *, metadata: bool = False) -> str:
+    """
+    Get the normalised form of a version, as used by the NuGet v3 API.
+
+    Leading zeros are removed, the third number is always present and the fourth number is only
+    present if it is not zero.
+
+    Parameters
+    ----------
+    version : ParsedVersion
+        The parsed version.
+    metadata : bool
+        Keep the build metadata.
+
+    Returns
+    -------
+    str
+        The normalised version, e.g. ``1.2.0-beta.1``. It is not lowercased.
+    """
+    numbers = [version.major, version.minor, version.patch or 0]
+    if version.revision:
+        numbers.append(version.revision)
+    ret = '.'.join(str(x) for x in numbers)
+    if version.prerelease is not None:
+        ret += f'-{version.prerelease}'
+    if metadata and version.metadata is not None:
+        ret += f'+{version.metadata}'
+    return ret
+
+
+def _identifier_key(identifier: str) -> str:
+    if identifier.isdigit():
+        return f'{_NUMERIC_PREFIX}{int(identifier):0{_NUMERIC_WIDTH}d}'
+    return f'{_ALPHANUMERIC_PREFIX}{identifier.lower()}'
+
+
+def version_sort_key(version: ParsedVersion) -> str:
+    """
+    Get a string that sorts in the same order as NuGet versions when compared bytewise.
+
+    Numbers are zero-padded. Release versions get the suffix ``z`` and prerelease versions get
+    ``a`` followed by their identifiers separated by ``!``, so a release sorts after all of its
+    prereleases and a shorter list of identifiers sorts before a longer one that starts with it.
+    Numeric identifiers are prefixed with ``0`` and alphanumeric identifiers with ``1`` so numeric
+    identifiers sort first. Identifiers are compared case-insensitively, as NuGet does.
+
+    Parameters
+    ----------
+    version : ParsedVersion
+        The parsed version.
+
+    Returns
+    -------
+    str
+        The sort key.
+    """
+    numbers = '.'.join(f'{x or 0:0{_NUMERIC_WIDTH}d}'
+                       for x in (version.major, version.minor, version.patch, version.revision))
+    if version.prerelease is None:
+        return f'{numbers}{_RELEASE_MARKER}'
+    return f'{numbers}{_PRERELEASE_MARKER}' + _IDENTIFIER_SEPARATOR.join(
+        _identifier_key(x) for x in version.prerelease.split('.'))
+
+
+class VersionRange(NamedTuple):
+    """
+    A parsed NuGet version range.
+
+    Bounds are stored as sort keys (see :py:func:`version_sort_key`) so they can be compared with
+    the ``version_sort_key`` column of packages.
+    """
+    min_key: str | None
+    """Sort key of the lower bound, or ``None`` if there is no lower bound."""
+    min_inclusive: bool
+    """``True`` if the lower bound itself is accepted."""
+    max_key: str | None
+    """Sort key of the upper bound, or ``None`` if there is no upper bound."""
+    max_inclusive: bool
+    """``True`` if the upper bound itself is accepted."""
+    def contains(self, key: str) -> bool:
+        """
+        Check if a version is in the range.
+
+        Parameters
+        ----------
+        key : str
+            Sort key of the version.
+
+        Returns
+        -------
+        bool
+            ``True`` if the version satisfies both bounds.
+        """
+        if self.min_key is not None and (key < self.min_key or
+                                         (key == self.min_key and not self.min_inclusive)):
+            return False
+        return self.max_key is None or key < self.max_key or (key == self.max_key
+                                                              and self.max_inclusive)
+
+
+def parse_version_range(value: str) -> VersionRange:
+    """
+    Parse a NuGet version range.
+
+    A plain version such as ``1.0`` means that version or later. Interval notation uses ``[`` and
+    ``]`` for inclusive bounds and ``(`` and ``)`` for exclusive bounds, e.g. ``[1.0,2.0)``,
+    ``(,3.0]`` or ``[1.5]`` for exactly one version. An empty string accepts every version.
+
+    Parameters
+    ----------
+    value : str
+        The version range.
+
+    Returns
+    -------
+    VersionRange
+        The bounds of the range.
+
+    Raises
+    ------
+    ValueError
+        If the range or one of its versions is not valid, or the range is empty.
+    """
+    value = value.strip()
+    if not value:
+        return VersionRange(min_key=None, min_inclusive=False, max_key=None, max_inclusive=False)
+    if value[0] not in '[(':
+        return VersionRange(min_key=version_sort_key(parse_version(value)),
+                            min_inclusive=True,
+                            max_key=None,
+                            max_inclusive=False)
+    inner = value[1:-1]
+    if value[-1] not in '])' or inner.count(',') > 1:
+        msg = f'Invalid version range: {value!r}'
+        raise ValueError(msg)
+    if ',' not in inner:
+        if value[0] != '[' or value[-1] != ']':
+            msg = f'Invalid version range: {value!r}'
+            raise ValueError(msg)
+        key = version_sort_key(parse_version(inner))
+        return VersionRange(min_key=key, min_inclusive=True, max_key=key, max_inclusive=True)
+    low, high = (x.strip() for x in inner.split(','))
+    ret = VersionRange(min_key=version_sort_key(parse_version(low)) if low else None,
+                       min_inclusive=bool(low) and value[0] == '[',
+                       max_key=version_sort_key(parse_version(high)) if high else None,
+                       max_inclusive=bool(high) and value[-1] == ']')
+    if ret.min_key is None and ret.max_key is None:
+        msg = f'Invalid version range: {value!r}'
+        raise ValueError(msg)
+    low_key, high_key = ret.min_key or '', ret.max_key
+    if high_key is not None and (low_key > high_key or
+                                 (low_key == high_key and not ret.contains(low_key))):
+        msg = f'Empty version range: {value!r}'
+        raise ValueError(msg)
+    return ret
@@ -1,21 +1,24 @@
 """Views."""
 from __future__ import annotations
 
-from datetime import datetime, timezone
 from io import BytesIO
-from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import TYPE_CHECKING, Any, AnyStr, cast
+from typing import IO, TYPE_CHECKING, Any, AnyStr, cast
 import logging
-import re
 import zipfile
 
 from asgiref.sync import sync_to_async
-from defusedxml.ElementTree import parse as parse_xml
 from django.conf import settings
-from django.core.files import File
-from django.db import IntegrityError
-from django.http import HttpRequest, HttpResponse, HttpResponseNotFound, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotFound,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.http.multipartparser import MultiPartParserError
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -23,49 +26,64 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from typing_extensions import override
 
-from .constants import FEED_XML_POST, FEED_XML_PRE
-from .filteryacc import FIELD_MAPPING, parser as filter_parser
+from . import negative_cache
+from .coalesce import coalesce_requests
+from .dependencies import find_dependents
+from .downloads import arecord_download
+from .feed_cache import cached_feed
+from .feeds import (
+    dependencies_feed,
+    feed_document,
+    find_packages_by_id_feed,
+    get_updates_feed,
+    package_feed,
+    render_entries,
+    search_count,
+    search_feed,
+    select_fields,
+)
+from .filteryacc import parse_filter
+from .metrics import UPLOAD_PHASE_DURATION, render_metrics
 from .models import Author, NugetUser, Package, Tag
-from .utils import make_entry, tag_text_or
+from .nuspec import NuspecError, nuspec_values, read_nuspec_metadata
+from .signals import package_changed
+from .storage import adelete, aiter_chunks, aopen, asave
+from .tracing import span, traced
+from .utils import (
+    afind_package,
+    apply_nuspec_values,
+    apply_version_fields,
+    get_or_create_by_name,
+    index_dependencies,
+    index_search_terms,
+    parse_select,
+    update_latest_versions,
+)
 
 if TYPE_CHECKING:  # pragma: no cover
     from xml.etree.ElementTree import Element
 
     from _typeshed import SupportsKeysAndGetItem
+    from django.core.files.base import File
     from django.core.files.uploadedfile import UploadedFile
-
-NUSPEC_NAMESPACES = {'': 'http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd'}
-NUSPEC_FIELD_AUTHORS = 'authors'
-NUSPEC_FIELD_DESCRIPTION = 'description'
-NUSPEC_FIELD_ID = 'id'
-NUSPEC_FIELD_PROJECT_URL = 'projectUrl'
-NUSPEC_FIELD_REQUIRE_LICENSE_ACCEPTANCE = 'requireLicenseAcceptance'
-NUSPEC_FIELD_SOURCE_URL = 'packageSourceUrl'
-NUSPEC_FIELD_SUMMARY = 'summary'
-NUSPEC_FIELD_TAGS = 'tags'
-NUSPEC_FIELD_TITLE = 'title'
-NUSPEC_FIELD_VERSION = 'version'
-NUSPEC_FIELD_MAPPINGS = {
-    NUSPEC_FIELD_AUTHORS: 'authors',
-    NUSPEC_FIELD_DESCRIPTION: 'description',
-    NUSPEC_FIELD_ID: 'nuget_id',
-    NUSPEC_FIELD_PROJECT_URL: 'project_url',
-    NUSPEC_FIELD_REQUIRE_LICENSE_ACCEPTANCE: 'require_license_acceptance',
-    NUSPEC_FIELD_SOURCE_URL: 'source_url',
-    NUSPEC_FIELD_SUMMARY: 'summary',
-    NUSPEC_FIELD_TAGS: 'tags',
-    NUSPEC_FIELD_TITLE: 'title',
-    NUSPEC_FIELD_VERSION: 'version'
-}
-PACKAGE_FIELDS = {f.name: f for f in Package._meta.get_fields()}
-_TAG_SEPARATOR_RE = re.compile(r'\s+')
+    from django.http.response import HttpResponseBase
 
 logger = logging.getLogger(__name__)
 
-
-def _read_package_file(package: Package) -> bytes:
-    with package.file.open('rb') as f:
-        return cast('bytes', f.read())
+MAX_PAGE_SIZE = 100
+"""Maximum number of entries returned for ``$top``."""
+PACKAGES_PAGE_SIZE = 20
+"""Number of entries returned by ``Packages()`` if ``$top`` is not given."""
+ORDER_BY_FIELDS = {
+    'description': 'description',
+    'downloadcount': 'download_count',
+    'id': 'nuget_id',
+    'published': 'published',
+    'title': 'title',
+    'version': 'version_sort_key',
+}
+"""Columns for the ``$orderby`` properties of ``Packages()``, keyed by lowercase property name. Each
+column except ``description`` is indexed."""
 
 
 @require_http_methods(['GET'])
@@ -86,6 +104,24 @@ def home(_request: HttpRequest) -> HttpResponse:
     return JsonResponse({})
 
 
+@require_http_methods(['GET'])
+def metrics(_request: HttpRequest) -> HttpResponse:
+    """
+    Get the metrics of this process.
+
+    Parameters
+    ----------
+    _request : HttpRequest
+        The incoming request (unused).
+
+    Returns
+    -------
+    HttpResponse
+        Metrics in the Prometheus text exposition format.
+    """
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @require_http_methods(['GET'])
 def metadata(_request: HttpRequest) -> HttpResponse:
     """
@@ -114,57 +150,34 @@ def metadata(_request: HttpRequest) -> HttpResponse:
                         content_type='application/xml')
 
 
-async def _find_packages_by_id_feed(request: HttpRequest, proto_host: str) -> HttpResponse:
+def _skip_after(request: HttpRequest) -> tuple[str, str] | None:
     """
-    Build the Atom feed for :py:func:`find_packages_by_id`.
+    Parse the ``$skiptoken`` parameter of a request.
 
     Parameters
     ----------
     request : HttpRequest
         The incoming ``GET`` request.
-    proto_host : str
-        The scheme and host prefix used when building entry URLs.
 
     Returns
     -------
-    HttpResponse
-        Atom feed XML for the requested package identifier.
+    tuple[str, str] | None
+        Identifier and version of the last package the client has seen, or ``None``.
     """
-    nuget_id = request.GET['id'].replace("'", '')
-    queryset = Package._default_manager.filter(nuget_id=nuget_id)
     if skiptoken := request.GET.get('$skiptoken'):
         # Parse skiptoken format: `'PackageName','Version'`.
         # Remove quotes and split by comma.
         parts = [part.strip().strip('\'"') for part in skiptoken.split(',')]
         expected_parts = 2
         if len(parts) == expected_parts:
-            skip_id, skip_version = parts
-            queryset = queryset.order_by('version')
-            all_packages: list[Package] = [p async for p in queryset]
-            skip_index = -1
-            for i, pkg in enumerate(all_packages):
-                if pkg.nuget_id == skip_id and pkg.version == skip_version:
-                    skip_index = i
-                    break
-            selected = (all_packages[skip_index + 1:] if skip_index >= 0 else all_packages)
-            content = '\n'.join([await make_entry(proto_host, x) for x in selected])
-            feed_xml = f'{FEED_XML_PRE}{content}{FEED_XML_POST}\n'
-            return HttpResponse(feed_xml % {
-                'BASEURL': proto_host,
-                'UPDATED': datetime.now(timezone.utc).isoformat()
-            },
-                                content_type='application/xml')
+            return parts[0], parts[1]
         logger.warning('Invalid $skiptoken format: %s', skiptoken)  # pragma: no cover
-    content = '\n'.join([await make_entry(proto_host, x) async for x in queryset])
-    feed_xml = f'{FEED_XML_PRE}{content}{FEED_XML_POST}\n'
-    return HttpResponse(feed_xml % {
-        'BASEURL': proto_host,
-        'UPDATED': datetime.now(timezone.utc).isoformat()
-    },
-                        content_type='application/xml')
+    return None
 
 
 @require_http_methods(['GET'])
+@cached_feed(lambda request: request.GET.get('id', '').replace("'", ''))
+@coalesce_requests
 async def find_packages_by_id(request: HttpRequest) -> HttpResponse:
     """
     Take a ``GET`` request to find packages.
@@ -172,7 +185,7 @@ async def find_packages_by_id(request: HttpRequest) -> HttpResponse:
     Sample URL: ``/FindPackagesById()?id=package-name``
 
     Supports ``$skiptoken`` parameter for pagination in the format:
-    ``$skiptoken='PackageName','Version'``.
+    ``$skiptoken='PackageName','Version'``, and ``$select`` to render only some properties.
 
     Parameters
     ----------
@@ -182,27 +195,333 @@ async def find_packages_by_id(request: HttpRequest) -> HttpResponse:
     Returns
     -------
     HttpResponse
-        Atom feed XML, or ``400`` if required query parameters are missing.
+        Atom feed XML, ``400`` if required query parameters are missing, or JSON error if
+        ``$select`` is invalid.
     """
     if sem_ver_level := request.GET.get('semVerLevel'):
         logger.warning('Ignoring semVerLevel=%s', sem_ver_level)
     proto = 'https' if request.is_secure() else 'http'
     proto_host = f'{proto}://{request.get_host()}'
     try:
-        return await _find_packages_by_id_feed(request, proto_host)
+        nuget_id = request.GET['id'].replace("'", '')
     except KeyError:
         return HttpResponse(status=400)
+    try:
+        select = parse_select(request.GET.get('$select'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $select.'}, status=400)
+    content = None
+    if not negative_cache.is_missing(nuget_id):
+        content = await find_packages_by_id_feed(proto_host,
+                                                 nuget_id,
+                                                 _skip_after(request),
+                                                 select=select)
+        if content is None:
+            negative_cache.add_missing(nuget_id)
+    return HttpResponse(content or feed_document(proto_host, ''), content_type='application/xml')
+
+
+def _odata_string(request: HttpRequest, name: str) -> str:
+    """
+    Get an OData function parameter with the quotes around it removed.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+    name : str
+        The parameter name.
+
+    Returns
+    -------
+    str
+        The value, or an empty string if the parameter is missing.
+    """
+    return request.GET.get(name, '').strip().strip("'")
+
+
+@require_http_methods(['GET'])
+@coalesce_requests
+async def get_updates(request: HttpRequest) -> HttpResponse:
+    """
+    Take a ``GET`` request to find updates for installed packages.
+
+    This is used by ``choco outdated`` and ``choco upgrade all``. Every installed package is checked
+    in a single query.
+
+    Sample URL: ``/GetUpdates()?packageIds='a|b'&versions='1.0|2.0'&includePrerelease=false&includeAllVersions=false``
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+
+    Returns
+    -------
+    HttpResponse
+        Atom feed XML, or JSON error with status ``400`` if the identifiers and versions do not
+        match up or a version is invalid.
+    """  # ruff:ignore[line-too-long]
+    nuget_ids = [x for x in _odata_string(request, 'packageIds').split('|') if x]
+    versions = [x for x in _odata_string(request, 'versions').split('|') if x]
+    if len(nuget_ids) != len(versions):
+        return JsonResponse({'error': 'packageIds and versions must have the same length.'},
+                            status=400)
+    proto = 'https' if request.is_secure() else 'http'
+    try:
+        content = await get_updates_feed(f'{proto}://{request.get_host()}',
+                                         zip(nuget_ids, versions, strict=True),
+                                         include_prerelease=_odata_string(
+                                             request, 'includePrerelease').lower() == 'true',
+                                         include_all_versions=_odata_string(
+                                             request, 'includeAllVersions').lower() == 'true')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid version.'}, status=400)
+    return HttpResponse(content, content_type='application/xml')
+
+
+@require_http_methods(['GET'])
+@cached_feed(lambda _request: None)
+@coalesce_requests
+async def resolve_dependencies(request: HttpRequest) -> HttpResponse:
+    """
+    Take a ``GET`` request for a package and all of its transitive dependencies.
+
+    This lets a client install a package with deep dependencies in one request instead of one
+    request per level. ``dependencyVersion`` is ``Lowest`` (default) or ``Highest``, as in
+    ``nuget install -DependencyVersion``. Dependencies that are not hosted here are left out.
+
+    Sample URL: ``/ResolveDependencies()?id='package-name'&version='1.0.0'&includePrerelease=false&dependencyVersion=Lowest``
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+
+    Returns
+    -------
+    HttpResponse
+        Atom feed XML with the package first, ``404`` if the package does not exist, or JSON error
+        with status ``400`` if a parameter is missing or invalid.
+    """  # ruff:ignore[line-too-long]
+    nuget_id = _odata_string(request, 'id')
+    version = _odata_string(request, 'version')
+    if not nuget_id or not version:
+        return JsonResponse({'error': 'id and version are required.'}, status=400)
+    if (dependency_version := _odata_string(request, 'dependencyVersion').lower()
+            or 'lowest') not in {'highest', 'lowest'}:
+        return JsonResponse({'error': 'Invalid dependencyVersion.'}, status=400)
+    if negative_cache.is_missing(nuget_id, version):
+        return HttpResponseNotFound()
+    proto = 'https' if request.is_secure() else 'http'
+    try:
+        content = await dependencies_feed(f'{proto}://{request.get_host()}',
+                                          nuget_id,
+                                          version,
+                                          include_prerelease=_odata_string(
+                                              request, 'includePrerelease').lower() == 'true',
+                                          highest=dependency_version == 'highest')
+    except Package.MultipleObjectsReturned:
+        return HttpResponseNotFound()
+    if content is None:
+        negative_cache.add_missing(nuget_id, version)
+        return HttpResponseNotFound()
+    return HttpResponse(content, content_type='application/xml')
+
+
+def _page(request: HttpRequest, default_top: int) -> tuple[int, int]:
+    """
+    Parse the ``$skip`` and ``$top`` parameters of a request.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+    default_top : int
+        Page size if ``$top`` is not given.
+
+    Returns
+    -------
+    tuple[int, int]
+        The number of entries to skip and the page size, at most ``MAX_PAGE_SIZE``.
+
+    Raises
+    ------
+    ValueError
+        If a parameter is not a non-negative integer.
+    """
+    skip = int(request.GET.get('$skip') or 0)
+    top = int(request.GET.get('$top') or default_top)
+    if skip < 0 or top < 0:
+        msg = 'Negative $skip or $top.'
+        raise ValueError(msg)
+    return skip, min(top, MAX_PAGE_SIZE)
+
+
+def _order_by(request: HttpRequest) -> list[str]:
+    """
+    Parse the ``$orderby`` parameter of a request.
+
+    Properties are compared case-insensitively and can be followed by ``asc`` or ``desc``. Unknown
+    properties are ignored. The primary key is added last so that pages are stable.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+
+    Returns
+    -------
+    list[str]
+        Arguments for :py:meth:`~django.db.models.query.QuerySet.order_by`.
+
+    Raises
+    ------
+    ValueError
+        If a direction is not ``asc`` or ``desc``.
+    """
+    order_by: list[str] = []
+    for item in request.GET.get('$orderby', '').split(','):
+        if not (words := item.split()):
+            continue
+        name, direction = words[0].lower(), ' '.join(words[1:]).lower() or 'asc'
+        if direction not in {'asc', 'desc'}:
+            msg = f'Invalid $orderby direction: {direction}'
+            raise ValueError(msg)
+        if (field := ORDER_BY_FIELDS.get(name)) is None:
+            logger.warning('Ignoring $orderby=%s', item.strip())
+        elif field not in order_by and f'-{field}' not in order_by:
+            order_by.append(f'-{field}' if direction == 'desc' else field)
+    return [*(order_by or ['nuget_id']), 'pk']
+
+
+@require_http_methods(['GET'])
+async def dependents(request: HttpRequest) -> HttpResponse:
+    """
+    Take a ``GET`` request for the packages that depend on a package identifier.
+
+    Use this to find what a deletion would affect. ``versionRange`` limits the result to dependents
+    whose declared range has a version in common with it, e.g. ``[1.0]`` for one version.
+    ``latestOnly=true`` only includes the latest version of each dependent. Each dependent is listed
+    once with its matching declarations (one per target framework). ``$skip`` and ``$top`` page the
+    dependents (at most ``MAX_PAGE_SIZE``).
+
+    Sample URL: ``/Dependents()?id='package-name'&versionRange='[1.0,2.0)'&latestOnly=false&$skip=0&$top=100``
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+
+    Returns
+    -------
+    HttpResponse
+        JSON with the total number of dependents and the requested page, or JSON error with status
+        ``400`` if a parameter is missing or invalid.
+    """  # ruff:ignore[line-too-long]
+    if not (nuget_id := _odata_string(request, 'id')):
+        return JsonResponse({'error': 'id is required.'}, status=400)
+    try:
+        skip, top = _page(request, MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $skip or $top.'}, status=400)
+    try:
+        queryset = find_dependents(nuget_id,
+                                   _odata_string(request, 'versionRange'),
+                                   latest_only=_odata_string(request,
+                                                             'latestOnly').lower() == 'true')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid versionRange.'}, status=400)
+    return JsonResponse({
+        'count':
+            await queryset.acount(),
+        'dependents': [{
+            'id':
+                x.nuget_id,
+            'version':
+                x.version,
+            'dependencies': [{
+                'versionRange': y.version_range,
+                'targetFramework': y.target_framework
+            } for y in x.declared_dependencies.all()]
+        } async for x in queryset[skip:skip + top]]
+    })
+
+
+@require_http_methods(['GET'])
+@coalesce_requests
+async def search(request: HttpRequest) -> HttpResponse:
+    """
+    Take a ``GET`` request to search for packages.
+
+    This is used by ``choco search`` and Chocolatey GUI. Only the latest version of each package is
+    returned. ``targetFramework`` is ignored.
+
+    Sample URL: ``/Search()?searchTerm='notepad'&targetFramework=''&includePrerelease=false&$skip=0&$top=30&$inlinecount=allpages``
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+
+    Returns
+    -------
+    HttpResponse
+        Atom feed XML, or JSON error with status ``400`` if ``$skip`` or ``$top`` are invalid.
+    """  # ruff:ignore[line-too-long]
+    try:
+        skip, top = _page(request, 30)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $skip or $top.'}, status=400)
+    proto = 'https' if request.is_secure() else 'http'
+    return HttpResponse(await search_feed(
+        f'{proto}://{request.get_host()}',
+        _odata_string(request, 'searchTerm'),
+        include_prerelease=_odata_string(request, 'includePrerelease').lower() == 'true',
+        skip=skip,
+        top=top,
+        inline_count=request.GET.get('$inlinecount') == 'allpages'),
+                        content_type='application/xml')
 
 
 @require_http_methods(['GET'])
+async def search_count_view(request: HttpRequest) -> HttpResponse:
+    """
+    Take a ``GET`` request to count the results of a search.
+
+    Sample URL: ``/Search()/$count?searchTerm='notepad'&includePrerelease=false``
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming ``GET`` request.
+
+    Returns
+    -------
+    HttpResponse
+        The number of matching packages as plain text.
+    """
+    return HttpResponse(str(await search_count(_odata_string(request, 'searchTerm'),
+                                               include_prerelease=_odata_string(
+                                                   request,
+                                                   'includePrerelease').lower() == 'true')),
+                        content_type='text/plain')
+
+
+@require_http_methods(['GET'])
+@cached_feed(lambda _request: None)
+@coalesce_requests
+@traced('packages')
 async def packages(request: HttpRequest) -> HttpResponse:
     """
     Take a ``GET`` request to find packages.
 
-    Query parameters ``$skip``, ``$top`` and ``semVerLevel`` are ignored. This means pagination is
-    currently not supported.
+    ``$orderby`` accepts ``Id``, ``Version``, ``DownloadCount``, ``Published`` and ``Title``, each
+    optionally followed by ``asc`` or ``desc``. ``$skip`` and ``$top`` page the results
+    (``PACKAGES_PAGE_SIZE`` entries by default, at most ``MAX_PAGE_SIZE``). ``semVerLevel`` is
+    ignored.
 
-    Sample URL: ``/Packages()?$orderby=id&$filter=(tolower(Id) eq 'package-name') and IsLatestVersion&$skip=0&$top=1``
+    Sample URL: ``/Packages()?$orderby=DownloadCount desc&$filter=(tolower(Id) eq 'package-name') and IsLatestVersion&$skip=0&$top=1``
 
     Parameters
     ----------
@@ -212,40 +531,46 @@ async def packages(request: HttpRequest) -> HttpResponse:
     Returns
     -------
     HttpResponse
-        Atom feed XML, or JSON error if the ``$filter`` expression is invalid.
+        Atom feed XML, or JSON error if the ``$filter``, ``$orderby``, ``$select``, ``$skip`` or
+        ``$top`` parameter is invalid.
     """  # ruff:ignore[line-too-long]
     filter_ = request.GET.get('$filter')
-    req_order_by = request.GET.get('$orderby')
-    order_by = (FIELD_MAPPING[req_order_by]
-                if req_order_by and req_order_by in FIELD_MAPPING else 'nuget_id')
     if sem_ver_level := request.GET.get('semVerLevel'):
         logger.warning('Ignoring semVerLevel=%s', sem_ver_level)
-    if skip := request.GET.get('$skip'):
-        logger.warning('Ignoring $skip=%s', skip)
-    if top := request.GET.get('$top'):
-        logger.warning('Ignoring $top=%s', top)
     try:
-        filters = filter_parser.parse(filter_) if filter_ else {}
+        with span('packages.parse_filter'):
+            filters = parse_filter(filter_) if filter_ else Q()
     except SyntaxError:
         return JsonResponse({'error': 'Invalid syntax in filter.'}, status=400)
+    try:
+        order_by = _order_by(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $orderby.'}, status=400)
+    try:
+        skip, top = _page(request, PACKAGES_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $skip or $top.'}, status=400)
+    try:
+        select = parse_select(request.GET.get('$select'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $select.'}, status=400)
     proto = 'https' if request.is_secure() else 'http'
     proto_host = f'{proto}://{request.get_host()}'
-    qs = Package._default_manager.order_by(order_by).filter(filters)[0:20]
-    content = '\n'.join([await make_entry(proto_host, x) async for x in qs])
-    feed_xml = f'{FEED_XML_PRE}\n{content}{FEED_XML_POST}\n'
-    return HttpResponse(feed_xml % {
-        'BASEURL': proto_host,
-        'UPDATED': datetime.now(timezone.utc).isoformat()
-    },
-                        content_type='application/xml')
+    qs = select_fields(Package._default_manager.filter(filters).order_by(*order_by),
+                       select)[skip:skip + top]
+    entries = await render_entries(proto_host, qs, select)
+    with span('packages.write'):
+        return HttpResponse(feed_document(proto_host, entries), content_type='application/xml')
 
 
 @require_http_methods(['GET'])
+@cached_feed(lambda _request, name, **_kwargs: name)
+@coalesce_requests
 async def packages_with_args(request: HttpRequest, name: str, version: str) -> HttpResponse:
     """
     Alternate ``Packages()`` with arguments to find a single package instance.
 
-    Sample URL: ``/Packages(Id='name',Version='123.0.0')``
+    Sample URL: ``/Packages(Id='name',Version='123.0.0')?$select=Id,Version``
 
     Parameters
     ----------
@@ -259,24 +584,59 @@ async def packages_with_args(request: HttpRequest, name: str, version: str) -> H
     Returns
     -------
     HttpResponse
-        Atom entry XML if found, or ``404`` if the package does not exist.
-    """
-    if package := await Package._default_manager.filter(nuget_id=name, version=version).afirst():
-        proto = 'https' if request.is_secure() else 'http'
-        proto_host = f'{proto}://{request.get_host()}'
-        content = await make_entry(proto_host, package)
-        feed_xml = f'{FEED_XML_PRE}\n{content}{FEED_XML_POST}\n'
-        return HttpResponse(feed_xml % {
-            'BASEURL': proto_host,
-            'UPDATED': datetime.now(timezone.utc).isoformat()
-        },
-                            content_type='application/xml')
+        Atom entry XML if found, ``404`` if the package does not exist, or JSON error if
+        ``$select`` is invalid.
+    """
+    try:
+        select = parse_select(request.GET.get('$select'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid $select.'}, status=400)
+    if negative_cache.is_missing(name, version):
+        return HttpResponseNotFound()
+    proto = 'https' if request.is_secure() else 'http'
+    try:
+        content = await package_feed(f'{proto}://{request.get_host()}',
+                                     name,
+                                     version,
+                                     select=select)
+    except Package.MultipleObjectsReturned:
+        return HttpResponseNotFound()
+    if content is not None:
+        return HttpResponse(content, content_type='application/xml')
+    negative_cache.add_missing(name, version)
     return HttpResponseNotFound()
 
 
+def _file_response(request: HttpRequest, f: File[bytes]) -> StreamingHttpResponse:
+    """
+    Stream an open package file without reading it into memory.
+
+    Under ASGI the file is read in chunks in the storage thread pool. Under WSGI it is handed to the
+    server, which can send it with ``wsgi.file_wrapper``.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The incoming request.
+    f : File[bytes]
+        The open package file. It is closed when the response has been sent.
+
+    Returns
+    -------
+    StreamingHttpResponse
+        The response.
+    """
+    response = (StreamingHttpResponse(aiter_chunks(f), content_type='application/zip') if
+                isinstance(request, ASGIRequest) else FileResponse(f,
+                                                                   content_type='application/zip'))
+    if 'Content-Length' not in response:
+        response['Content-Length'] = str(f.size)
+    return response
+
+
 @require_http_methods(['GET', 'DELETE'])
 @csrf_exempt
-async def fetch_package_file(request: HttpRequest, name: str, version: str) -> HttpResponse:
+async def fetch_package_file(request: HttpRequest, name: str, version: str) -> HttpResponseBase:
     """
     Get the file for a package instance.
 
@@ -299,21 +659,29 @@ async def fetch_package_file(request: HttpRequest, name: str, version: str) -> H
     HttpResponse
         Zip payload, ``204`` on authorised delete, error JSON, ``404``, or ``405``.
     """
-    if package := await Package._default_manager.filter(nuget_id=name, version=version).afirst():
+    if negative_cache.is_missing(name, version):
+        return HttpResponseNotFound()
+    try:
+        package = await afind_package(name, version)
+    except Package.MultipleObjectsReturned:
+        return HttpResponseNotFound()
+    if package:
         match request.method:
             case 'GET':
-                data = await sync_to_async(_read_package_file)(package)
-                package.download_count += 1
-                await package.asave()
-                return HttpResponse(data, content_type='application/zip')
+                await arecord_download(package.pk)
+                f = await aopen(package.file.storage, cast('str', package.file.name))
+                return _file_response(request, f)
             case 'DELETE' if settings.ALLOW_PACKAGE_DELETION:  # type: ignore[misc]
                 if not await NugetUser.arequest_has_valid_token(request):
                     return JsonResponse({'error': 'Not authorized'}, status=403)
-                await sync_to_async(package.file.delete)()
+                await adelete(package.file.storage, cast('str', package.file.name))
                 await package.adelete()
+                await sync_to_async(update_latest_versions)([package.nuget_id])
+                await package_changed.asend_robust(sender=Package, nuget_id=package.nuget_id)
                 return HttpResponse(status=204)
             case _:
                 return HttpResponse(status=405)
+    negative_cache.add_missing(name, version)
     return HttpResponseNotFound()
 
 
@@ -347,8 +715,11 @@ def _uploaded_nuget_file(request: HttpRequest) -> UploadedFile[AnyStr]:
     if not request.content_type or not request.content_type.startswith('multipart/'):
         msg = f'Invalid content type: {request.content_type or "unknown"}'
         raise _UploadError(msg)
+    # Parse the request stream, so large files are spooled to disk by the upload handlers instead
+    # of being read into memory. Django only parses POST bodies by itself.
+    stream = BytesIO(request.body) if hasattr(request, '_body') else request
     try:
-        _, files = request.parse_file_upload(request.META, BytesIO(request.body))
+        _, files = request.parse_file_upload(request.META, stream)
     except MultiPartParserError as e:
         msg = 'Invalid upload'
         raise _UploadError(msg) from e
@@ -388,58 +759,13 @@ def _parse_nuspec_metadata(nuget_file: UploadedFile[AnyStr]) -> Element:
     _UploadError
         If the package does not contain exactly one nuspec file, or the nuspec is not valid XML.
     """
-    with zipfile.ZipFile(nuget_file) as z:
-        nuspecs = [x for x in z.filelist if x.filename.endswith('.nuspec')]
-        if len(nuspecs) > 1 or not nuspecs:
-            msg = 'There should be exactly 1 nuspec file present. 0 or more than 1 were found.'
-            raise _UploadError(msg)
-        with TemporaryDirectory(suffix='.nuget-parse') as temp_dir:
-            z.extract(nuspecs[0], temp_dir)
-            root = parse_xml(Path(temp_dir) / nuspecs[0].filename).getroot()
-    if root is None:
-        msg = 'Invalid nuspec'
-        raise _UploadError(msg)
-    return root[0]
-
-
-async def _get_or_create_tags(value: str) -> list[Tag]:
-    """
-    Get or create every tag named in a nuspec ``tags`` value.
-
-    Parameters
-    ----------
-    value : str
-        Whitespace-separated tag names.
-
-    Returns
-    -------
-    list[Tag]
-        The tags, in the order they appear in the value.
-    """
-    return [(await Tag._default_manager.aget_or_create(name=name.strip()))[0]
-            for name in _TAG_SEPARATOR_RE.split(value)]
-
-
-async def _get_or_create_authors(value: str) -> list[Author]:
-    """
-    Get or create every author named in a nuspec ``authors`` value.
-
-    Parameters
-    ----------
-    value : str
-        Comma-separated author names.
-
-    Returns
-    -------
-    list[Author]
-        The authors, in the order they appear in the value.
-    """
-    return [(await Author._default_manager.aget_or_create(name=name.strip()))[0]
-            for name in value.split(',')]
+    try:
+        return read_nuspec_metadata(cast('IO[bytes]', nuget_file))
+    except NuspecError as e:
+        raise _UploadError(str(e)) from e
 
 
-async def _apply_nuspec_fields(package: Package,
-                               nuspec_metadata: Element) -> tuple[list[Tag], list[Author]]:
+def _apply_nuspec_fields(package: Package, nuspec_metadata: Element) -> tuple[list[str], list[str]]:
     """
     Copy the supported nuspec fields on to an unsaved package.
 
@@ -452,49 +778,10 @@ async def _apply_nuspec_fields(package: Package,
 
     Returns
     -------
-    tuple[list[Tag], list[Author]]
-        The tags and authors to attach once the package has been saved.
-    """
-    add_tags: list[Tag] = []
-    add_authors: list[Author] = []
-    for key, column_name in NUSPEC_FIELD_MAPPINGS.items():
-        value = tag_text_or(nuspec_metadata.find(key, NUSPEC_NAMESPACES))
-        if not value:  # pragma no cover
-            logger.warning('No value for key %s', key)
-            continue
-        column_type = (None if column_name not in PACKAGE_FIELDS else
-                       PACKAGE_FIELDS[column_name].get_internal_type())
-        if not column_type or column_type == 'ManyToManyField':
-            if column_name == 'tags':
-                add_tags.extend(await _get_or_create_tags(value))
-            elif column_name == 'authors':
-                add_authors.extend(await _get_or_create_authors(value))
-            else:  # pragma no cover
-                logger.warning('Did not set %s', column_name)
-        elif column_type == 'BooleanField':
-            setattr(package, column_name, value.lower() == 'true')
-        else:
-            setattr(package, column_name, value)
-    return add_tags, add_authors
-
-
-def _apply_version_fields(package: Package) -> None:
-    """
-    Split the package version string on to the sortable numeric version columns.
-
-    Parameters
-    ----------
-    package : Package
-        The package to populate.
+    tuple[list[str], list[str]]
+        The names of the tags and authors to attach once the package has been saved.
     """
-    version_split = package.version.split('.')
-    package.version0 = int(version_split[0])
-    package.version1 = int(version_split[1])
-    try:
-        package.version2 = int(version_split[2])
-        package.version3 = int(version_split[3])
-    except IndexError:
-        pass
+    return apply_nuspec_values(package, nuspec_values(nuspec_metadata))
 
 
 async def _uploader_from_request(request: HttpRequest) -> NugetUser:
@@ -516,34 +803,82 @@ async def _uploader_from_request(request: HttpRequest) -> NugetUser:
     _UploadError
         If no user has the token given in the request.
     """
-    if (uploader := await NugetUser._default_manager.filter(token=request.headers['x-nuget-apikey']
-                                                            ).afirst()) is None:
+    uploader: NugetUser | None = await NugetUser._default_manager.filter(
+        token=request.headers['x-nuget-apikey']).afirst()
+    if uploader is None:
         msg = 'Uploader not found'
         raise _UploadError(msg, 500)
     return uploader
 
 
-async def _asave_new_package(package: Package) -> None:
+@transaction.atomic
+def _insert_package(package: Package, tag_names: list[str], author_names: list[str]) -> None:
     """
-    Save a newly uploaded package.
+    Save a package with its tags, authors, search terms and dependencies in a single transaction.
+
+    The latest version flags of the package identifier are updated in the same transaction.
 
     Parameters
     ----------
     package : Package
         The package to save.
+    tag_names : list[str]
+        Names of the tags to attach.
+    author_names : list[str]
+        Names of the authors to attach.
+    """
+    package.save()
+    package.tags.add(*get_or_create_by_name(Tag, tag_names))
+    package.authors.add(*get_or_create_by_name(Author, author_names))
+    index_search_terms([(package, tag_names)])
+    index_dependencies([package])
+    update_latest_versions([package.nuget_id])
+
+
+async def _asave_new_package(package: Package, nuget_file: UploadedFile[AnyStr],
+                             tag_names: list[str], author_names: list[str]) -> None:
+    """
+    Store the file of a newly uploaded package and save it with its tags and authors.
+
+    The file is written with :py:func:`minchoc.storage.asave` and the rows by
+    :py:func:`_insert_package`. If that fails, the stored file is deleted again so no orphaned files
+    or partially saved packages are left behind.
+
+    Parameters
+    ----------
+    package : Package
+        The package to save.
+    nuget_file : UploadedFile
+        The uploaded package file.
+    tag_names : list[str]
+        Names of the tags to attach.
+    author_names : list[str]
+        Names of the authors to attach.
 
     Raises
     ------
     _UploadError
         If the package conflicts with one that already exists.
     """
+    field = package.file.field
+    with UPLOAD_PHASE_DURATION.time(phase='store'):
+        package.file.name = await asave(package.file.storage,
+                                        field.generate_filename(package, cast(
+                                            'str', nuget_file.name)),
+                                        cast('IO[bytes]', nuget_file),
+                                        max_length=field.max_length)
     try:
-        await package.asave()
-    except IntegrityError as e:
-        msg = 'Integrity error (has this already been uploaded?)'
-        raise _UploadError(msg) from e
+        with UPLOAD_PHASE_DURATION.time(phase='insert'):
+            await sync_to_async(_insert_package)(package, tag_names, author_names)
+    except Exception as e:
+        await adelete(package.file.storage, package.file.name)
+        if isinstance(e, IntegrityError):
+            msg = 'Integrity error (has this already been uploaded?)'
+            raise _UploadError(msg) from e
+        raise
 
 
+@traced('upload')
 async def _asave_uploaded_package(request: HttpRequest) -> None:
     """
     Store the package sent in an upload request.
@@ -554,18 +889,30 @@ async def _asave_uploaded_package(request: HttpRequest) -> None:
     ----------
     request : HttpRequest
         The upload request.
+
+    Raises
+    ------
+    _UploadError
+        If the version of the package is not valid.
     """
-    nuget_file = _uploaded_nuget_file(request)
-    nuspec_metadata = _parse_nuspec_metadata(nuget_file)
-    new_package = Package()
-    add_tags, add_authors = await _apply_nuspec_fields(new_package, nuspec_metadata)
-    _apply_version_fields(new_package)
+    with UPLOAD_PHASE_DURATION.time(phase='read'), span('upload.read'):
+        nuget_file = _uploaded_nuget_file(request)
+    with UPLOAD_PHASE_DURATION.time(phase='validate'):
+        with span('upload.parse_nuspec'):
+            nuspec_metadata = _parse_nuspec_metadata(nuget_file)
+        new_package = Package()
+        with span('upload.apply_nuspec'):
+            tag_names, author_names = _apply_nuspec_fields(new_package, nuspec_metadata)
+        try:
+            apply_version_fields(new_package)
+        except ValueError as e:
+            msg = 'Invalid version'
+            raise _UploadError(msg) from e
     new_package.size = cast('int', nuget_file.size)
-    new_package.file = File(nuget_file, nuget_file.name)
     new_package.uploader = await _uploader_from_request(request)
-    await _asave_new_package(new_package)
-    await new_package.tags.aadd(*add_tags)
-    await new_package.authors.aadd(*add_authors)
+    with span('upload.save', nuget_id=new_package.nuget_id, version=new_package.version):
+        await _asave_new_package(new_package, nuget_file, tag_names, author_names)
+    await package_changed.asend_robust(sender=Package, nuget_id=new_package.nuget_id)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -32,6 +32,12 @@ def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
     rmtree(DJANGO_APP_DIR)
 
 
+def pytest_runtest_teardown(item: pytest.Item, nextitem: pytest.Item | None) -> None:
+    from minchoc import downloads
+    # Buffered downloads of one test must not be written in the next.
+    downloads.clear()
+
+
 def pytest_configure(config: pytest.Config) -> None:
     rmtree(DJANGO_APP_DIR, ignore_errors=True)
     DJANGO_APP_DIR.mkdir(parents=True)
@@ -54,6 +60,7 @@ urlpatterns = [path('', include('minchoc.urls'))]""")
         ],
         LANGUAGE_CODE='en-us',
         LOGGING={},
+        MINCHOC_METRICS_URL='metrics',
         MIDDLEWARE=[
             'django.middleware.security.SecurityMiddleware',
             'django.contrib.sessions.middleware.SessionMiddleware',
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
 from typing import TYPE_CHECKING, Any
+import tracemalloc
 
 import pytest
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from collections.abc import Callable, Generator, Iterator
+    from contextlib import AbstractContextManager
+
+    EnableCache = Callable[[str, int, Callable[[], None]], None]
 
 
 @pytest.fixture
@@ -18,3 +23,55 @@ def nuget_user() -> Iterator[Any]:
     assert nuget_user is not None
     yield nuget_user
     user.delete()
+
+
+@pytest.fixture
+def enable_cache(settings: Any) -> Iterator[EnableCache]:
+    """
+    Turn on a cache with a setting, clearing it before use and after the test.
+
+    Yields
+    ------
+    EnableCache
+        Called with the setting, its value and the function that clears the cache.
+    """
+    clears: list[Callable[[], None]] = []
+
+    def enable(setting: str, value: int, clear: Callable[[], None]) -> None:
+        setattr(settings, setting, value)
+        clear()
+        clears.append(clear)
+
+    yield enable
+    for clear in clears:
+        clear()
+
+
+@pytest.fixture
+def assert_max_queries() -> Callable[[int], AbstractContextManager[list[int]]]:
+    """Fail if a block makes more database queries than allowed, including in sync_to_async."""
+    from minchoc.metrics import count_queries
+
+    @contextmanager
+    def check(limit: int) -> Generator[list[int], None, None]:
+        with count_queries() as queries:
+            yield queries
+        assert queries[0] <= limit, f'{queries[0]} queries, budget {limit}.'
+
+    return check
+
+
+@pytest.fixture
+def assert_max_allocation() -> Callable[[int], AbstractContextManager[None]]:
+    """Fail if the peak memory allocated in a block exceeds a number of bytes."""
+    @contextmanager
+    def check(limit: int) -> Generator[None, None, None]:
+        tracemalloc.start()
+        try:
+            yield
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak <= limit, f'Peak allocation {peak} bytes, budget {limit}.'
+
+    return check
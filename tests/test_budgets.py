@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, cast
+import random
+import zipfile
+
+from asgiref.sync import async_to_sync
+from django.core.files.base import ContentFile
+from django.http import StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory
+from minchoc.models import Package
+from minchoc.urls import urlpatterns
+from minchoc.utils import apply_version_fields, bulk_create_packages, update_latest_versions
+from minchoc.views import APIV2PackageView, fetch_package_file
+import pytest
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
+    from contextlib import AbstractContextManager
+    from pathlib import Path
+
+    from django.http import HttpRequest
+    from django.http.response import HttpResponseBase
+    from django.test import Client
+    from minchoc.models import NugetUser
+
+LARGE_PACKAGE_SIZE = 8 * 1024 * 1024
+UPLOAD_BOUNDARY = 'budgetboundary'
+NUSPEC = """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>{nuget_id}</id>
+    <version>{version}</version>
+    <title>{nuget_id}</title>
+    <authors>a</authors>
+    <requireLicenseAcceptance>false</requireLicenseAcceptance>
+    <projectUrl>https://a-url</projectUrl>
+    <packageSourceUrl>https://a-url</packageSourceUrl>
+    <description>d</description>
+    <summary>s</summary>
+    <tags>t1 t2</tags>
+    <dependencies><dependency id="dep" version="[1.0,)" /></dependencies>
+  </metadata>
+</package>"""
+# Maximum number of queries for each route in minchoc.urls, with a request to measure. The count
+# must not depend on the number of packages. Downloads are measured with the default settings, so
+# they are buffered; DOWNLOAD_FLUSH_BUDGET covers a download that flushes the buffer.
+ROUTE_BUDGETS: dict[str, tuple[str, str, int]] = {
+    '': ('GET', '/', 0),
+    '$metadata': ('GET', '/$metadata', 0),
+    'Dependents()': ('GET', "/Dependents()?id='dep'", 3),
+    'FindPackagesById()': ('GET', "/FindPackagesById()?id='budget'", 4),
+    'GetUpdates()': ('GET', ("/GetUpdates()?packageIds='budget|dep'&versions='0.1|0.1'"
+                             '&includePrerelease=true&includeAllVersions=true'), 4),
+    'Packages()': ('GET', "/Packages()?$filter=tolower(Id) eq 'budget'&$top=100", 4),
+    "Packages(Id='<name>',Version='<version>')": (
+        'GET', "/Packages(Id='budget',Version='1.0.0')", 4),
+    'ResolveDependencies()': ('GET', "/ResolveDependencies()?id='budget'&version='1.0.0'", 8),
+    'Search()': ('GET', "/Search()?searchTerm='budget'&includePrerelease=true&$top=100", 4),
+    'Search()/$count': ('GET', "/Search()/$count?searchTerm='budget'", 1),
+    'metrics': ('GET', '/metrics', 0),
+    'package/': ('PUT', '/package/', 16),
+    'package/<name>/<version>': ('GET', '/package/budget/1.0.0', 1),
+}
+# Maximum number of queries of a download that also writes the buffered downloads.
+DOWNLOAD_FLUSH_BUDGET = 12
+
+
+def _nupkg(nuget_id: str, version: str, padding: int = 0) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr(f'{nuget_id}.nuspec', NUSPEC.format(nuget_id=nuget_id, version=version))
+        if padding:
+            rng = random.Random(0)  # ruff:ignore[suspicious-non-cryptographic-random-usage]
+            z.writestr('tools/payload.bin', rng.randbytes(padding))
+    return buffer.getvalue()
+
+
+def _upload_body(content: bytes) -> bytes:
+    return (f'--{UPLOAD_BOUNDARY}\r\ncontent-disposition: form-data; name="upload"; '
+            'filename="a.nupkg"\r\ncontent-type: application/zip\r\n\r\n').encode() + content + (
+                f'\r\n--{UPLOAD_BOUNDARY}--'.encode())
+
+
+def _add_packages(nuget_user: NugetUser, nuget_id: str, versions: range, padding: int = 0) -> None:
+    items = []
+    for i in versions:
+        version = f'1.{i}.0'
+        package = Package(nuget_id=nuget_id,
+                          title=nuget_id,
+                          uploader=nuget_user,
+                          version=version,
+                          project_url='https://a-url',
+                          dependencies=[] if nuget_id == 'dep' else [{
+                              'nuget_id': 'dep',
+                              'version_range': '[1.0,)',
+                              'target_framework': ''
+                          }],
+                          size=1)
+        apply_version_fields(package)
+        package.file.save(f'{nuget_id}.{version}.nupkg',
+                          ContentFile(_nupkg(nuget_id, version, padding)),
+                          save=False)
+        items.append((package, ['t1', f'tag{i}'], ['a', f'author{i}']))
+    bulk_create_packages(items)
+    update_latest_versions([nuget_id])
+
+
+def _request(client: Client, nuget_user: NugetUser, route: str, n: int) -> int:
+    method, url, _ = ROUTE_BUDGETS[route]
+    if method == 'PUT':
+        body = _upload_body(_nupkg('budget', f'2.{n}.0'))
+        response = client.put(url,
+                              body,
+                              f'multipart/form-data; boundary={UPLOAD_BOUNDARY}',
+                              headers={'x-nuget-apikey': nuget_user.token.hex})
+    else:
+        response = client.get(url)
+    assert response.status_code < HTTPStatus.BAD_REQUEST, response
+    return response.status_code
+
+
+def test_every_route_has_budget() -> None:
+    assert {str(x.pattern) for x in urlpatterns} == set(ROUTE_BUDGETS)
+
+
+def _check_budget(client: Client, nuget_user: NugetUser, route: str, limit: int,
+                  assert_max_queries: Callable[[int], AbstractContextManager[list[int]]]) -> None:
+    _add_packages(nuget_user, 'dep', range(1))
+    _add_packages(nuget_user, 'budget', range(1))
+    _request(client, nuget_user, route, 0)
+    with assert_max_queries(limit) as small:
+        _request(client, nuget_user, route, 1)
+    _add_packages(nuget_user, 'budget', range(1, 40))
+    for i in range(20):
+        _add_packages(nuget_user, f'other{i}', range(3))
+    with assert_max_queries(limit) as large:
+        _request(client, nuget_user, route, 2)
+    assert large[0] == small[0]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('route', sorted(ROUTE_BUDGETS))
+def test_route_query_budget(
+        client: Client, nuget_user: NugetUser, settings: Any, tmp_path: Path, route: str,
+        assert_max_queries: Callable[[int], AbstractContextManager[list[int]]]) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    _check_budget(client, nuget_user, route, ROUTE_BUDGETS[route][2], assert_max_queries)
+
+
+@pytest.mark.django_db
+def test_download_flush_query_budget(
+        client: Client, nuget_user: NugetUser, settings: Any, tmp_path: Path,
+        assert_max_queries: Callable[[int], AbstractContextManager[list[int]]]) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    settings.MINCHOC_DOWNLOAD_FLUSH_SIZE = 1
+    _check_budget(client, nuget_user, 'package/<name>/<version>', DOWNLOAD_FLUSH_BUDGET,
+                  assert_max_queries)
+
+
+@pytest.mark.django_db
+def test_upload_allocation(
+        nuget_user: NugetUser, settings: Any, tmp_path: Path,
+        assert_max_allocation: Callable[[int], AbstractContextManager[None]]) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    body = _upload_body(_nupkg('large', '1.0.0', LARGE_PACKAGE_SIZE))
+    request = RequestFactory().put('/package/',
+                                   body,
+                                   f'multipart/form-data; boundary={UPLOAD_BOUNDARY}',
+                                   headers={'x-nuget-apikey': nuget_user.token.hex})
+    view = cast('Callable[[HttpRequest], Awaitable[HttpResponseBase]]', APIV2PackageView.as_view())
+    with assert_max_allocation(LARGE_PACKAGE_SIZE // 4):
+        response = async_to_sync(view)(request)
+    request.close()
+    assert response.status_code == HTTPStatus.CREATED
+    assert Package._default_manager.get(nuget_id='large').file.size > LARGE_PACKAGE_SIZE
+
+
+@pytest.mark.django_db
+def test_download_allocation(
+        nuget_user: NugetUser, settings: Any, tmp_path: Path,
+        assert_max_allocation: Callable[[int], AbstractContextManager[None]]) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    _add_packages(nuget_user, 'large', range(1), LARGE_PACKAGE_SIZE)
+    size = Package._default_manager.get(nuget_id='large').file.size
+
+    def download_wsgi() -> int:
+        response = async_to_sync(fetch_package_file)(RequestFactory().get('/'), 'large', '1.0.0')
+        try:
+            assert int(response['Content-Length']) == size
+            return sum(len(x) for x in response)
+        finally:
+            response.close()
+
+    async def download_asgi() -> int:
+        response = await fetch_package_file(AsyncRequestFactory().get('/'), 'large', '1.0.0')
+        assert isinstance(response, StreamingHttpResponse)
+        assert int(response['Content-Length']) == size
+        content = cast('AsyncIterator[bytes]', response.streaming_content)
+        return sum([len(x) async for x in content])
+
+    with assert_max_allocation(LARGE_PACKAGE_SIZE // 4):
+        assert download_wsgi() == size
+    with assert_max_allocation(LARGE_PACKAGE_SIZE // 4):
+        assert async_to_sync(download_asgi)() == size
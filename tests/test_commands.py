@@ -0,0 +1,504 @@
+from __future__ import annotations
+
+from datetime import date
+from http import HTTPStatus
+from io import StringIO
+from typing import TYPE_CHECKING, Any
+import gzip
+import json
+import re
+import tarfile
+import zipfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import FileField
+from minchoc.models import NugetUser, Package, PackageDependency, PackageDownloadDay
+from minchoc.signals import package_changed
+import pytest
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from django.test import Client
+    from pytest_mock import MockerFixture
+
+
+def _write_nupkg(path: Path,
+                 nuget_id: str,
+                 version: str,
+                 tags: str = 'tag1 tag2',
+                 dependencies: str = '') -> Path:
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr(
+            f'{nuget_id}.nuspec', f"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>{nuget_id}</id>
+    <version>{version}</version>
+    <title>{nuget_id} (Install)</title>
+    <authors>Author 1, Author 2</authors>
+    <projectUrl>https://a-url</projectUrl>
+    <description>DESCRIPTION</description>
+    <tags>{tags}</tags>{dependencies}
+  </metadata>
+</package>""")
+    return path
+
+
+@pytest.fixture
+def importer(nuget_user: NugetUser) -> NugetUser:
+    nuget_user.base.username = 'importer'
+    nuget_user.base.save()
+    return nuget_user
+
+
+@pytest.mark.django_db
+def test_import_packages_directory(tmp_path: Path, importer: NugetUser) -> None:
+    (tmp_path / 'sub').mkdir()
+    _write_nupkg(tmp_path / 'a.1.0.0.nupkg', 'a', '1.0.0')
+    _write_nupkg(tmp_path / 'sub' / 'a.1.0.1.nupkg', 'a', '1.0.1', 'tag2 tag3')
+    _write_nupkg(tmp_path / 'b.2.0.nupkg', 'b', '2.0')
+    (tmp_path / 'broken.nupkg').write_bytes(b'not a zip')
+    stdout = StringIO()
+    stderr = StringIO()
+    call_command('import_packages',
+                 str(tmp_path),
+                 uploader='importer',
+                 batch_size=2,
+                 jobs=1,
+                 stdout=stdout,
+                 stderr=stderr)
+    assert 'Imported 3 packages' in stdout.getvalue()
+    assert 'broken.nupkg' in stderr.getvalue()
+    package = Package._default_manager.get(nuget_id='a', version='1.0.1')
+    assert package.uploader == importer
+    assert package.version2 == 1
+    assert sorted(x.name for x in package.tags.all()) == ['tag2', 'tag3']
+    assert sorted(x.name for x in package.authors.all()) == ['Author 1', 'Author 2']
+    assert package.file.read().startswith(b'PK')
+    # Running again resumes by skipping everything already imported.
+    stdout = StringIO()
+    call_command('import_packages',
+                 str(tmp_path),
+                 uploader='importer',
+                 jobs=1,
+                 stdout=stdout,
+                 stderr=StringIO())
+    assert 'Imported 0 packages' in stdout.getvalue()
+    assert 'Skipped 3 already present' in stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_and_restore_send_package_changed(tmp_path: Path, importer: NugetUser) -> None:
+    _write_nupkg(tmp_path / 'a.1.0.0.nupkg', 'a', '1.0.0')
+    _write_nupkg(tmp_path / 'a.1.0.1.nupkg', 'a', '1.0.1')
+    _write_nupkg(tmp_path / 'b.2.0.nupkg', 'b', '2.0')
+    sent: list[str] = []
+
+    def receiver(sender: object, nuget_id: str, **kwargs: object) -> None:
+        sent.append(nuget_id)
+        msg = 'Receivers must not fail the command.'
+        raise RuntimeError(msg)
+
+    package_changed.connect(receiver, dispatch_uid='test_receiver')
+    try:
+        call_command('import_packages',
+                     str(tmp_path),
+                     uploader='importer',
+                     jobs=1,
+                     stdout=StringIO())
+        assert sent == ['a', 'b']
+        snapshot = tmp_path / 'catalog.jsonl.gz'
+        call_command('export_catalog', str(snapshot), stdout=StringIO())
+        Package._default_manager.all().delete()
+        sent.clear()
+        call_command('restore_catalog', str(snapshot), stdout=StringIO())
+        assert sent == ['a', 'b']
+    finally:
+        package_changed.disconnect(dispatch_uid='test_receiver')
+
+
+@pytest.mark.django_db
+def test_import_packages_tarball_process_pool(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    tarball = tmp_path / 'packages.tar.gz'
+    with tarfile.open(tarball, 'w:gz') as tar:
+        tar.add(_write_nupkg(src / 'c.1.0.nupkg', 'c', '1.0'), 'feed/c.1.0.nupkg')
+        tar.add(_write_nupkg(src / 'c.1.1.nupkg', 'c', '1.1'), 'feed/c.1.1.nupkg')
+        tar.add(src / 'c.1.0.nupkg', 'feed/duplicate.nupkg')
+    stdout = StringIO()
+    call_command('import_packages', str(tarball), uploader='importer', jobs=2, stdout=stdout)
+    assert 'Imported 2 packages' in stdout.getvalue()
+    assert 'Skipped 1 already present' in stdout.getvalue()
+    assert Package._default_manager.filter(nuget_id='c').count() == 2
+
+
+@pytest.mark.django_db
+def test_import_packages_rolls_back_stored_files(tmp_path: Path, importer: NugetUser,
+                                                 mocker: MockerFixture) -> None:
+    _write_nupkg(tmp_path / 'd.1.0.nupkg', 'd', '1.0')
+    file_field = Package._meta.get_field('file')
+    assert isinstance(file_field, FileField)
+    storage = file_field.storage
+    save_spy = mocker.spy(storage, 'save')
+    mocker.patch('minchoc.management.commands.import_packages.bulk_create_packages',
+                 side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        call_command('import_packages',
+                     str(tmp_path),
+                     uploader='importer',
+                     jobs=1,
+                     stdout=StringIO())
+    assert not storage.exists(save_spy.spy_return)
+
+
+@pytest.mark.django_db
+def test_import_packages_bad_arguments(tmp_path: Path, importer: NugetUser) -> None:
+    with pytest.raises(CommandError, match='No NuGet user'):
+        call_command('import_packages', str(tmp_path), uploader='nobody')
+    with pytest.raises(CommandError, match='not a directory or a tarball'):
+        call_command('import_packages', str(tmp_path / 'missing'), uploader='importer')
+
+
+@pytest.mark.django_db
+def test_export_and_restore_catalog(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'e.1.0.nupkg', 'e', '1.0')
+    _write_nupkg(src / 'e.2.0.nupkg', 'e', '2.0')
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    Package._default_manager.filter(version='1.0').update(listed=False, download_count=5)
+    published = {x.version: x.published for x in Package._default_manager.all()}
+    snapshot = tmp_path / 'catalog.jsonl.gz'
+    blobs = tmp_path / 'blobs'
+    stdout = StringIO()
+    call_command('export_catalog', str(snapshot), blobs=str(blobs), stdout=stdout)
+    assert 'Exported 2 packages' in stdout.getvalue()
+    token = importer.token
+    Package._default_manager.all().delete()
+    importer.base.delete()
+    stdout = StringIO()
+    call_command('restore_catalog', str(snapshot), blobs=str(blobs), batch_size=1, stdout=stdout)
+    assert 'Restored 2 packages' in stdout.getvalue()
+    restored = NugetUser._default_manager.get(base__username='importer')
+    assert restored.token == token
+    unlisted = Package._default_manager.get(nuget_id='e', version='1.0')
+    assert unlisted.listed is False
+    assert unlisted.download_count == 5
+    assert unlisted.uploader == restored
+    assert unlisted.published == published['1.0']
+    assert sorted(x.name for x in unlisted.tags.all()) == ['tag1', 'tag2']
+    assert unlisted.file.read().startswith(b'PK')
+    stdout = StringIO()
+    call_command('restore_catalog', str(snapshot), stdout=stdout)
+    assert 'Skipped 2 already present' in stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_export_and_restore_catalog_tokens(tmp_path: Path, importer: NugetUser) -> None:
+    snapshot = tmp_path / 'catalog.jsonl'
+    call_command('export_catalog', str(snapshot), stdout=StringIO())
+    assert snapshot.stat().st_mode & 0o777 == 0o600
+    token = importer.token
+    importer.base.delete()
+    other = User._default_manager.create(username='other')
+    NugetUser._default_manager.filter(base=other).update(token=token)
+    with pytest.raises(CommandError, match='belongs to another user'):
+        call_command('restore_catalog', str(snapshot), stdout=StringIO())
+    assert not User._default_manager.filter(username='importer').exists()
+    no_tokens = tmp_path / 'no-tokens.jsonl.gz'
+    call_command('export_catalog', str(no_tokens), exclude_tokens=True, stdout=StringIO())
+    assert no_tokens.stat().st_mode & 0o777 == 0o600
+    with gzip.open(no_tokens, 'rt', encoding='utf-8') as f:
+        users = [x for x in map(json.loads, f) if x['type'] == 'user']
+    assert [x['username'] for x in users] == ['other']
+    assert 'token' not in users[0]
+    call_command('restore_catalog', str(no_tokens), stdout=StringIO())
+    assert NugetUser._default_manager.get(base=other).token == token
+
+
+@pytest.mark.django_db
+def test_restore_catalog_skips_invalid_versions(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'f.1.0.nupkg', 'f', '1.0')
+    _write_nupkg(src / 'f.2.0.nupkg', 'f', '2.0')
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    exported = tmp_path / 'catalog.jsonl'
+    call_command('export_catalog', str(exported), stdout=StringIO())
+    Package._default_manager.all().delete()
+    snapshot = tmp_path / 'edited.jsonl'
+    with exported.open(encoding='utf-8') as f, snapshot.open('w', encoding='utf-8') as out:
+        for line in f:
+            record = json.loads(line)
+            if record['type'] == 'package' and record['version'] == '1.0':
+                # As written before the version sort key was added.
+                record.update(version='not-a-version', version_sort_key='')
+            out.write(json.dumps(record) + '\n')
+    stdout = StringIO()
+    stderr = StringIO()
+    call_command('restore_catalog', str(snapshot), stdout=stdout, stderr=stderr)
+    assert 'Restored 1 packages. Skipped 0 already present, 1 failed.' in stdout.getvalue()
+    assert 'Skipping f not-a-version' in stderr.getvalue()
+    assert list(Package._default_manager.values_list('version', flat=True)) == ['2.0']
+
+
+@pytest.mark.django_db
+def test_import_and_restore_dependencies(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'app.1.0.nupkg',
+                 'app',
+                 '1.0',
+                 dependencies="""
+    <dependencies>
+      <dependency id="Lib" version="[1.0,2.0)" />
+      <group targetFramework="net45"><dependency id="other" /></group>
+      <dependency version="1.0" />
+    </dependencies>""")
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    expected = [('Lib', '[1.0,2.0)', ''), ('other', '', 'net45')]
+    package = Package._default_manager.get(nuget_id='app')
+    assert [tuple(x.values()) for x in package.dependencies] == expected
+    rows = PackageDependency._default_manager.order_by('nuget_id_lower')
+    assert [(x.nuget_id, x.version_range, x.target_framework) for x in rows] == expected
+    assert rows[0].nuget_id_lower == 'lib'
+    assert rows[0].min_inclusive is True
+    assert rows[0].max_inclusive is False
+    assert rows[1].min_version_key is None
+    assert rows[1].max_version_key is None
+    snapshot = tmp_path / 'catalog.jsonl.gz'
+    call_command('export_catalog', str(snapshot), blobs=str(tmp_path / 'blobs'), stdout=StringIO())
+    Package._default_manager.all().delete()
+    assert not PackageDependency._default_manager.exists()
+    call_command('restore_catalog', str(snapshot), blobs=str(tmp_path / 'blobs'), stdout=StringIO())
+    assert [(x.nuget_id, x.version_range, x.target_framework)
+            for x in PackageDependency._default_manager.order_by('nuget_id_lower')] == expected
+
+
+@pytest.mark.django_db
+def test_dependents(tmp_path: Path, importer: NugetUser) -> None:
+    _write_nupkg(tmp_path / 'app.1.0.nupkg',
+                 'app',
+                 '1.0',
+                 dependencies="""
+    <dependencies><dependency id="lib" version="[1.0,2.0)" /></dependencies>""")
+    _write_nupkg(tmp_path / 'tool.1.0.nupkg',
+                 'tool',
+                 '1.0',
+                 dependencies="""
+    <dependencies><group targetFramework="net45"><dependency id="Lib" /></group>
+    <group targetFramework="net40"><dependency id="lib" version="[2.0]" /></group></dependencies>"""
+                 )
+    call_command('import_packages', str(tmp_path), uploader='importer', jobs=1, stdout=StringIO())
+    stdout = StringIO()
+    call_command('dependents', 'LIB', stdout=stdout)
+    assert stdout.getvalue().splitlines() == [
+        'app 1.0 [1.0,2.0)', 'tool 1.0 [2.0] net40, * net45', '2 dependents of LIB.'
+    ]
+    stdout = StringIO()
+    call_command('dependents', 'lib', range='[2.0]', latest_only=True, stdout=stdout)
+    assert stdout.getvalue().splitlines() == [
+        'tool 1.0 [2.0] net40, * net45', '1 dependents of lib.'
+    ]
+    with pytest.raises(CommandError, match='Invalid version'):
+        call_command('dependents', 'lib', range='[x]')
+
+
+@pytest.mark.django_db
+def test_restore_catalog_checksum_mismatch(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'f.1.0.nupkg', 'f', '1.0')
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    package = Package._default_manager.get(nuget_id='f')
+    snapshot = tmp_path / 'catalog.jsonl'
+    blobs = tmp_path / 'blobs'
+    call_command('export_catalog', str(snapshot), blobs=str(blobs), link=True, stdout=StringIO())
+    (blobs / package.file.name).unlink()
+    (blobs / package.file.name).write_bytes(b'changed')
+    package.delete()
+    with pytest.raises(CommandError, match='Checksum mismatch'):
+        call_command('restore_catalog', str(snapshot), blobs=str(blobs), stdout=StringIO())
+    assert not Package._default_manager.filter(nuget_id='f').exists()
+
+
+@pytest.mark.django_db
+def test_restore_catalog_not_a_snapshot(tmp_path: Path) -> None:
+    snapshot = tmp_path / 'catalog.jsonl'
+    snapshot.write_text('{"type": "package"}\n')
+    with pytest.raises(CommandError, match='Not a supported snapshot'):
+        call_command('restore_catalog', str(snapshot))
+
+
+@pytest.mark.django_db
+def test_prerender_feeds(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'g.1.0.nupkg', 'g', '1.0')
+    _write_nupkg(src / 'g.1.1.nupkg', 'g', '1.1')
+    _write_nupkg(src / 'h.1.0.nupkg', 'h', '1.0')
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    out = tmp_path / 'static'
+    stdout = StringIO()
+    call_command('prerender_feeds', output=str(out), host='https://mirror/', stdout=stdout)
+    assert 'Rendered 5 files for 2 identifiers' in stdout.getvalue()
+    find_g = (out / 'FindPackagesById()' / 'g.xml').read_text()
+    assert '<d:Version>1.0</d:Version>' in find_g
+    assert '<d:Version>1.1</d:Version>' in find_g
+    assert 'https://mirror/api/v2/package/g/1.1' in find_g
+    assert gzip.decompress(
+        (out / 'FindPackagesById()' / 'g.xml.gz').read_bytes()).decode() == find_g
+    assert '<d:Version>1.1</d:Version>' in (out / "Packages(Id='g',Version='1.1').xml").read_text()
+    Package._default_manager.filter(nuget_id='h').delete()
+    Package._default_manager.filter(nuget_id='g', version='1.0').delete()
+    call_command('prerender_feeds', output=str(out), stdout=StringIO())
+    assert not (out / 'FindPackagesById()' / 'h.xml').exists()
+    assert not (out / "Packages(Id='h',Version='1.0').xml").exists()
+    assert not (out / "Packages(Id='g',Version='1.0').xml").exists()
+    assert not (out / "Packages(Id='g',Version='1.0').xml.gz").exists()
+    assert not (out / 'FindPackagesById()' / 'h.xml.gz').exists()
+    assert '<d:Version>1.0</d:Version>' not in (out / 'FindPackagesById()' / 'g.xml').read_text()
+
+
+@pytest.mark.django_db
+def test_prerender_feeds_match_live_feeds(tmp_path: Path, importer: NugetUser,
+                                          client: Client) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'k.1.10.nupkg', 'k', '1.10')
+    _write_nupkg(src / 'k.1.9.nupkg', 'k', '1.9')
+    _write_nupkg(src / 'k.2.0.nupkg', 'K', '2.0')
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    out = tmp_path / 'static'
+    call_command('prerender_feeds', 'k', output=str(out), stdout=StringIO())
+    version_re = re.compile(r'<d:Version>([^<]+)</d:Version>')
+    live = client.get('/FindPackagesById()?id=k').content.decode()
+    assert version_re.findall(live) == ['1.9', '1.10', '2.0']
+    assert version_re.findall(
+        (out / 'FindPackagesById()' / 'k.xml').read_text()) == ['1.9', '1.10', '2.0']
+    assert '<d:Version>2.0</d:Version>' in (out / "Packages(Id='k',Version='2.0').xml").read_text()
+
+
+@pytest.mark.django_db
+def test_prerender_v3(tmp_path: Path, importer: NugetUser) -> None:
+    src = tmp_path / 'src'
+    src.mkdir()
+    _write_nupkg(src / 'g.1.0.nupkg', 'G', '1.0')
+    _write_nupkg(src / 'g.1.10.nupkg',
+                 'G',
+                 '1.10-Beta',
+                 dependencies='<dependencies><dependency id="h" version="[1.0,2.0)" />'
+                 '</dependencies>')
+    _write_nupkg(src / 'h.1.0.nupkg', 'h', '1.0')
+    call_command('import_packages', str(src), uploader='importer', jobs=1, stdout=StringIO())
+    out = tmp_path / 'v3'
+    stdout = StringIO()
+    call_command('prerender_v3', output=str(out), base_url='https://cdn/v3/', stdout=stdout)
+    assert 'Rendered 7 files for 2 identifiers' in stdout.getvalue()
+    service_index = json.loads((out / 'index.json').read_text())
+    assert {
+        x['@type']: x['@id']
+        for x in service_index['resources']
+    }['PackageBaseAddress/3.0.0'] == 'https://cdn/v3/flatcontainer/'
+    assert json.loads((out / 'flatcontainer' / 'g' / 'index.json').read_text()) == {
+        'versions': ['1.0.0', '1.10.0-beta']
+    }
+    assert (out / 'flatcontainer' / 'g' / '1.0.0' /
+            'g.1.0.0.nupkg').read_bytes() == (src / 'g.1.0.nupkg').read_bytes()
+    assert gzip.decompress((out / 'flatcontainer' / 'g' /
+                            'index.json.gz').read_bytes()) == (out / 'flatcontainer' / 'g' /
+                                                               'index.json').read_bytes()
+    registration = json.loads((out / 'registration' / 'g' / 'index.json').read_text())
+    assert registration['count'] == 1
+    page = registration['items'][0]
+    assert (page['lower'], page['upper'], page['count']) == ('1.0.0', '1.10.0-beta', 2)
+    entry = page['items'][1]['catalogEntry']
+    assert entry['id'] == 'G'
+    assert entry['version'] == '1.10.0-Beta'
+    assert entry['authors'] == 'Author 1, Author 2'
+    assert entry['dependencyGroups'] == [{'dependencies': [{'id': 'h', 'range': '[1.0,2.0)'}]}]
+    assert entry['packageContent'] == ('https://cdn/v3/flatcontainer/g/1.10.0-beta/'
+                                       'g.1.10.0-beta.nupkg')
+    assert (out / 'registration' / 'g' / '1.10.0-beta.json').exists()
+    Package._default_manager.filter(nuget_id='h').delete()
+    Package._default_manager.filter(nuget_id='G', version='1.0').delete()
+    call_command('prerender_v3', output=str(out), stdout=StringIO())
+    assert not (out / 'flatcontainer' / 'h').exists()
+    assert not (out / 'registration' / 'h').exists()
+    assert not (out / 'flatcontainer' / 'g' / '1.0.0').exists()
+    assert not (out / 'registration' / 'g' / '1.0.0.json').exists()
+    assert not (out / 'registration' / 'g' / '1.0.0.json.gz').exists()
+    assert json.loads((out / 'flatcontainer' / 'g' / 'index.json').read_text()) == {
+        'versions': ['1.10.0-beta']
+    }
+
+
+def test_prerender_v3_no_output() -> None:
+    with pytest.raises(CommandError, match='MINCHOC_V3_ROOT'):
+        call_command('prerender_v3')
+
+
+@pytest.mark.django_db
+def test_rollup_and_export_download_stats(tmp_path: Path, importer: NugetUser) -> None:
+    _write_nupkg(tmp_path / 'd.1.0.nupkg', 'd', '1.0')
+    _write_nupkg(tmp_path / 'd.2.0.nupkg', 'd', '2.0')
+    call_command('import_packages', str(tmp_path), uploader='importer', jobs=1, stdout=StringIO())
+    first, second = Package._default_manager.filter(nuget_id='d').order_by('version_sort_key')
+    PackageDownloadDay._default_manager.bulk_create([
+        PackageDownloadDay(package=first, day=date(2026, 1, 1), count=3),
+        PackageDownloadDay(package=second, day=date(2026, 1, 1), count=2),
+        PackageDownloadDay(package=second, day=date(2026, 1, 2), count=4, rolled_up=4)
+    ])
+    stdout = StringIO()
+    call_command('rollup_downloads', stdout=stdout)
+    assert 'Rolled up 5 downloads.' in stdout.getvalue()
+    first.refresh_from_db()
+    assert first.download_count == 3
+    stdout = StringIO()
+    call_command('export_download_stats', stdout=stdout)
+    assert stdout.getvalue() == ('day,nuget_id,version,downloads\n2026-01-01,d,1.0,3\n'
+                                 '2026-01-01,d,2.0,2\n2026-01-02,d,2.0,4\n')
+    stdout = StringIO()
+    call_command('export_download_stats',
+                 nuget_id='D',
+                 since='2026-01-01',
+                 until='2026-01-01',
+                 by_id=True,
+                 stdout=stdout)
+    assert stdout.getvalue() == 'day,nuget_id,downloads\n2026-01-01,d,5\n'
+
+
+def test_prerender_feeds_no_output() -> None:
+    with pytest.raises(CommandError, match='MINCHOC_STATIC_FEED_ROOT'):
+        call_command('prerender_feeds')
+
+
+@pytest.mark.django_db
+def test_import_packages_versions(tmp_path: Path, importer: NugetUser, client: Client,
+                                  settings: Any) -> None:
+    for version in ('1.2.0', '1.10.0', '2.0.0-beta.2', '2.0.0-beta.10', '1.9.0'):
+        _write_nupkg(tmp_path / f'v.{version}.nupkg', 'v', version)
+    call_command('import_packages', str(tmp_path), uploader='importer', jobs=1, stdout=StringIO())
+    package = Package._default_manager.get(version='2.0.0-beta.10')
+    assert package.is_prerelease is True
+    assert package.version_beta == 'beta.10'
+    assert (package.version0, package.version1, package.version2) == (2, 0, 0)
+    assert package.is_absolute_latest_version is True
+    assert package.is_latest_version is False
+    assert list(
+        Package._default_manager.filter(is_latest_version=True).values_list(
+            'version', flat=True)) == ['1.10.0']
+    content = client.get('/FindPackagesById()?id=v').content.decode()
+    assert re.findall(r'<d:Version>([^<]+)',
+                      content) == ['1.2.0', '1.9.0', '1.10.0', '2.0.0-beta.2', '2.0.0-beta.10']
+    content = client.get("/FindPackagesById()?id=v&$skiptoken='v','1.10.0'").content.decode()
+    assert re.findall(r'<d:Version>([^<]+)', content) == ['2.0.0-beta.2', '2.0.0-beta.10']
+    settings.ALLOW_PACKAGE_DELETION = True
+    response = client.delete('/package/v/2.0.0-beta.10',
+                             headers={'x-nuget-apikey': importer.token.hex})
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert Package._default_manager.get(version='2.0.0-beta.2').is_absolute_latest_version is True
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import gzip
+
+from minchoc.compression import available_encodings, compress, compress_variants, negotiate_encoding
+import pytest
+
+
+@pytest.mark.parametrize(('header', 'expected'), [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip, deflate', 'gzip'),
+    ('GZIP;q=0.5', 'gzip'),
+    ('gzip;q=0', None),
+    ('*', 'br'),
+    ('gzip, br', 'br'),
+    ('gzip;q=1.0, br;q=0.8', 'gzip'),
+    ('br;q=x, gzip;q=0.1', 'gzip'),
+    ('*;q=0.2, br;q=0', 'gzip'),
+])
+def test_negotiate_encoding(header: str | None, expected: str | None) -> None:
+    assert negotiate_encoding(header, ('br', 'gzip')) == expected
+
+
+def test_compress_variants() -> None:
+    content = b'<entry />' * 100
+    variants = compress_variants(content, gzip_level=9)
+    assert set(variants) == set(available_encodings())
+    assert gzip.decompress(variants['gzip']) == content
+    # No timestamp in the output, so stored variants are reproducible.
+    assert compress(content, 'gzip', 9) == variants['gzip']
+    with pytest.raises(ValueError, match='Unsupported encoding'):
+        compress(content, 'deflate', 1)
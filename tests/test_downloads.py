@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING, Any
+import asyncio
+
+from django.core.cache import cache
+from minchoc import downloads
+from minchoc.downloads import (
+    arecord_download,
+    download_series,
+    flush_downloads,
+    record_download,
+    rollup_downloads,
+)
+from minchoc.feed_cache import ageneration
+from minchoc.models import NugetUser, Package, PackageDownloadDay
+from minchoc.utils import apply_version_fields
+import pytest
+
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+    from tests.fixtures import EnableCache
+
+
+def _package(nuget_user: NugetUser, nuget_id: str, version: str) -> Package:
+    package = Package(nuget_id=nuget_id,
+                      title=nuget_id,
+                      uploader=nuget_user,
+                      version=version,
+                      project_url='https://a-url',
+                      size=1)
+    apply_version_fields(package)
+    package.save()
+    return package
+
+
+@pytest.mark.django_db(transaction=True)
+def test_buffered_downloads(nuget_user: NugetUser, settings: Any, mocker: MockerFixture,
+                            enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_FEED_CACHE_TIMEOUT', 300, cache.clear)
+    settings.MINCHOC_DOWNLOAD_FLUSH_SIZE = 3
+    first = _package(nuget_user, 'a', '1.0')
+    second = _package(nuget_user, 'a', '2.0')
+    first.download_count = 10
+    first.save()
+    generation = asyncio.run(ageneration('a'))
+    record_download(first.pk)
+    asyncio.run(arecord_download(first.pk))
+    assert not PackageDownloadDay._default_manager.exists()
+    record_download(second.pk)
+    rows = {x.package_id: x for x in PackageDownloadDay._default_manager.all()}
+    assert (rows[first.pk].count, rows[first.pk].rolled_up) == (2, 2)
+    assert rows[second.pk].count == 1
+    first.refresh_from_db()
+    assert first.download_count == 12
+    assert asyncio.run(ageneration('a')) != generation
+    assert rollup_downloads() == 0
+    first.refresh_from_db()
+    assert first.download_count == 12
+    now = mocker.patch('minchoc.downloads.timezone.now')
+    now.return_value = datetime(2030, 1, 2, tzinfo=timezone.utc)
+    record_download(first.pk)
+    assert flush_downloads() == 1
+    assert flush_downloads() == 0
+    assert list(download_series('A')) == [{
+        'day': rows[first.pk].day,
+        'nuget_id': 'a',
+        'version': '1.0',
+        'downloads': 2
+    }, {
+        'day': rows[first.pk].day,
+        'nuget_id': 'a',
+        'version': '2.0',
+        'downloads': 1
+    }, {
+        'day': date(2030, 1, 2),
+        'nuget_id': 'a',
+        'version': '1.0',
+        'downloads': 1
+    }]
+    assert list(download_series(since=date(2030, 1, 1), by_version=False)) == [{
+        'day': date(2030, 1, 2),
+        'nuget_id': 'a',
+        'downloads': 1
+    }]
+    assert list(download_series(until=date(2030, 1, 1), by_version=False)) == [{
+        'day': rows[first.pk].day,
+        'nuget_id': 'a',
+        'downloads': 3
+    }]
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_downloads(nuget_user: NugetUser, settings: Any,
+                                      mocker: MockerFixture) -> None:
+    settings.MINCHOC_DOWNLOAD_FLUSH_SIZE = 100
+    package = _package(nuget_user, 'b', '1.0')
+    record_download(package.pk)
+    mocker.patch.object(PackageDownloadDay._default_manager,
+                        'bulk_create',
+                        side_effect=RuntimeError('down'))
+    with pytest.raises(RuntimeError):
+        flush_downloads()
+    assert downloads._buffer.total() == 1  # ruff:ignore[private-member-access]
+    mocker.stopall()
+    assert flush_downloads() == 1
+    package.refresh_from_db()
+    assert package.download_count == 1
+    settings.MINCHOC_DOWNLOAD_FLUSH_SIZE = 1
+    mocker.patch.object(PackageDownloadDay._default_manager,
+                        'bulk_create',
+                        side_effect=RuntimeError('down'))
+    record_download(package.pk)
+    asyncio.run(arecord_download(package.pk))
+    assert downloads._buffer.total() == 2  # ruff:ignore[private-member-access]
+
+
+@pytest.mark.django_db
+def test_downloads_of_deleted_packages_are_dropped(nuget_user: NugetUser, settings: Any) -> None:
+    settings.MINCHOC_DOWNLOAD_FLUSH_SIZE = 3
+    deleted = _package(nuget_user, 'c', '1.0')
+    kept = _package(nuget_user, 'c', '2.0')
+    record_download(deleted.pk)
+    deleted.delete()
+    record_download(kept.pk)
+    record_download(kept.pk)
+    assert not downloads._buffer  # ruff:ignore[private-member-access]
+    assert list(PackageDownloadDay._default_manager.values_list('package_id',
+                                                                'count')) == [(kept.pk, 2)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_timer_flushes_downloads(nuget_user: NugetUser, settings: Any) -> None:
+    settings.MINCHOC_DOWNLOAD_FLUSH_SECONDS = 0.1
+    package = _package(nuget_user, 'd', '1.0')
+    record_download(package.pk)
+    timer = downloads._timer  # ruff:ignore[private-member-access]
+    assert timer is not None
+    assert not PackageDownloadDay._default_manager.exists()
+    timer.join(5)
+    package.refresh_from_db()
+    assert package.download_count == 1
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from io import BytesIO
+from typing import TYPE_CHECKING, Any
+import zipfile
+
+from django.core.files.base import ContentFile
+from minchoc import filteryacc, metrics
+from minchoc.filteryacc import parse_filter
+from minchoc.metrics import (
+    DB_QUERIES,
+    FILTER_PARSE_CACHE,
+    REQUEST_DURATION,
+    RESPONSE_BYTES,
+    UPLOAD_PHASE_DURATION,
+    Counter,
+    Histogram,
+)
+from minchoc.models import Package
+from minchoc.utils import apply_version_fields
+import pytest
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from django.test import Client
+    from minchoc.models import NugetUser
+
+NUSPEC = b"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>measured</id>
+    <version>1.0.0</version>
+    <title>Measured</title>
+    <authors>a</authors>
+    <requireLicenseAcceptance>false</requireLicenseAcceptance>
+    <projectUrl>https://a-url</projectUrl>
+    <description>d</description>
+  </metadata>
+</package>"""
+
+
+@pytest.fixture
+def clear_metrics() -> Iterator[None]:
+    metrics.clear()
+    yield
+    metrics.clear()
+
+
+def test_counter_and_histogram_render(clear_metrics: None) -> None:
+    counter = Counter('test_things_total', 'Things "counted".', ('kind',))
+    histogram = Histogram('test_seconds', 'Durations.', buckets=(0.1, 1))
+    try:
+        counter.inc(kind='a')
+        counter.inc(2, kind='a\nb')
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        assert counter.value(kind='a') == 1
+        assert histogram.count() == 3
+        assert counter.render() == ('# HELP test_things_total Things \\"counted\\".\n'
+                                    '# TYPE test_things_total counter\n'
+                                    'test_things_total{kind="a"} 1\n'
+                                    'test_things_total{kind="a\\nb"} 2')
+        assert histogram.render() == ('# HELP test_seconds Durations.\n'
+                                      '# TYPE test_seconds histogram\n'
+                                      'test_seconds_bucket{le="0.1"} 1\n'
+                                      'test_seconds_bucket{le="1"} 2\n'
+                                      'test_seconds_bucket{le="+Inf"} 3\n'
+                                      'test_seconds_sum 5.55\n'
+                                      'test_seconds_count 3')
+    finally:
+        metrics._registry.remove(counter)  # ruff:ignore[private-member-access]
+        metrics._registry.remove(histogram)  # ruff:ignore[private-member-access]
+
+
+def test_parse_filter_cache(clear_metrics: None) -> None:
+    filteryacc._parse_cache.clear()  # ruff:ignore[private-member-access]
+    first = parse_filter("Id eq 'cached'")
+    assert parse_filter("Id eq 'cached'") is first
+    with pytest.raises(SyntaxError):
+        parse_filter('Id eq eq')
+    with pytest.raises(SyntaxError):
+        parse_filter('Id eq eq')
+    assert FILTER_PARSE_CACHE.value(result='hit') == 1
+    assert FILTER_PARSE_CACHE.value(result='miss') == 3
+
+
+@pytest.mark.django_db
+def test_middleware_and_endpoint(client: Client, settings: Any, clear_metrics: None) -> None:
+    settings.MIDDLEWARE = ['minchoc.metrics.MetricsMiddleware', *settings.MIDDLEWARE]
+    assert client.get('/Packages()').status_code == HTTPStatus.OK
+    assert REQUEST_DURATION.count(view='packages', method='GET') == 1
+    assert DB_QUERIES.count(view='packages') == 1
+    assert RESPONSE_BYTES.value(view='packages') > 0
+    response = client.get('/metrics')
+    assert response.status_code == HTTPStatus.OK
+    assert response['content-type'].startswith('text/plain; version=0.0.4')
+    body = response.content.decode()
+    assert 'minchoc_request_db_queries_count{view="packages"} 1' in body
+    assert '# TYPE minchoc_feed_entries histogram' in body
+
+
+@pytest.mark.django_db
+def test_upload_phases(client: Client, nuget_user: NugetUser, clear_metrics: None) -> None:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr('measured.nuspec', NUSPEC)
+    content = (b'--1234abc\r\ncontent-disposition: form-data; name="upload"; filename="a.zip"\r\n'
+               b'content-type: application/zip\r\n\r\n' + buffer.getvalue() + b'\r\n--1234abc--')
+    response = client.put('/package/',
+                          content,
+                          'multipart/form-data; boundary=1234abc',
+                          headers={
+                              'content-length': f'{len(content)}',
+                              'x-nuget-apikey': nuget_user.token.hex
+                          })
+    assert response.status_code == HTTPStatus.CREATED
+    assert [UPLOAD_PHASE_DURATION.count(phase=x)
+            for x in ('read', 'validate', 'store', 'insert')] == [1, 1, 1, 1]
+
+
+@pytest.mark.django_db
+def test_download_bytes(client: Client, nuget_user: NugetUser, settings: Any, tmp_path: Path,
+                        clear_metrics: None) -> None:
+    settings.MEDIA_ROOT = tmp_path
+    settings.MIDDLEWARE = ['minchoc.metrics.MetricsMiddleware', *settings.MIDDLEWARE]
+    package = Package(nuget_id='measured',
+                      title='measured',
+                      uploader=nuget_user,
+                      version='1.0.0',
+                      project_url='https://a-url',
+                      size=7)
+    apply_version_fields(package)
+    package.file.save('measured.1.0.0.nupkg', ContentFile(b'content'))
+    response = client.get('/package/measured/1.0.0')
+    assert response.status_code == HTTPStatus.OK
+    assert response.streaming
+    assert RESPONSE_BYTES.value(view='fetch_package_file') == len(b'content')
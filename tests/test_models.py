@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
+from django.db import connection
 from django.http import HttpRequest
-from minchoc.models import Company, NugetUser, Package, Tag
+from minchoc.models import Company, NugetUser, Package, SortKeyField, Tag
 import pytest
 
+if TYPE_CHECKING:
+    from pytest_mock import MockerFixture
+
 
 @pytest.mark.django_db
 def test_company_str() -> None:
@@ -62,3 +68,16 @@ def test_only_one_nuget_user_is_created_on_first_save() -> None:
     nuget_users = NugetUser._default_manager.filter(base=user)
     assert nuget_users[0] == nuget_user
     user.delete()
+
+
+@pytest.mark.parametrize(('vendor', 'collation'), [('postgresql', 'C'), ('mysql', 'utf8mb4_bin'),
+                                                   ('sqlite', None)])
+def test_sort_key_field_collation(mocker: MockerFixture, vendor: str,
+                                  collation: str | None) -> None:
+    mocker.patch.object(connection, 'vendor', vendor)
+    assert SortKeyField(max_length=255).db_parameters(connection)['collation'] == collation
+    assert SortKeyField(max_length=255,
+                        db_collation='custom').db_parameters(connection)['collation'] == 'custom'
+    field = Package._meta.get_field('version_sort_key')
+    assert isinstance(field, SortKeyField)
+    assert field.db_parameters(connection)['collation'] == collation
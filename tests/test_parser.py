@@ -54,3 +54,10 @@ def test_parser_no_tolower() -> None:
     rc0 = cast('Sequence[Any]', res.children[0])
     assert rc0[0] == 'nuget_id__contains'
     assert rc0[1] == 'cat'
+
+
+def test_parser_tolower_eq_uses_lowercase_column() -> None:
+    res: Q = parser.parse("tolower(Id) eq 'Some.Name'")
+    rc0 = cast('Sequence[Any]', res.children[0])
+    assert rc0[0] == 'nuget_id_lower'
+    assert rc0[1] == 'some.name'
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+import asyncio
+import contextvars
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from minchoc.models import Author, Package
+from minchoc.routers import (
+    PIN_COOKIE,
+    ReplicaPinMiddleware,
+    ReplicaRouter,
+    apin_if_changed,
+    is_pinned,
+    package_changed_receiver,
+    pin_primary,
+)
+from minchoc.signals import package_changed
+import pytest
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from django.http import HttpRequest
+    from django.test import Client
+
+
+@pytest.fixture
+def replicas(settings: Any) -> Iterator[None]:
+    settings.MINCHOC_READ_REPLICAS = ['replica1', 'replica2']
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_router_spreads_reads_and_writes_to_primary(replicas: None) -> None:
+    def run() -> tuple[set[str | None], str | None, str | None, bool]:
+        router = ReplicaRouter()
+        reads = {router.db_for_read(Package) for _ in range(4)}
+        write = router.db_for_write(Package)
+        return reads, write, router.db_for_read(Package), is_pinned()
+
+    reads, write, read_after_write, pinned = contextvars.copy_context().run(run)
+    assert reads == {'replica1', 'replica2'}
+    assert write == 'default'
+    assert read_after_write == 'default'
+    assert pinned is True
+    assert is_pinned() is False
+
+
+def test_router_other_apps_and_migrations(replicas: None) -> None:
+    router = ReplicaRouter()
+    assert router.db_for_read(User) is None
+    assert router.db_for_write(User) is None
+    assert router.allow_migrate('replica1', 'minchoc') is False
+    assert router.allow_migrate('default', 'minchoc') is None
+    assert router.allow_migrate('replica1', 'auth') is None
+    author, other = Author(name='a'), Author(name='b')
+    author._state.db = 'replica1'  # ruff:ignore[private-member-access]
+    other._state.db = 'default'  # ruff:ignore[private-member-access]
+    assert router.allow_relation(author, other) is True
+    other._state.db = 'elsewhere'  # ruff:ignore[private-member-access]
+    assert router.allow_relation(author, other) is None
+
+
+def test_router_without_replicas() -> None:
+    assert ReplicaRouter().db_for_read(Package) == 'default'
+
+
+@pytest.mark.django_db
+def test_router_reads_primary_in_transaction(replicas: None) -> None:
+    with transaction.atomic():
+        assert ReplicaRouter().db_for_read(Package) == 'default'
+
+
+def test_middleware_pins_only_the_writing_client(replicas: None) -> None:
+    reads: list[str | None] = []
+
+    def view(request: HttpRequest) -> HttpResponse:
+        reads.append(ReplicaRouter().db_for_read(Package))
+        if request.method == 'DELETE':
+            package_changed.send(sender=Package, nuget_id='a')
+        return HttpResponse()
+
+    async def aview(request: HttpRequest) -> HttpResponse:
+        return await sync_to_async(view)(request)
+
+    factory = RequestFactory()
+    for middleware in (ReplicaPinMiddleware(view), ReplicaPinMiddleware(aview)):
+        reads.clear()
+        cache.clear()
+        response = middleware(factory.delete('/package/a/1.0'))
+        if asyncio.iscoroutine(response):
+            response = asyncio.run(response)
+        cookie = response.cookies[PIN_COOKIE]
+        assert cookie['max-age'] == 5
+        for request in (factory.get('/Packages()'), factory.get('/Packages()'),
+                        factory.get('/Packages()', headers={'cookie': f'{PIN_COOKIE}=1'})):
+            response = middleware(request)
+            if asyncio.iscoroutine(response):
+                response = asyncio.run(response)
+            assert PIN_COOKIE not in response.cookies
+        assert set(reads[1:3]) == {'replica1', 'replica2'}
+        assert reads[3] == 'default'
+    assert is_pinned() is False
+
+
+def test_apin_if_changed(replicas: None) -> None:
+    async def run(nuget_id: str | None) -> bool:
+        await apin_if_changed(nuget_id)
+        return is_pinned()
+
+    assert asyncio.run(run(None)) is False
+    asyncio.run(package_changed_receiver(None, nuget_id='A'))
+    assert asyncio.run(run('a')) is True
+    assert asyncio.run(run(None)) is True
+    assert asyncio.run(run('b')) is False
+    assert is_pinned() is False
+
+
+@pytest.mark.django_db
+def test_request_start_unpins(replicas: None) -> None:
+    def run() -> list[bool]:
+        ReplicaRouter().db_for_write(Package)
+        pinned = [is_pinned()]
+        request_started.send(sender=None)
+        return [*pinned, is_pinned()]
+
+    assert contextvars.copy_context().run(run) == [True, False]
+
+
+def test_pin_primary(replicas: None) -> None:
+    def run() -> str | None:
+        pin_primary()
+        return ReplicaRouter().db_for_read(Package)
+
+    assert contextvars.copy_context().run(run) == 'default'
+
+
+@pytest.mark.django_db
+def test_feed_through_router(client: Client, settings: Any) -> None:
+    settings.DATABASE_ROUTERS = ['minchoc.routers.ReplicaRouter']
+    settings.MINCHOC_READ_REPLICAS = ['default']
+    settings.MIDDLEWARE = [*settings.MIDDLEWARE, 'minchoc.routers.ReplicaPinMiddleware']
+    assert client.get('/Packages()').status_code == HTTPStatus.OK
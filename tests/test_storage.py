@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from io import BytesIO
+from typing import TYPE_CHECKING, Any
+import asyncio
+import shutil
+import threading
+import zipfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from minchoc.models import NugetUser, Package
+from minchoc.storage import (
+    FileSystemPackageStorage,
+    S3PackageStorage,
+    adelete,
+    aread,
+    asave,
+)
+import pytest
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from django.core.files.base import File
+    from django.test import Client
+    from pytest_mock import MockerFixture
+
+
+class LocalObjectStore:
+    """S3 client stand-in that keeps objects at ``root/bucket/key``."""
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> Path:
+        path = (self.root / bucket / key).resolve()
+        if not path.is_relative_to((self.root / bucket).resolve()):
+            msg = f'Invalid key: {key!r}'
+            raise ValueError(msg)
+        return path
+
+    def upload_fileobj(self, **kwargs: Any) -> None:
+        path = self._path(kwargs['Bucket'], kwargs['Key'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('wb') as f:
+            shutil.copyfileobj(kwargs['Fileobj'], f)
+
+    def get_object(self, **kwargs: Any) -> dict[str, Any]:
+        path = self._path(kwargs['Bucket'], kwargs['Key'])
+        return {'Body': path.open('rb'), 'ContentLength': path.stat().st_size}
+
+    def delete_object(self, **kwargs: Any) -> None:
+        self._path(kwargs['Bucket'], kwargs['Key']).unlink(missing_ok=True)
+
+    def list_objects_v2(self, **kwargs: Any) -> dict[str, Any]:
+        bucket = self.root / kwargs['Bucket']
+        prefix = kwargs.get('Prefix', '')
+        keys = sorted(x.relative_to(bucket).as_posix() for x in bucket.rglob('*') if x.is_file())
+        contents = [{
+            'Key': key,
+            'Size': (bucket / key).stat().st_size
+        } for key in keys if key.startswith(prefix)][:kwargs.get('MaxKeys', 1000)]
+        return {'Contents': contents, 'KeyCount': len(contents)}
+
+
+def test_file_system_storage_uses_io_pool(tmp_path: Path) -> None:
+    threads: list[str] = []
+
+    class RecordingStorage(FileSystemPackageStorage):
+        def _save(self, name: str, content: File[bytes]) -> str:
+            threads.append(threading.current_thread().name)
+            return super()._save(name, content)
+
+    storage = RecordingStorage(location=tmp_path)
+
+    async def run() -> tuple[str, bytes]:
+        name = await asave(storage, 'packages/a.nupkg', BytesIO(b'content'))
+        return name, await aread(storage, name)
+
+    name, data = asyncio.run(run())
+    assert data == b'content'
+    assert threads[0].startswith('minchoc-storage')
+    asyncio.run(adelete(storage, name))
+    assert not (tmp_path / name).exists()
+
+
+def test_plain_storage_runs_in_io_pool() -> None:
+    storage = InMemoryStorage()
+
+    async def run() -> bytes:
+        name = await asave(storage, 'a.nupkg', ContentFile(b'abc'))
+        data = await aread(storage, name)
+        await adelete(storage, name)
+        return data
+
+    assert asyncio.run(run()) == b'abc'
+    assert not storage.exists('a.nupkg')
+
+
+def test_s3_storage_with_local_object_store(tmp_path: Path) -> None:
+    storage = S3PackageStorage('bucket', prefix='/minchoc/', client=LocalObjectStore(tmp_path))
+    name = storage.save('packages/a.nupkg', ContentFile(b'first'))
+    assert name == 'packages/a.nupkg'
+    assert (tmp_path / 'bucket' / 'minchoc' / 'packages' / 'a.nupkg').read_bytes() == b'first'
+    other = storage.save('packages/a.nupkg', ContentFile(b'second'))
+    assert other != name
+    assert storage.exists(name)
+    assert storage.size(other) == len(b'second')
+    assert asyncio.run(aread(storage, other)) == b'second'
+    asyncio.run(adelete(storage, other))
+    assert not storage.exists(other)
+    with pytest.raises(FileNotFoundError):
+        storage.open(other)
+    with pytest.raises(FileNotFoundError):
+        storage.size(other)
+    with pytest.raises(ValueError, match='Invalid key'):
+        storage.client.get_object(Bucket='bucket', Key='../../escape')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_download_and_delete_with_s3_storage(client: Client, nuget_user: NugetUser,
+                                                    settings: Any, tmp_path: Path,
+                                                    mocker: MockerFixture) -> None:
+    settings.ALLOW_PACKAGE_DELETION = True
+    storage = S3PackageStorage('bucket', client=LocalObjectStore(tmp_path))
+    mocker.patch.object(Package._meta.get_field('file'), 'storage', storage)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr(
+            'a.nuspec', """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>stored</id>
+    <version>1.0.0</version>
+    <title>Stored</title>
+    <authors>AUTHORS</authors>
+    <projectUrl>https://a-url</projectUrl>
+  </metadata>
+</package>""")
+    content = (b'--1234abc\r\ncontent-disposition: form-data; name="upload"; filename="a.zip"\r\n'
+               b'content-type: application/zip\r\n\r\n' + buffer.getvalue() + b'\r\n--1234abc--')
+    response = client.put('/package/',
+                          content,
+                          'multipart/form-data; boundary=1234abc',
+                          headers={'x-nuget-apikey': nuget_user.token.hex})
+    assert response.status_code == HTTPStatus.CREATED
+    name = Package._default_manager.get(nuget_id='stored').file.name
+    assert (tmp_path / 'bucket' / name).read_bytes() == buffer.getvalue()
+    response = client.get('/package/stored/1.0.0')
+    assert response.getvalue() == buffer.getvalue()
+    response = client.delete('/package/stored/1.0.0',
+                             headers={'x-nuget-apikey': nuget_user.token.hex})
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert not (tmp_path / 'bucket' / name).exists()
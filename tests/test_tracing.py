@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+import json
+
+from minchoc import tracing
+from minchoc.tracing import InMemoryExporter, JSONLinesExporter, span
+import pytest
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from django.test import Client
+
+
+@pytest.fixture
+def exporter(settings: Any) -> Iterator[InMemoryExporter]:
+    settings.MINCHOC_TRACE_EXPORTER = 'minchoc.tracing.InMemoryExporter'
+    yield tracing.get_exporter()  # type: ignore[misc]
+    del settings.MINCHOC_TRACE_EXPORTER
+
+
+def test_span_off() -> None:
+    assert tracing.get_exporter() is None
+    with span('nothing', a=1) as current:
+        assert current is None
+    assert tracing.current_span() is None
+
+
+def test_nested_spans(exporter: InMemoryExporter) -> None:
+    with span('outer', a=1) as outer, span('inner') as inner:
+        assert tracing.current_span() is inner
+    msg = 'x'
+    with pytest.raises(ValueError, match=msg), span('failed'):
+        raise ValueError(msg)
+    assert tracing.current_span() is None
+    assert [x.name for x in exporter.spans] == ['inner', 'outer', 'failed']
+    assert outer is not None
+    assert inner is not None
+    assert inner.parent_id == outer.span_id
+    assert inner.trace_id == outer.trace_id
+    assert outer.parent_id is None
+    assert outer.attributes == {'a': 1}
+    assert exporter.spans[2].error == 'ValueError'
+    assert exporter.spans[2].trace_id != outer.trace_id
+
+
+@pytest.mark.django_db
+def test_packages_spans(client: Client, exporter: InMemoryExporter) -> None:
+    response = client.get("/Packages()?$filter=Id eq 'a'")
+    assert response.status_code == HTTPStatus.OK
+    by_name = {x.name: x for x in exporter.spans}
+    assert set(by_name) == {
+        'feed.entries', 'feed.query', 'packages', 'packages.parse_filter', 'packages.write'
+    }
+    root = by_name['packages']
+    assert all(x.parent_id == root.span_id for x in exporter.spans if x is not root)
+    assert by_name['feed.entries'].attributes == {'entries': 0}
+
+
+def test_json_lines_exporter(tmp_path: Path) -> None:
+    path = tmp_path / 'spans.jsonl'
+    tracing.set_exporter(JSONLinesExporter(path))
+    try:
+        with span('a', n=1), span('b'):
+            pass
+    finally:
+        tracing.set_exporter(None)
+    lines = [json.loads(x) for x in path.read_text(encoding='utf-8').splitlines()]
+    assert [x['name'] for x in lines] == ['b', 'a']
+    assert lines[1]['attributes'] == {'n': 1}
+    assert lines[0]['parent_id'] == lines[1]['span_id']
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from minchoc.versions import (
+    ParsedVersion,
+    normalize_version,
+    parse_version,
+    parse_version_range,
+    version_sort_key,
+)
+import pytest
+
+
+def test_parse_version() -> None:
+    assert parse_version('1.2.3-beta.1+build.5') == ParsedVersion(major=1,
+                                                                  minor=2,
+                                                                  patch=3,
+                                                                  revision=None,
+                                                                  prerelease='beta.1',
+                                                                  metadata='build.5')
+    assert parse_version('1.02.3.4') == ParsedVersion(1, 2, 3, 4, None, None)
+    assert parse_version('7') == ParsedVersion(7, 0, None, None, None, None)
+    assert parse_version('1.0-rc1').is_prerelease is True
+    assert parse_version('1.0').is_prerelease is False
+
+
+@pytest.mark.parametrize('version', [
+    '', 'a.b', '1.2.3.4.5', '1.0-', '1.0-beta..1', '1.0+', '1.0-be_ta', '99999999999.0',
+    '1.0-1.99999999999'
+])
+def test_parse_version_invalid(version: str) -> None:
+    with pytest.raises(ValueError, match=r'Invalid version|too large'):
+        parse_version(version)
+
+
+def test_version_sort_key_order() -> None:
+    ordered = [
+        '0.9', '1.0.0-1', '1.0.0-2', '1.0.0-10', '1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-alpha.2',
+        '1.0.0-alpha.10', '1.0.0-alpha.beta', '1.0.0-alpha-x', '1.0.0-beta', '1.0.0-rc.1', '1.0.0',
+        '1.0.0.1', '1.0.1', '1.2', '1.10'
+    ]
+    keys = [version_sort_key(parse_version(x)) for x in ordered]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+
+def test_version_sort_key_equivalent_versions() -> None:
+    assert version_sort_key(parse_version('1.0')) == version_sort_key(parse_version('1.0.0.0'))
+    assert version_sort_key(parse_version('1.0-BETA')) == version_sort_key(
+        parse_version('1.0.0-beta+build'))
+
+
+@pytest.mark.parametrize(('version', 'expected', 'with_metadata'),
+                         [('1', '1.0.0', '1.0.0'), ('01.2.03.0', '1.2.3', '1.2.3'),
+                          ('1.2.3.4', '1.2.3.4', '1.2.3.4'),
+                          ('1.0-Beta.1+build.5', '1.0.0-Beta.1', '1.0.0-Beta.1+build.5')])
+def test_normalize_version(version: str, expected: str, with_metadata: str) -> None:
+    assert normalize_version(parse_version(version)) == expected
+    assert normalize_version(parse_version(version), metadata=True) == with_metadata
+
+
+@pytest.mark.parametrize(('version_range', 'inside', 'outside'), [
+    ('', ['0.1', '99.0-beta'], []),
+    ('1.0', ['1.0', '1.0.1', '2.0'], ['0.9', '1.0-beta']),
+    ('[1.0]', ['1.0', '1.0.0.0'], ['1.0.1', '0.9']),
+    ('[1.0,2.0)', ['1.0', '1.9.9', '2.0-beta'], ['0.9', '2.0']),
+    ('(1.0,2.0]', ['1.0.1', '2.0'], ['1.0', '2.0.1']),
+    ('(,1.5)', ['0.1', '1.4'], ['1.5', '2.0']),
+    ('[ 1.5 , ]', ['1.5', '3.0'], ['1.4']),
+])
+def test_parse_version_range(version_range: str, inside: list[str], outside: list[str]) -> None:
+    parsed = parse_version_range(version_range)
+    assert all(parsed.contains(version_sort_key(parse_version(x))) for x in inside)
+    assert not any(parsed.contains(version_sort_key(parse_version(x))) for x in outside)
+
+
+@pytest.mark.parametrize(
+    'version_range',
+    ['[', '[1.0', '(1.0)', '[1.0,2.0,3.0]', '(,)', '[a,b]', '[2.0,1.0]', '(1.0,1.0]'])
+def test_parse_version_range_invalid(version_range: str) -> None:
+    with pytest.raises(ValueError, match=r'Invalid version|Empty version range'):
+        parse_version_range(version_range)
@@ -4,24 +4,44 @@ from http import HTTPStatus
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import TYPE_CHECKING, Any, cast
+import asyncio
+import gzip
 import json
 import re
 import zipfile
 
 from asgiref.sync import async_to_sync
-from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.http import HttpRequest, QueryDict
+from django.db.models import FileField
+from django.http import HttpRequest, HttpResponse, QueryDict, StreamingHttpResponse
+from minchoc import coalesce, feed_cache, negative_cache, static_feeds, views
+from minchoc.dependencies import find_dependents
+from minchoc.downloads import flush_downloads
 from minchoc.models import NugetUser, Package
+from minchoc.nuspec import parse_dependencies
+from minchoc.signals import package_changed
+from minchoc.utils import (
+    apply_version_fields,
+    index_dependencies,
+    index_search_terms,
+    update_latest_versions,
+)
 from minchoc.views import APIV2PackageView
 import pytest
 
 if TYPE_CHECKING:
-    from django.http import HttpResponse
+    from django.http.response import HttpResponseBase
     from django.test import Client, RequestFactory
     from pytest_mock import MockerFixture
+    from tests.fixtures import EnableCache
 
 GALLERY_RE = rb'/package/somename/1.0.2</d:Gallery'
+_CACHE_SETTINGS = {
+    'feed': ('MINCHOC_FEED_CACHE_TIMEOUT', 300, cache.clear),
+    'negative': ('MINCHOC_NEGATIVE_CACHE_TTL', 60, negative_cache.clear)
+}
 
 
 @pytest.mark.django_db
@@ -163,7 +183,7 @@ def test_put_nuspec_root_is_none(client: Client, nuget_user: NugetUser,
                                  mocker: MockerFixture) -> None:
     parsed = mocker.Mock()
     parsed.getroot.return_value = None
-    mocker.patch('minchoc.views.parse_xml', return_value=parsed)
+    mocker.patch('minchoc.nuspec.parse_xml', return_value=parsed)
     with NamedTemporaryFile('rb', prefix='minchoc_test', suffix='.nuget') as tf:
         temp_name = tf.name
     with zipfile.ZipFile(temp_name, 'w') as z:
@@ -356,7 +376,16 @@ content-type: application/zip\r
 
 
 @pytest.mark.django_db(transaction=True)
-def test_put(client: Client, nuget_user: NugetUser) -> None:
+@pytest.mark.parametrize('cache_name', [None, 'feed', 'negative'])
+def test_put(client: Client, nuget_user: NugetUser, settings: Any, enable_cache: EnableCache,
+             cache_name: str | None) -> None:
+    if cache_name is not None:
+        enable_cache(*_CACHE_SETTINGS[cache_name])
+    # Misses and feeds cached before the upload must not hide the package afterwards.
+    assert b'<entry>' not in client.get('/FindPackagesById()?semVerLevel=2.0.0&id=somename').content
+    assert client.get('/package/somename/1.0.2').status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/Packages(Id='somename',Version='1.0.2')").status_code == (
+        HTTPStatus.NOT_FOUND)
     with NamedTemporaryFile('rb', prefix='minchoc_test', suffix='.nuget') as tf:
         temp_name = tf.name
     with zipfile.ZipFile(temp_name, 'w') as z:
@@ -375,6 +404,7 @@ def test_put(client: Client, nuget_user: NugetUser) -> None:
     <summary>SUMMARY</summary>
     <tags>tag1 tag2</tags>
     <packageSourceUrl>https://a-url-can-be-same-as-project</packageSourceUrl>
+    <dependencies><dependency id="dep" version="[1.0]" /></dependencies>
   </metadata>
 </package>""")
     content = Path(temp_name).read_bytes()
@@ -434,7 +464,12 @@ content-type: application/zip\r
     assert response.status_code == HTTPStatus.OK
     package = Package._default_manager.filter(nuget_id='somename').first()
     assert package is not None
+    # Downloads are buffered until the buffer is full or old enough.
+    assert package.download_count == 0
+    assert flush_downloads() == 1
+    package.refresh_from_db()
     assert package.download_count == 1
+    assert package.declared_dependencies.get().version_range == '[1.0]'
     response = client.delete('/package/somename/1.0.2')
     assert response.status_code == HTTPStatus.METHOD_NOT_ALLOWED
     settings.ALLOW_PACKAGE_DELETION = True
@@ -444,3 +479,566 @@ content-type: application/zip\r
     response = client.delete('/package/somename/1.0.2',
                              headers={'x-nuget-apikey': nuget_user.token.hex})
     assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+@pytest.mark.django_db
+def test_put_failure_removes_stored_file(client: Client, nuget_user: NugetUser,
+                                         mocker: MockerFixture) -> None:
+    file_field = Package._meta.get_field('file')
+    assert isinstance(file_field, FileField)
+    storage = file_field.storage
+    save_spy = mocker.spy(storage, 'save')
+    mocker.patch('minchoc.views.get_or_create_by_name', side_effect=RuntimeError)
+    with NamedTemporaryFile('rb', prefix='minchoc_test', suffix='.nuget') as tf:
+        temp_name = tf.name
+    with zipfile.ZipFile(temp_name, 'w') as z:
+        z.writestr(
+            'a.nuspec', """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>somename3</id>
+    <version>1.0.2</version>
+    <title>PACKAGE_NAME (Install)</title>
+    <authors>AUTHORS</authors>
+    <projectUrl>https://a-url</projectUrl>
+    <tags>tag1 tag2</tags>
+  </metadata>
+</package>""")
+    content = Path(temp_name).read_bytes()
+    content = (b"""--1234abc\r
+content-disposition: form-data; name="upload"; filename="a.zip"\r
+content-type: application/zip\r
+\r
+""" + content + b"""\r
+--1234abc--""")
+    with pytest.raises(RuntimeError):
+        client.put('/package/',
+                   content,
+                   'multipart/form-data; boundary=1234abc',
+                   headers={
+                       'content-length': f'{len(content)}',
+                       'x-nuget-apikey': nuget_user.token.hex
+                   })
+    assert not Package._default_manager.filter(nuget_id='somename3').exists()
+    assert not storage.exists(save_spy.spy_return)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_static_feeds_follow_upload_and_delete(client: Client, nuget_user: NugetUser, settings: Any,
+                                               tmp_path: Path) -> None:
+    settings.ALLOW_PACKAGE_DELETION = True
+    settings.MINCHOC_STATIC_FEED_ROOT = str(tmp_path)
+    settings.MINCHOC_STATIC_FEED_HOST = 'https://mirror'
+    settings.MINCHOC_V3_ROOT = str(tmp_path / 'v3')
+    settings.MINCHOC_V3_BASE_URL = 'https://mirror/v3'
+    with NamedTemporaryFile('rb', prefix='minchoc_test', suffix='.nuget') as tf:
+        temp_name = tf.name
+    with zipfile.ZipFile(temp_name, 'w') as z:
+        z.writestr(
+            'a.nuspec', """<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://schemas.microsoft.com/packaging/2010/07/nuspec.xsd">
+  <metadata>
+    <id>static</id>
+    <version>1.0.0</version>
+    <title>Static</title>
+    <authors>AUTHORS</authors>
+    <projectUrl>https://a-url</projectUrl>
+    <tags>tag1</tags>
+  </metadata>
+</package>""")
+    content = Path(temp_name).read_bytes()
+    content = (b"""--1234abc\r
+content-disposition: form-data; name="upload"; filename="a.zip"\r
+content-type: application/zip\r
+\r
+""" + content + b"""\r
+--1234abc--""")
+    response = client.put('/package/',
+                          content,
+                          'multipart/form-data; boundary=1234abc',
+                          headers={
+                              'content-length': f'{len(content)}',
+                              'x-nuget-apikey': nuget_user.token.hex
+                          })
+    assert response.status_code == HTTPStatus.CREATED
+    static_feeds.wait_for_renders()
+    find_path = tmp_path / 'FindPackagesById()' / 'static.xml'
+    assert 'https://mirror/package/static/1.0.0' in find_path.read_text()
+    assert (tmp_path / "Packages(Id='static',Version='1.0.0').xml").exists()
+    assert (tmp_path / 'v3' / 'index.json').exists()
+    versions_path = tmp_path / 'v3' / 'flatcontainer' / 'static' / 'index.json'
+    assert json.loads(versions_path.read_text()) == {'versions': ['1.0.0']}
+    assert (tmp_path / 'v3' / 'flatcontainer' / 'static' / '1.0.0' /
+            'static.1.0.0.nupkg').read_bytes() == Path(temp_name).read_bytes()
+    response = client.delete('/package/static/1.0.0',
+                             headers={'x-nuget-apikey': nuget_user.token.hex})
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    static_feeds.wait_for_renders()
+    assert not find_path.exists()
+    assert not (tmp_path / "Packages(Id='static',Version='1.0.0').xml").exists()
+    assert not versions_path.exists()
+    assert not (tmp_path / 'v3' / 'registration' / 'static').exists()
+
+
+def _create_packages(nuget_user: NugetUser, nuget_id: str, *versions: str) -> None:
+    for version in versions:
+        package = Package(nuget_id=nuget_id,
+                          title=nuget_id,
+                          uploader=nuget_user,
+                          version=version,
+                          project_url='https://a-url',
+                          size=1)
+        apply_version_fields(package)
+        package.save()
+        index_search_terms([(package, [])])
+    update_latest_versions([nuget_id])
+
+
+@pytest.mark.django_db
+def test_failing_receiver_does_not_fail_delete(client: Client, nuget_user: NugetUser, settings: Any,
+                                               tmp_path: Path) -> None:
+    settings.ALLOW_PACKAGE_DELETION = True
+    settings.MEDIA_ROOT = tmp_path
+    package = Package(nuget_id='gone',
+                      title='gone',
+                      uploader=nuget_user,
+                      version='1.0',
+                      project_url='https://a-url',
+                      size=1)
+    apply_version_fields(package)
+    package.file.save('gone.1.0.nupkg', ContentFile(b'PK'))
+
+    def receiver(sender: object, nuget_id: str, **kwargs: object) -> None:
+        msg = 'Receivers must not fail the request.'
+        raise RuntimeError(msg)
+
+    package_changed.connect(receiver, dispatch_uid='test_receiver')
+    try:
+        response = client.delete('/package/gone/1.0',
+                                 headers={'x-nuget-apikey': nuget_user.token.hex})
+    finally:
+        package_changed.disconnect(dispatch_uid='test_receiver')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert not Package._default_manager.filter(nuget_id='gone').exists()
+
+
+@pytest.mark.django_db
+def test_get_updates(client: Client, nuget_user: NugetUser) -> None:
+    _create_packages(nuget_user, 'a', '1.0', '1.1', '1.2', '2.0-beta')
+    _create_packages(nuget_user, 'b', '3.0')
+    _create_packages(nuget_user, 'c', '1.0', '1.5')
+    Package._default_manager.filter(nuget_id='c', version='1.5').update(listed=False)
+    update_latest_versions(['c'])
+    response = client.get("/GetUpdates()?packageIds='A|b|c'&versions='1.0|3.0|1.0'"
+                          '&includePrerelease=false&includeAllVersions=false')
+    assert response.status_code == HTTPStatus.OK
+    assert re.findall(r'<d:Version>([^<]+)', response.content.decode()) == ['1.2']
+    response = client.get("/GetUpdates()?packageIds='a|b'&versions='1.0|2.9'"
+                          '&includePrerelease=true&includeAllVersions=true')
+    assert re.findall(r'<d:Version>([^<]+)',
+                      response.content.decode()) == ['1.1', '1.2', '2.0-beta', '3.0']
+    response = client.get('/GetUpdates()')
+    assert response.status_code == HTTPStatus.OK
+    assert '<entry>' not in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_get_updates_bad_request(client: Client) -> None:
+    response = client.get("/GetUpdates()?packageIds='a|b'&versions='1.0'")
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    response = client.get("/GetUpdates()?packageIds='a'&versions='x'")
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json()['error'] == 'Invalid version.'
+
+
+@pytest.mark.django_db
+def test_search(client: Client, nuget_user: NugetUser) -> None:
+    _create_packages(nuget_user, 'notepadplusplus.install', '8.0')
+    _create_packages(nuget_user, 'notepadplusplus', '8.0', '9.0-beta')
+    _create_packages(nuget_user, 'other', '1.0')
+    Package._default_manager.filter(nuget_id='other').update(description='A NotePad clone',
+                                                             download_count=10)
+    index_search_terms([(Package._default_manager.get(nuget_id='other'), ['editor'])])
+    response = client.get("/Search()?searchTerm='notepadplusplus'&targetFramework=''"
+                          '&includePrerelease=false&$inlinecount=allpages')
+    assert response.status_code == HTTPStatus.OK
+    content = response.content.decode()
+    assert '<m:count>2</m:count>' in content
+    assert re.findall(r'<summary type="text">([^<]+)',
+                      content) == ['notepadplusplus', 'notepadplusplus.install']
+    content = client.get("/Search()?searchTerm='NOTE'&includePrerelease=true").content.decode()
+    assert re.findall(r'<d:Version>([^<]+)', content) == ['9.0-beta', '8.0', '1.0']
+    content = client.get("/Search()?searchTerm='note edit'&$skip=0&$top=1").content.decode()
+    assert re.findall(r'<summary type="text">([^<]+)', content) == ['other']
+    content = client.get('/Search()?$skip=1&$top=1').content.decode()
+    assert re.findall(r'<summary type="text">([^<]+)', content) == ['notepadplusplus']
+    assert client.get("/Search()/$count?searchTerm='notepad'").content == b'3'
+
+
+@pytest.mark.django_db
+def test_search_bad_page(client: Client) -> None:
+    assert client.get('/Search()?$top=x').status_code == HTTPStatus.BAD_REQUEST
+    assert client.get('/Search()?$skip=-1').status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_negative_cache(client: Client, nuget_user: NugetUser, django_assert_num_queries: Any,
+                        enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_NEGATIVE_CACHE_TTL', 60, negative_cache.clear)
+    with django_assert_num_queries(1):
+        assert client.get('/package/neg/1.0').status_code == HTTPStatus.NOT_FOUND
+    with django_assert_num_queries(0):
+        assert client.get('/package/neg/1.0').status_code == HTTPStatus.NOT_FOUND
+        assert client.get("/Packages(Id='neg',Version='1.0')").status_code == HTTPStatus.NOT_FOUND
+    assert '<entry>' not in client.get('/FindPackagesById()?id=neg').content.decode()
+    with django_assert_num_queries(0):
+        assert '<entry>' not in client.get('/FindPackagesById()?id=neg').content.decode()
+        assert client.get("/Packages(Id='neg',Version='2.0')").status_code == HTTPStatus.NOT_FOUND
+    _create_packages(nuget_user, 'neg', '1.0')
+    async_to_sync(package_changed.asend)(sender=Package, nuget_id='neg')
+    assert client.get("/Packages(Id='neg',Version='1.0')").status_code == HTTPStatus.OK
+    assert '<entry>' in client.get('/FindPackagesById()?id=neg').content.decode()
+
+
+def test_negative_cache_expiry(client: Client, settings: Any, mocker: MockerFixture,
+                               enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_NEGATIVE_CACHE_TTL', 60, negative_cache.clear)
+    settings.MINCHOC_NEGATIVE_CACHE_SIZE = 1
+    monotonic = mocker.patch('minchoc.negative_cache.monotonic', return_value=0)
+    negative_cache.add_missing('a')
+    negative_cache.add_missing('b', '1.0')
+    assert not negative_cache.is_missing('a', '1.0')
+    assert negative_cache.is_missing('b', '1.0')
+    monotonic.return_value = 61
+    assert not negative_cache.is_missing('b', '1.0')
+    settings.MINCHOC_NEGATIVE_CACHE_TTL = 0
+    negative_cache.add_missing('c')
+    assert not negative_cache.is_missing('c')
+
+
+def test_coalesce_requests(rf: RequestFactory, mocker: MockerFixture,
+                           enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_COALESCE_TTL', 60, coalesce.clear)
+    renders = 0
+
+    async def render(*args: Any, **kwargs: Any) -> str:
+        nonlocal renders
+        renders += 1
+        await asyncio.sleep(0.01)
+        return f'<feed>{renders}</feed>'
+
+    mocker.patch('minchoc.views.find_packages_by_id_feed', side_effect=render)
+
+    async def run() -> list[HttpResponse]:
+        return await asyncio.gather(*(views.find_packages_by_id(
+            rf.get('/FindPackagesById()', {
+                'id': 'x',
+                'semVerLevel': '2.0.0'
+            } if i % 2 else {
+                'semVerLevel': '2.0.0',
+                'id': 'x'
+            })) for i in range(10)))
+
+    responses = async_to_sync(run)()
+    assert renders == 1
+    assert {x.content for x in responses} == {b'<feed>1</feed>'}
+    stats = coalesce.coalesce_stats()
+    assert stats == {'requests': 10, 'renders': 1, 'coalesced': 9, 'cache_hits': 0}
+    response = async_to_sync(views.find_packages_by_id)(
+        rf.get('/FindPackagesById()?id=x&semVerLevel=2.0.0'))
+    assert response.content == b'<feed>1</feed>'
+    assert coalesce.coalesce_stats()['cache_hits'] == 1
+    async_to_sync(package_changed.asend)(sender=Package, nuget_id='x')
+    response = async_to_sync(views.find_packages_by_id)(
+        rf.get('/FindPackagesById()?id=x&semVerLevel=2.0.0'))
+    assert response.content == b'<feed>2</feed>'
+
+
+def test_coalesce_requests_default_settings(rf: RequestFactory) -> None:
+    coalesce.clear()
+    renders = 0
+
+    @coalesce.coalesce_requests
+    async def view(_request: HttpRequest) -> HttpResponse:
+        nonlocal renders
+        renders += 1
+        await asyncio.sleep(0.01)
+        response = HttpResponse(f'<feed>{renders}</feed>', content_type='application/atom+xml')
+        response['ETag'] = f'"{renders}"'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+    async def run() -> list[HttpResponse]:
+        return await asyncio.gather(*(view(rf.get('/feed')) for _ in range(3)))
+
+    responses = async_to_sync(run)()
+    assert renders == 1
+    for response in responses:
+        assert response.content == b'<feed>1</feed>'
+        assert response['Content-Type'] == 'application/atom+xml'
+        assert response['ETag'] == '"1"'
+        assert response['Vary'] == 'Accept-Encoding'
+    # Responses are not kept after the render by default.
+    assert async_to_sync(view)(rf.get('/feed')).content == b'<feed>2</feed>'
+    assert coalesce.coalesce_stats()['cache_hits'] == 0
+
+
+@pytest.mark.django_db
+def test_feed_cache(client: Client, nuget_user: NugetUser, django_assert_num_queries: Any,
+                    enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_FEED_CACHE_TIMEOUT', 300, cache.clear)
+    _create_packages(nuget_user, 'cached', '1.0')
+    response = client.get('/FindPackagesById()?id=cached')
+    etag = response['ETag']
+    assert response['Cache-Control'] == 'no-cache'
+    catalog_etag = client.get('/Packages()?$filter=IsLatestVersion')['ETag']
+    with django_assert_num_queries(0):
+        again = client.get('/FindPackagesById()?id=cached')
+        assert again['ETag'] == etag
+        assert again.content == response.content
+        not_modified = client.get('/FindPackagesById()?id=cached',
+                                  headers={'If-None-Match': f'W/{etag}'})
+        assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+    assert client.get('/FindPackagesById()?id=cached&semVerLevel=2.0.0')['ETag'] != etag
+    async_to_sync(feed_cache.abump_generations)(['cached'], catalog=False)
+    assert client.get('/FindPackagesById()?id=cached')['ETag'] != etag
+    assert client.get('/Packages()?$filter=IsLatestVersion')['ETag'] == catalog_etag
+    _create_packages(nuget_user, 'cached', '2.0')
+    async_to_sync(package_changed.asend)(sender=Package, nuget_id='cached')
+    response = client.get('/Packages()?$filter=IsLatestVersion')
+    assert response['ETag'] != catalog_etag
+    assert '<d:Version>2.0</d:Version>' in response.content.decode()
+    assert client.get('/Packages()?$filter=IsLatestVersion').content == response.content
+
+
+@pytest.mark.django_db
+def test_feed_cache_compression(client: Client, nuget_user: NugetUser,
+                                enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_FEED_CACHE_TIMEOUT', 300, cache.clear)
+    _create_packages(nuget_user, 'compressed', '1.0')
+    plain = client.get('/FindPackagesById()?id=compressed')
+    assert 'Content-Encoding' not in plain
+    assert plain['Vary'] == 'Accept-Encoding'
+    response = client.get('/FindPackagesById()?id=compressed',
+                          headers={'Accept-Encoding': 'gzip;q=1.0, identity;q=0.5'})
+    assert response['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.content) == plain.content
+    assert response['ETag'] == f'{plain["ETag"][:-1]}-gzip"'
+    not_modified = client.get('/FindPackagesById()?id=compressed',
+                              headers={
+                                  'Accept-Encoding': 'gzip',
+                                  'If-None-Match': response['ETag']
+                              })
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+    assert not_modified['Vary'] == 'Accept-Encoding'
+    assert client.get('/FindPackagesById()?id=compressed',
+                      headers={
+                          'If-None-Match': response['ETag']
+                      }).status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db
+def test_feed_compression_without_cache(client: Client, nuget_user: NugetUser) -> None:
+    _create_packages(nuget_user, 'compressed', '1.0')
+    plain = client.get('/FindPackagesById()?id=compressed')
+    assert 'Content-Encoding' not in plain
+    assert plain['Vary'] == 'Accept-Encoding'
+    response = client.get('/FindPackagesById()?id=compressed', headers={'Accept-Encoding': 'gzip'})
+    assert response['Content-Encoding'] == 'gzip'
+    assert response['Vary'] == 'Accept-Encoding'
+    assert 'ETag' not in response
+    # Without the cache, each response is rendered at the time of the request.
+    updated = re.compile(rb'<updated>[^<]*</updated>')
+    assert updated.sub(b'', gzip.decompress(response.content)) == updated.sub(b'', plain.content)
+
+
+@pytest.mark.django_db
+def test_feed_cache_off(client: Client, nuget_user: NugetUser, mocker: MockerFixture) -> None:
+    generation = mocker.patch('minchoc.feed_cache.ageneration')
+    _create_packages(nuget_user, 'uncached', '1.0')
+    response = client.get('/FindPackagesById()?id=uncached')
+    assert 'ETag' not in response
+    _create_packages(nuget_user, 'uncached', '2.0')
+    async_to_sync(package_changed.asend)(sender=Package, nuget_id='uncached')
+    response = client.get('/FindPackagesById()?id=uncached', headers={'If-None-Match': '*'})
+    assert response.status_code == HTTPStatus.OK
+    assert '<d:Version>2.0</d:Version>' in response.content.decode()
+    generation.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_select(client: Client, nuget_user: NugetUser, django_assert_num_queries: Any) -> None:
+    _create_packages(nuget_user, 'selected', '1.0', '1.1', '2.0-beta')
+    with django_assert_num_queries(1):
+        content = client.get(
+            '/FindPackagesById()?id=selected&$select=Id,Version,IsLatestVersion').content.decode()
+    assert re.findall(r'<d:(\w+)', content) == ['IsLatestVersion', 'Version'] * 3
+    assert re.findall(r'<d:IsLatestVersion m:type="Edm.Boolean">(\w+)',
+                      content) == ['false', 'true', 'false']
+    assert '<author><name></name></author>' in content
+    with django_assert_num_queries(1):
+        content = client.get(
+            "/Packages(Id='selected',Version='1.1')?$select=Version,Description").content.decode()
+    assert re.findall(r'<d:(\w+)', content) == ['Description', 'Version']
+    with django_assert_num_queries(3):
+        content = client.get(
+            '/Packages()?$filter=IsLatestVersion&$select=Id,Authors,Tags').content.decode()
+    assert re.findall(r'<d:(\w+)', content) == ['Tags']
+    content = client.get('/Packages()?$filter=IsLatestVersion&$select=*').content.decode()
+    assert '<d:DownloadCount m:type="Edm.Int32">0</d:DownloadCount>' in content
+    for url in ('/FindPackagesById()?id=selected&$select=Nope',
+                "/Packages(Id='selected',Version='1.1')?$select=Id,Nope",
+                '/Packages()?$select=Nope'):
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json()['error'] == 'Invalid $select.'
+
+
+@pytest.mark.django_db
+def test_case_insensitive_id(client: Client, nuget_user: NugetUser,
+                             django_assert_num_queries: Any) -> None:
+    _create_packages(nuget_user, 'Mixed.Case', '1.0', '1.1')
+    assert set(Package._default_manager.values_list('nuget_id_lower', flat=True)) == {'mixed.case'}
+    content = client.get('/FindPackagesById()?id=MIXED.case').content.decode()
+    assert re.findall(r'<d:Version>([^<]+)', content) == ['1.0', '1.1']
+    content = client.get(
+        "/FindPackagesById()?id=mixed.case&$skiptoken='MIXED.CASE','1.0'").content.decode()
+    assert re.findall(r'<d:Version>([^<]+)', content) == ['1.1']
+    assert client.get("/Packages(Id='mixed.case',Version='1.0')").status_code == HTTPStatus.OK
+    with django_assert_num_queries(1) as captured:
+        content = client.get(
+            "/Packages()?$filter=tolower(Id) eq 'mixed.case'&$select=Version").content.decode()
+    assert 'nuget_id_lower' in captured.captured_queries[0]['sql']
+    assert re.findall(r'<d:Version>([^<]+)', content) == ['1.0', '1.1']
+
+
+@pytest.mark.django_db
+def test_ids_differing_only_in_case(client: Client, nuget_user: NugetUser, settings: Any,
+                                    tmp_path: Path, enable_cache: EnableCache) -> None:
+    enable_cache('MINCHOC_NEGATIVE_CACHE_TTL', 60, negative_cache.clear)
+    settings.ALLOW_PACKAGE_DELETION = True
+    settings.MEDIA_ROOT = tmp_path
+    _create_packages(nuget_user, 'Twin', '1.0')
+    _create_packages(nuget_user, 'twin', '1.0')
+    for package in Package._default_manager.all():
+        package.file.save(f'{package.nuget_id}.1.0.nupkg', ContentFile(package.nuget_id.encode()))
+    headers = {'x-nuget-apikey': nuget_user.token.hex}
+    for response in (client.get("/Packages(Id='TWIN',Version='1.0')"),
+                     client.get("/ResolveDependencies()?id='TWIN'&version='1.0'"),
+                     client.get('/package/TWIN/1.0'),
+                     client.delete('/package/TWIN/1.0', headers=headers)):
+        assert response.status_code == HTTPStatus.NOT_FOUND
+    content = client.get("/Packages(Id='Twin',Version='1.0')").content.decode()
+    assert re.findall(r'<title type="text">([^<]+)', content)[1:] == ['Twin']
+    content = client.get("/ResolveDependencies()?id='twin'&version='1.0'").content.decode()
+    assert re.findall(r'<title type="text">([^<]+)', content)[1:] == ['twin']
+    download: HttpResponseBase = client.get('/package/twin/1.0')
+    assert isinstance(download, StreamingHttpResponse)
+    assert download.getvalue() == b'twin'
+    assert client.delete('/package/twin/1.0', headers=headers).status_code == HTTPStatus.NO_CONTENT
+    assert list(Package._default_manager.values_list('nuget_id', flat=True)) == ['Twin']
+    assert client.delete('/package/TWIN/1.0', headers=headers).status_code == HTTPStatus.NO_CONTENT
+    assert not Package._default_manager.exists()
+
+
+@pytest.mark.django_db
+def test_packages_order_by(client: Client, nuget_user: NugetUser) -> None:
+    _create_packages(nuget_user, 'b', '1.9', '1.10', '2.0-beta')
+    _create_packages(nuget_user, 'a', '3.0')
+    Package._default_manager.filter(version='1.9').update(download_count=5, title='z')
+    Package._default_manager.filter(version='3.0').update(download_count=7)
+    Package._default_manager.filter(version='1.10').update(description='a')
+    Package._default_manager.exclude(version='1.10').update(description='b')
+
+    def versions(query: str) -> list[str]:
+        response = client.get(f'/Packages()?{query}')
+        assert response.status_code == HTTPStatus.OK
+        return re.findall(r'<d:Version>([^<]+)', response.content.decode())
+
+    assert versions('') == ['3.0', '1.9', '1.10', '2.0-beta']
+    assert versions('$orderby=Version desc') == ['3.0', '2.0-beta', '1.10', '1.9']
+    assert versions('$orderby=version') == ['1.9', '1.10', '2.0-beta', '3.0']
+    assert versions('$orderby=DownloadCount desc,Id&$top=2') == ['3.0', '1.9']
+    assert versions('$orderby=DownloadCount desc,Id&$skip=2&$top=2') == ['1.10', '2.0-beta']
+    assert versions('$orderby=Title desc,Version asc') == ['1.9', '1.10', '2.0-beta', '3.0']
+    assert versions('$orderby=Published desc') == ['3.0', '2.0-beta', '1.10', '1.9']
+    assert versions('$orderby=Description') == ['1.10', '1.9', '2.0-beta', '3.0']
+    assert versions('$orderby=Description desc,Version') == ['1.9', '2.0-beta', '3.0', '1.10']
+    assert versions("$orderby=Tags,Version&$filter=tolower(Id) eq 'b'") == [
+        '1.9', '1.10', '2.0-beta'
+    ]
+    for query in ('$orderby=Version sideways', '$top=x', '$skip=-1'):
+        assert client.get(f'/Packages()?{query}').status_code == HTTPStatus.BAD_REQUEST
+
+
+def _set_dependencies(nuget_id: str, version: str, value: str) -> None:
+    package = Package._default_manager.get(nuget_id=nuget_id, version=version)
+    package.dependencies = [x._asdict() for x in parse_dependencies(value)]
+    package.save()
+    index_dependencies([package])
+
+
+@pytest.mark.django_db
+def test_resolve_dependencies(client: Client, nuget_user: NugetUser) -> None:
+    _create_packages(nuget_user, 'app', '1.0')
+    _create_packages(nuget_user, 'Lib', '1.0', '1.5', '2.0')
+    _create_packages(nuget_user, 'base', '0.9', '1.0', '1.2', '1.3-beta')
+    _set_dependencies('app', '1.0', 'lib:[1.0,2.0)|not.hosted:1.0')
+    _set_dependencies('Lib', '1.0', 'base:1.0:net45|base:[0.5]:net40')
+    _set_dependencies('Lib', '1.5', 'BASE:1.0')
+    _set_dependencies('base', '1.0', 'app:1.0')
+
+    def resolved(query: str) -> list[tuple[str, str]]:
+        response = client.get(f'/ResolveDependencies()?{query}')
+        assert response.status_code == HTTPStatus.OK
+        return re.findall(r"<id>[^<]+Packages\(Id='([^']+)',Version='([^']+)'\)</id>",
+                          response.content.decode())
+
+    assert resolved("id='APP'&version='1.0'") == [('app', '1.0'), ('Lib', '1.0'), ('base', '1.0')]
+    assert resolved("id='app'&version='1.0'&dependencyVersion=Highest") == [('app', '1.0'),
+                                                                            ('Lib', '1.5'),
+                                                                            ('base', '1.2')]
+    assert resolved("id='app'&version='1.0'&dependencyVersion=Highest&includePrerelease=true") == [
+        ('app', '1.0'), ('Lib', '1.5'), ('base', '1.3-beta')
+    ]
+    assert resolved("id='base'&version='0.9'") == [('base', '0.9')]
+    content = client.get("/Packages(Id='app',Version='1.0')").content.decode()
+    assert '<d:Dependencies>lib:[1.0,2.0)|not.hosted:1.0</d:Dependencies>' in content
+    assert client.get("/ResolveDependencies()?id='app'&version='9.0'").status_code == (
+        HTTPStatus.NOT_FOUND)
+    for query in ("id='app'", "id='app'&version='1.0'&dependencyVersion=HighestMinor"):
+        assert client.get(f'/ResolveDependencies()?{query}').status_code == (HTTPStatus.BAD_REQUEST)
+
+
+@pytest.mark.django_db
+def test_dependents(client: Client, nuget_user: NugetUser) -> None:
+    _create_packages(nuget_user, 'lib', '1.0', '2.0')
+    _create_packages(nuget_user, 'app', '1.0', '1.1')
+    _create_packages(nuget_user, 'tool', '3.0')
+    _create_packages(nuget_user, 'old', '1.0')
+    _set_dependencies('app', '1.0', 'LIB:[1.0,2.0)')
+    _set_dependencies('app', '1.1', 'lib:2.0')
+    _set_dependencies('tool', '3.0', 'lib|lib:(,1.0):net40')
+    _set_dependencies('old', '1.0', 'lib:(,1.0)')
+
+    def found(query: str) -> list[tuple[str, str, list[str]]]:
+        response = client.get(f"/Dependents()?id='Lib'&{query}")
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data['count'] >= len(data['dependents'])
+        return [(x['id'], x['version'], [y['targetFramework'] for y in x['dependencies']])
+                for x in data['dependents']]
+
+    assert found('') == [('app', '1.0', ['']), ('app', '1.1', ['']), ('old', '1.0', ['']),
+                         ('tool', '3.0', ['', 'net40'])]
+    assert found("versionRange='[1.0]'") == [('app', '1.0', ['']), ('tool', '3.0', [''])]
+    assert found("versionRange='[2.0,)'") == [('app', '1.1', ['']), ('tool', '3.0', [''])]
+    assert found("versionRange='(,1.0)'") == [('old', '1.0', ['']), ('tool', '3.0', ['', 'net40'])]
+    assert found('latestOnly=true') == [('app', '1.1', ['']), ('old', '1.0', ['']),
+                                        ('tool', '3.0', ['', 'net40'])]
+    assert found('$skip=1&$top=1') == [('app', '1.1', [''])]
+    assert found('$skip=3') == [('tool', '3.0', ['', 'net40'])]
+    assert client.get("/Dependents()?id='lib'").json()['count'] == 4
+    assert 'package_dependency_id_idx' in find_dependents('lib', '[1.0]').explain()
+    for query in ("id='lib'&versionRange='[2.0,1.0]'", "id='lib'&$top=-1", "versionRange='1.0'"):
+        assert client.get(f'/Dependents()?{query}').status_code == HTTPStatus.BAD_REQUEST